@@ -0,0 +1,115 @@
+#Tempo de importação de cada página, no estilo do python -X importtime.
+#
+#Uso:
+#    python -m benchmarks.importtime
+#    python -m benchmarks.importtime pages/1_visao_empresa.py --budget 1.5 --top 10
+#
+#Para cada página, só os imports do topo do arquivo são executados, num processo novo
+#( sem cache de módulos ), com o -X importtime ligado. O relatório mostra o tempo total e os
+#módulos mais pesados. Sai com código 1 se alguma página passar do orçamento ( --budget ).
+#O total inclui a inicialização do próprio Python ( site, encodings ), igual para todas as páginas.
+
+#Bibliotecas necessárias
+import argparse
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+#Orçamento padrão de tempo de importação por página, em segundos
+IMPORT_BUDGET_S = 1.0
+
+#-------------------
+#Funções
+#-------------------
+def page_imports( path ):
+    """ Esta função tem a responsabilidade de extrair os imports do topo de uma página
+
+        Input: Caminho do arquivo .py
+        Output: Código Python só com os imports
+    """
+    with open( path, encoding="utf-8" ) as f:
+        source = f.read()
+
+    tree = ast.parse( source, filename=path )
+    return "\n".join( ast.get_source_segment( source, node )
+                      for node in tree.body if isinstance( node, ( ast.Import, ast.ImportFrom ) ) )
+
+
+def import_times( code ):
+    """ Esta função tem a responsabilidade de medir o tempo de importação de um código
+
+        Input: Código Python ( só imports )
+        Output: Lista de ( módulo, nível, tempo próprio em s, tempo acumulado em s ), na ordem do -X importtime
+    """
+    result = subprocess.run( [ sys.executable, "-X", "importtime", "-c", code ],
+                             cwd=ROOT, capture_output=True, text=True )
+    if result.returncode != 0:
+        raise RuntimeError( result.stderr.strip().splitlines()[-1] )
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith( "import time:" ) or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len( "import time:" ):].split( "|", 2 )
+
+        #O -X importtime indenta o nome com dois espaços por nível de importação
+        name = name[1:]
+        level = ( len( name ) - len( name.lstrip() ) ) // 2
+        rows.append( ( name.strip(), level, int( self_us ) / 1e6, int( cumulative_us ) / 1e6 ) )
+    return rows
+
+
+def report( path, top=10 ):
+    """ Esta função tem a responsabilidade de resumir o tempo de importação de uma página
+
+        Input: Caminho da página e quantidade de módulos mostrados
+        Output: Dicionário com page, total_s e top ( módulos de primeiro nível mais pesados, com o tempo acumulado )
+    """
+    rows = import_times( page_imports( path ) )
+
+    #Os módulos de primeiro nível ( importados direto pela página ) somam o total da página
+    total = sum( cumulative for _, level, _, cumulative in rows if level == 0 )
+    heaviest = sorted( ( ( name, cumulative ) for name, level, _, cumulative in rows if level == 0 ),
+                       key=lambda r: r[1], reverse=True )
+
+    return {
+        "page": os.path.relpath( path, ROOT ),
+        "total_s": total,
+        "top": heaviest[:top],
+    }
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description="Tempo de importação das páginas" )
+    parser.add_argument( "pages", nargs="*", help="páginas ( padrão: Home.py e pages/*.py )" )
+    parser.add_argument( "--budget", type=float, default=IMPORT_BUDGET_S, help="orçamento por página, em segundos" )
+    parser.add_argument( "--top", type=int, default=10, help="quantidade de módulos mostrados por página" )
+    args = parser.parse_args( argv )
+
+    pages = args.pages or [ os.path.join( ROOT, "Home.py" ) ] + sorted( glob.glob( os.path.join( ROOT, "pages", "*.py" ) ) )
+
+    over_budget = False
+    for path in pages:
+        try:
+            r = report( path, args.top )
+        except RuntimeError as error:
+            #Página que nem importa conta como acima do orçamento
+            print( "{:<32} ERRO: {}".format( os.path.relpath( path, ROOT ), error ) )
+            over_budget = True
+            continue
+
+        status = "OK" if r["total_s"] <= args.budget else "ACIMA DO ORÇAMENTO"
+        over_budget |= r["total_s"] > args.budget
+        print( "{:<32} {:>8.3f} s  ( orçamento {:.3f} s )  {}".format( r["page"], r["total_s"], args.budget, status ) )
+        for name, cumulative in r["top"]:
+            print( "    {:<40} {:>8.3f} s".format( name, cumulative ) )
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit( main() )
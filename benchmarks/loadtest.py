@@ -0,0 +1,394 @@
+#Teste de carga das páginas com várias sessões ao mesmo tempo, sem navegador.
+#
+#Uso:
+#    python -m benchmarks.loadtest
+#    python -m benchmarks.loadtest --sessions 1 4 16 64 --duration 30 --p95-budget-ms 500 --output carga.json
+#    CURRY_BACKEND=sql python -m benchmarks.loadtest pages/1_visao_empresa.py --sessions 8
+#
+#Cada sessão é uma thread ( como no servidor do Streamlit ) que repete: muda um widget ao acaso
+#( data, um multiselect, a seção, o tipo de mapa, a página da tabela, ... ), espera um tempo de
+#"leitura" e roda a página de novo, medindo o tempo da execução. O Streamlit é trocado por um módulo
+#sem interface ( ver HeadlessStreamlit ): os widgets devolvem o valor da sessão e os gráficos e tabelas
+#são só serializados ( JSON do plotly e Arrow ), sem websocket nem navegador.
+#
+#O relatório mostra, para cada quantidade de sessões, os percentis p50/p95/p99 do tempo de cada
+#execução, as execuções por segundo e a memória ( RSS ) do processo. Com --p95-budget-ms, mostra
+#também a maior quantidade de sessões que ficou dentro do orçamento.
+
+#Bibliotecas necessárias
+import argparse
+import datetime
+import glob
+import json
+import os
+import random
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+ROOT = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+DEFAULT_SESSIONS = [ 1, 4, 16 ]
+
+#Intervalo médio entre uma interação e outra de cada sessão, em ms ( o "tempo de leitura" do usuário )
+THINK_MS = 200
+
+#Intervalo entre as leituras de memória, em segundos
+RSS_INTERVAL_S = 0.05
+
+#-------------------
+#Streamlit sem interface
+#-------------------
+_local = threading.local()
+
+
+def _noop( *args, **kwargs ):
+    return None
+
+
+class _Block:
+    """ Contêiner sem interface ( colunas, abas, expander, sidebar ): repassa tudo para o módulo """
+
+    def __init__( self, st ):
+        self._st = st
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        return False
+
+    def __getattr__( self, name ):
+        return getattr( self._st, name )
+
+
+class Session:
+    """ Esta classe tem a responsabilidade de guardar o estado de uma sessão do teste de carga
+
+        Guarda o valor de cada widget ( por página ) e os widgets vistos na última execução de cada
+        página, usados para escolher a próxima interação.
+    """
+
+    def __init__( self, seed ):
+        self.rng = random.Random( seed )
+        self.state = {}
+        self.widgets = {}
+        self.page = None
+
+    def widget( self, kind, label, key, default, **spec ):
+        """ Registra o widget e retorna o valor atual da sessão ( ou o padrão ) """
+        wid = ( self.page, kind, key or label )
+        self.widgets.setdefault( self.page, {} )[wid] = ( kind, default, spec )
+        return self.state.get( wid, default )
+
+    def interact( self, page ):
+        """ Esta função tem a responsabilidade de simular uma interação do usuário na página
+
+            Escolhe um dos widgets da última execução da página e muda o valor dele ao acaso.
+
+            Output: Descrição da interação ( ex: "multiselect:Quais as regiões?" ), ou None
+        """
+        widgets = [ w for w in self.widgets.get( page, {} ).items() if w[1][0] != "text_input" ]
+        if not widgets:
+            return None
+
+        wid, ( kind, default, spec ) = self.rng.choice( widgets )
+        value = self.state.get( wid, default )
+        rng = self.rng
+        if kind == "slider" and isinstance( value, datetime.datetime ):
+            days = ( spec["max_value"] - spec["min_value"] ).days
+            value = spec["min_value"] + datetime.timedelta( days=rng.randint( 0, days ) )
+        elif kind == "slider":
+            value = rng.uniform( spec["min_value"], spec["max_value"] )
+        elif kind == "multiselect":
+            #Liga ou desliga uma opção, sem deixar a seleção vazia
+            option = rng.choice( spec["options"] )
+            if option not in value:
+                value = list( value ) + [ option ]
+            elif len( value ) > 1:
+                value = [ v for v in value if v != option ]
+        elif kind in ( "radio", "selectbox" ):
+            value = rng.choice( spec["options"] )
+        elif kind == "checkbox":
+            value = not value
+        elif kind == "number_input":
+            low = spec["min_value"] if spec["min_value"] is not None else 1
+            high = spec["max_value"] if spec["max_value"] is not None else low + 4
+            value = rng.randint( low, high )
+
+        self.state[wid] = value
+        return "{}:{}".format( kind, wid[2] )
+
+
+class HeadlessStreamlit( types.ModuleType ):
+    """ Esta classe tem a responsabilidade de substituir o módulo streamlit no teste de carga
+
+        Os widgets devolvem o valor da sessão da thread atual ( ver Session ). Os gráficos são
+        serializados em JSON e as tabelas em Arrow, que é o trabalho feito no servidor antes de enviar
+        para o navegador; o resto ( textos, imagens, métricas ) não faz nada.
+    """
+
+    def __init__( self ):
+        super().__init__( "streamlit" )
+        self.sidebar = _Block( self )
+        self.session_state = {}
+        components = types.ModuleType( "streamlit.components" )
+        components.v1 = types.ModuleType( "streamlit.components.v1" )
+        components.v1.html = _noop
+        self.components = components
+
+    def install( self ):
+        """ Coloca o módulo no lugar do streamlit ( antes das páginas importarem ) """
+        sys.modules["streamlit"] = self
+        sys.modules["streamlit.components"] = self.components
+        sys.modules["streamlit.components.v1"] = self.components.v1
+
+    def __getattr__( self, name ):
+        #Elementos sem retorno ( markdown, title, metric, image, caption, set_page_config, ... )
+        if name.startswith( "__" ):
+            raise AttributeError( name )
+        return _noop
+
+    @staticmethod
+    def _session():
+        return _local.session
+
+    def container( self, *args, **kwargs ):
+        return _Block( self )
+
+    def expander( self, *args, **kwargs ):
+        return _Block( self )
+
+    def columns( self, spec, **kwargs ):
+        return [ _Block( self ) for _ in range( spec if isinstance( spec, int ) else len( spec ) ) ]
+
+    def tabs( self, labels ):
+        return [ _Block( self ) for _ in labels ]
+
+    def slider( self, label, min_value=None, max_value=None, value=None, key=None, **kwargs ):
+        return self._session().widget( "slider", label, key, value, min_value=min_value, max_value=max_value )
+
+    def multiselect( self, label, options, default=None, key=None, **kwargs ):
+        return self._session().widget( "multiselect", label, key, list( default or [] ), options=list( options ) )
+
+    def radio( self, label, options, index=0, key=None, **kwargs ):
+        return self._session().widget( "radio", label, key, list( options )[index], options=list( options ) )
+
+    def selectbox( self, label, options, index=0, key=None, **kwargs ):
+        return self._session().widget( "selectbox", label, key, list( options )[index], options=list( options ) )
+
+    def checkbox( self, label, value=False, key=None, **kwargs ):
+        return self._session().widget( "checkbox", label, key, value )
+
+    def number_input( self, label, min_value=None, max_value=None, value=None, key=None, **kwargs ):
+        value = value if value is not None else min_value
+        return self._session().widget( "number_input", label, key, value, min_value=min_value, max_value=max_value )
+
+    def text_input( self, label, value="", key=None, **kwargs ):
+        return self._session().widget( "text_input", label, key, value )
+
+    def plotly_chart( self, fig, **kwargs ):
+        fig.to_json()
+
+    def dataframe( self, data, **kwargs ):
+        import pandas as pd
+        import pyarrow as pa
+
+        if isinstance( data, pd.DataFrame ):
+            pa.Table.from_pandas( data )
+
+
+#-------------------
+#Funções
+#-------------------
+def rss_mb():
+    """ Memória residente ( RSS ) do processo, em MB """
+    try:
+        with open( "/proc/self/statm" ) as f:
+            return int( f.read().split()[1] ) * os.sysconf( "SC_PAGE_SIZE" ) / 2**20
+    except OSError:
+        #Fora do Linux, o pico de memória do processo ( ru_maxrss é em KB no Linux e em bytes no macOS )
+        import resource
+
+        maxrss = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+        return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 2**10
+
+
+class RssSampler( threading.Thread ):
+    """ Lê a memória do processo a cada RSS_INTERVAL_S segundos e guarda o maior valor """
+
+    def __init__( self ):
+        super().__init__( daemon=True )
+        self.peak = rss_mb()
+        self._done = threading.Event()
+
+    def run( self ):
+        while not self._done.wait( RSS_INTERVAL_S ):
+            self.peak = max( self.peak, rss_mb() )
+
+    def stop( self ):
+        self._done.set()
+        self.join()
+        return max( self.peak, rss_mb() )
+
+
+def compile_pages( paths ):
+    """ Esta função tem a responsabilidade de compilar as páginas uma única vez
+
+        Input: Caminhos dos arquivos das páginas
+        Output: Dicionário com o código compilado de cada página
+    """
+    pages = {}
+    for path in paths:
+        with open( path, encoding="utf-8" ) as f:
+            pages[os.path.basename( path )] = compile( f.read(), path, "exec" )
+    return pages
+
+
+def run_page( session, name, code ):
+    """ Roda a página como o Streamlit faz em cada interação e retorna o tempo em ms """
+    _local.session = session
+    session.page = name
+    start = time.perf_counter()
+    exec( code, { "__name__": "__main__", "__file__": name } )
+    return ( time.perf_counter() - start ) * 1000
+
+
+def session_loop( session, pages, deadline, think_ms, latencies, errors ):
+    """ Esta função tem a responsabilidade de simular uma sessão até o fim do tempo do teste """
+    names = list( pages )
+    while time.perf_counter() < deadline:
+        name = session.rng.choice( names )
+        session.interact( name )
+        if think_ms:
+            time.sleep( session.rng.expovariate( 1000 / think_ms ) )
+        try:
+            latencies.append( ( name, run_page( session, name, pages[name] ) ) )
+        except Exception as exc:
+            errors.append( "{}: {}: {}".format( name, type( exc ).__name__, exc ) )
+
+
+def percentiles( values ):
+    """ Percentis p50/p95/p99 e média, em ms """
+    if not values:
+        return { "p50": None, "p95": None, "p99": None, "mean": None }
+    values = np.asarray( values )
+    p50, p95, p99 = np.percentile( values, [ 50, 95, 99 ] )
+    return { "p50": round( p50, 1 ), "p95": round( p95, 1 ), "p99": round( p99, 1 ), "mean": round( values.mean(), 1 ) }
+
+
+def run_level( pages, n_sessions, duration, think_ms, seed ):
+    """ Esta função tem a responsabilidade de rodar o teste com uma quantidade de sessões
+
+        Input: Páginas compiladas, quantidade de sessões, duração em segundos, tempo médio entre
+               interações em ms e semente das interações
+        Output: Dicionário com os percentis por página e no total, execuções por segundo e memória
+    """
+    latencies = []
+    errors = []
+    sampler = RssSampler()
+    rss_start = sampler.peak
+    sampler.start()
+
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [ threading.Thread( target=session_loop,
+                                  args=( Session( seed + i ), pages, deadline, think_ms, latencies, errors ),
+                                  daemon=True )
+                for i in range( n_sessions ) ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    rss_peak = sampler.stop()
+
+    by_page = {}
+    for name, ms in latencies:
+        by_page.setdefault( name, [] ).append( ms )
+
+    return {
+        "sessions": n_sessions,
+        "reruns": len( latencies ),
+        "reruns_per_s": round( len( latencies ) / elapsed, 2 ),
+        "total": percentiles( [ ms for _, ms in latencies ] ),
+        "pages": { name: percentiles( values ) for name, values in sorted( by_page.items() ) },
+        "rss_start_mb": round( rss_start, 1 ),
+        "rss_peak_mb": round( rss_peak, 1 ),
+        "errors": errors[:10],
+        "n_errors": len( errors ),
+    }
+
+
+def report( result, rss_base ):
+    """ Mostra o resultado de uma quantidade de sessões """
+    total = result["total"]
+    per_session = ( result["rss_peak_mb"] - rss_base ) / result["sessions"]
+    print( "\n{} sessões: {} execuções ( {:.1f}/s ), p50 {} ms, p95 {} ms, p99 {} ms".format(
+        result["sessions"], result["reruns"], result["reruns_per_s"], total["p50"], total["p95"], total["p99"] ) )
+    print( "    RSS: pico {:.0f} MB ( {:+.0f} MB sobre a base, {:.1f} MB por sessão )".format(
+        result["rss_peak_mb"], result["rss_peak_mb"] - rss_base, per_session ) )
+    for name, p in result["pages"].items():
+        print( "    {:32s} p50 {:>8} p95 {:>8} p99 {:>8}".format( name, p["p50"], p["p95"], p["p99"] ) )
+    if result["n_errors"]:
+        print( "    {} erros, ex: {}".format( result["n_errors"], result["errors"][0] ) )
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description="Teste de carga das páginas com várias sessões" )
+    parser.add_argument( "pages", nargs="*", help="páginas ( padrão: pages/*.py )" )
+    parser.add_argument( "--sessions", type=int, nargs="+", default=DEFAULT_SESSIONS )
+    parser.add_argument( "--duration", type=float, default=20, help="segundos por quantidade de sessões" )
+    parser.add_argument( "--think-ms", type=float, default=THINK_MS, help="tempo médio entre interações ( 0 = sem pausa )" )
+    parser.add_argument( "--workdir", default=ROOT, help="pasta com o train.csv e o LogoFlecha.jpg" )
+    parser.add_argument( "--seed", type=int, default=0 )
+    parser.add_argument( "--p95-budget-ms", type=float, help="orçamento do p95 para achar a maior quantidade de sessões" )
+    parser.add_argument( "--output", help="grava o resultado em JSON" )
+    args = parser.parse_args( argv )
+
+    paths = [ os.path.abspath( p ) for p in args.pages ] or sorted( glob.glob( os.path.join( ROOT, "pages", "*.py" ) ) )
+    HeadlessStreamlit().install()
+    os.chdir( args.workdir )
+
+    rss_empty = rss_mb()
+    pages = compile_pages( paths )
+
+    #Aquecimento: carrega o dataset e as estruturas compartilhadas uma vez, fora da medição
+    warmup = Session( args.seed )
+    start = time.perf_counter()
+    for name, code in pages.items():
+        run_page( warmup, name, code )
+    rss_base = rss_mb()
+    print( "Aquecimento: {:.1f} s, RSS {:.0f} MB ( {:.0f} MB antes de carregar os dados )".format(
+        time.perf_counter() - start, rss_base, rss_empty ) )
+
+    results = []
+    for n_sessions in args.sessions:
+        result = run_level( pages, n_sessions, args.duration, args.think_ms, args.seed )
+        report( result, rss_base )
+        results.append( result )
+
+    best = None
+    if args.p95_budget_ms is not None:
+        within = [ r["sessions"] for r in results
+                   if r["total"]["p95"] is not None and r["total"]["p95"] <= args.p95_budget_ms and not r["n_errors"] ]
+        best = max( within ) if within else None
+        print( "\nMaior quantidade de sessões com p95 <= {:.0f} ms: {}".format(
+            args.p95_budget_ms, best if best is not None else "nenhuma" ) )
+
+    if args.output:
+        with open( args.output, "w" ) as f:
+            json.dump( { "rss_empty_mb": round( rss_empty, 1 ), "rss_base_mb": round( rss_base, 1 ),
+                         "think_ms": args.think_ms, "duration_s": args.duration,
+                         "p95_budget_ms": args.p95_budget_ms, "max_sessions_in_budget": best,
+                         "results": results }, f, indent=2 )
+        print( "\nResultados gravados em {}".format( args.output ) )
+
+    return 1 if any( r["n_errors"] for r in results ) else 0
+
+
+if __name__ == "__main__":
+    sys.exit( main() )
@@ -0,0 +1,224 @@
+#Benchmarks das funções do dashboard, sem o Streamlit.
+#
+#Uso:
+#    python -m benchmarks.run --rows 45000 1000000 10000000 --output results.json
+#    python -m benchmarks.run --rows 45000 --compare results_antigo.json
+#
+#Para cada tamanho, gera ( ou reaproveita ) um CSV sintético e mede o tempo e o pico de memória
+#de cada etapa. O resultado é gravado em JSON para poder comparar execuções.
+
+#Bibliotecas necessárias
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_csv
+from utils.cube import OrderCube, clear_aggregation_cache, slice_cube
+from utils.data import append_frame, clean_code, concat_frames, memory_report, read_raw_csv
+from utils.filters import FilterIndex, filter_frame
+from utils.visao_empresa import country_maps_data, order_by_week, order_metric, order_share_by_week
+from utils.visao_entregadores import top_delivers
+from utils.visao_restaurantes import avg_restaurant_city, avg_std_time_delivery
+
+DEFAULT_ROWS = [ 45_000, 1_000_000, 10_000_000 ]
+DEFAULT_DATA_DIR = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), "data" )
+
+#Estado padrão da barra lateral e um estado mais restrito
+ALL_TRAFFIC = [ "Low", "Medium", "High", "Jam" ]
+ALL_WEATHER = [ "conditions Cloudy", "conditions Fog", "conditions Sandstorms",
+                "conditions Stormy", "conditions Sunny", "conditions Windy" ]
+ALL_CITIES = [ "Metropolitian", "Urban", "Semi-Urban" ]
+FILTER_STATES = {
+    "default": ( datetime.datetime( 2022, 4, 13 ), ALL_TRAFFIC, ALL_WEATHER, ALL_CITIES ),
+    "narrow": ( datetime.datetime( 2022, 3, 20 ), [ "Jam", "High" ], ALL_WEATHER[:3], [ "Urban" ] ),
+}
+
+#Lotes novos adicionados ao data frame limpo ( ver utils.data.append_frame ): quantidade e linhas por lote
+APPEND_BATCHES = 20
+APPEND_BATCH_ROWS = 1_000
+
+#-------------------
+#Funções
+#-------------------
+def measure( func, repeat=3, memory=True ):
+    """ Esta função tem a responsabilidade de medir uma etapa
+
+        Roda a etapa repeat vezes para medir o tempo e, se memory=True, mais uma vez com o
+        tracemalloc ligado para medir o pico de memória ( o tracemalloc deixa a execução mais lenta,
+        por isso essa rodada não entra no tempo ). Os caches de agregação são limpos antes de cada rodada.
+
+        Input: Função sem argumentos, número de repetições e se deve medir memória
+        Output: ( resultado da última execução, dicionário com as medidas )
+    """
+    times = []
+    result = None
+    for _ in range( repeat ):
+        clear_aggregation_cache()
+        start = time.perf_counter()
+        result = func()
+        times.append( time.perf_counter() - start )
+
+    stats = { "wall_s": times, "wall_s_min": min( times ), "wall_s_median": float( np.median( times ) ) }
+
+    if memory:
+        clear_aggregation_cache()
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats["peak_mb"] = peak / 2**20
+
+    return result, stats
+
+
+def run_size( csv_path, repeat, memory ):
+    """ Esta função tem a responsabilidade de medir todas as etapas para um CSV
+
+        Input: Caminho do CSV, repetições e se deve medir memória
+        Output: Lista de dicionários ( um por etapa )
+    """
+    results = []
+
+    def step( name, func, n_repeat=repeat ):
+        value, stats = measure( func, n_repeat, memory )
+        stats["step"] = name
+        results.append( stats )
+        print( "  {:<32} {:>10.4f} s{}".format(
+            name, stats["wall_s_min"], "  {:>9.1f} MB".format( stats["peak_mb"] ) if memory else "" ) )
+        return value
+
+    raw = step( "read_raw_csv", lambda: read_raw_csv( csv_path ), 1 )
+    df = step( "clean_code", lambda: clean_code( raw ), 1 )
+    del raw
+
+    #Memória do data frame limpo, com os tipos compactos e com os tipos antigos ( ver utils.data.memory_report )
+    total = memory_report( df ).loc["total"]
+    results.append( { "step": "frame_memory", "before_bytes": int( total["before_bytes"] ),
+                      "after_bytes": int( total["after_bytes"] ) } )
+    print( "  {:<32} {:>10.1f} MB -> {:.1f} MB".format(
+        "frame_memory", total["before_bytes"] / 1024 ** 2, total["after_bytes"] / 1024 ** 2 ) )
+
+    append_batches( df, results )
+
+    index = step( "filter_index_build", lambda: FilterIndex( df ), 1 )
+    cube = step( "order_cube_build", lambda: OrderCube( df ), 1 )
+
+    for state, values in FILTER_STATES.items():
+        step( "filter_chain[{}]".format( state ), lambda: ( filter_frame( df, *values ), slice_cube( cube, *values ) ) )
+
+    df1 = filter_frame( df, *FILTER_STATES["default"] )
+    cube1 = slice_cube( cube, *FILTER_STATES["default"] )
+
+    step( "order_metric", lambda: order_metric( cube1 ) )
+    step( "order_by_week", lambda: order_by_week( df1 ) )
+    step( "order_share_by_week", lambda: order_share_by_week( df1 ) )
+    step( "country_maps_data", lambda: country_maps_data( df1 ) )
+    step( "top_delivers[asc+desc]", lambda: ( top_delivers( df1, top_asc=True ), top_delivers( df1, top_asc=False ) ) )
+    step( "avg_std_time_delivery[x4]", lambda: [ avg_std_time_delivery( cube1, festival, op )
+                                                  for festival in ( "Yes", "No" )
+                                                  for op in ( "avg_time", "std_time" ) ] )
+    step( "avg_restaurant_city", lambda: avg_restaurant_city( cube1 ) )
+
+    del index
+    return results
+
+
+def append_batches( df, results ):
+    """ Esta função tem a responsabilidade de medir o custo de cada lote novo adicionado ao histórico
+
+        Adiciona APPEND_BATCHES lotes de APPEND_BATCH_ROWS linhas, um depois do outro, com o append_frame
+        ( o primeiro lote copia o histórico para o espaço reservado; os demais copiam só o lote ) e com o
+        concat_frames ( copia o histórico a cada lote ). O tempo por lote deve depender do tamanho do lote,
+        não do tamanho do histórico.
+
+        Input: Dataframe limpo ( o histórico ) e lista onde os resultados são adicionados
+        Output: None
+    """
+    batch = df.iloc[:APPEND_BATCH_ROWS]
+    for name, append in ( ( "append_frame", append_frame ), ( "concat_frames", lambda old, new: concat_frames( [ old, new ] ) ) ):
+        current, times = df, []
+        for _ in range( APPEND_BATCHES ):
+            start = time.perf_counter()
+            current = append( current, batch )
+            times.append( time.perf_counter() - start )
+        del current
+
+        stats = { "step": "append_batch[{}]".format( name ), "first_s": times[0],
+                  "wall_s": times[1:], "wall_s_min": min( times[1:] ), "wall_s_median": float( np.median( times[1:] ) ) }
+        results.append( stats )
+        print( "  {:<32} {:>10.4f} s  ( primeiro lote {:.4f} s )".format( stats["step"], stats["wall_s_median"], times[0] ) )
+
+
+def environment():
+    """ Retorna as versões e a máquina usadas no benchmark """
+    try:
+        commit = subprocess.run( [ "git", "rev-parse", "--short", "HEAD" ], capture_output=True, text=True,
+                                 cwd=os.path.dirname( os.path.abspath( __file__ ) ) ).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {
+        "timestamp": datetime.datetime.now().isoformat( timespec="seconds" ),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare( results, baseline_path ):
+    """ Esta função tem a responsabilidade de comparar esta execução com uma anterior
+
+        Input: Resultados desta execução e caminho do JSON anterior
+        Output: None ( imprime a razão entre os tempos, < 1 = mais rápido agora )
+    """
+    with open( baseline_path ) as f:
+        baseline = { ( r["rows"], r["step"] ): r for r in json.load( f )["results"] }
+
+    print( "\nComparação com {}".format( baseline_path ) )
+    for r in results:
+        old = baseline.get( ( r["rows"], r["step"] ) )
+        if old is None or not old.get( "wall_s_min" ) or not r.get( "wall_s_min" ):
+            continue
+        print( "  {:>10} {:<32} {:>7.2f}x".format( r["rows"], r["step"], r["wall_s_min"] / old["wall_s_min"] ) )
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description="Benchmarks das funções do dashboard" )
+    parser.add_argument( "--rows", type=int, nargs="+", default=DEFAULT_ROWS )
+    parser.add_argument( "--repeat", type=int, default=3 )
+    parser.add_argument( "--no-memory", action="store_true", help="não mede o pico de memória" )
+    parser.add_argument( "--data-dir", default=DEFAULT_DATA_DIR, help="pasta dos CSVs sintéticos" )
+    parser.add_argument( "--output", default="bench_results.json" )
+    parser.add_argument( "--compare", help="JSON de uma execução anterior" )
+    args = parser.parse_args( argv )
+
+    results = []
+    for n_rows in args.rows:
+        csv_path = synthetic_csv( n_rows, args.data_dir )
+        print( "{} linhas ( {} )".format( n_rows, csv_path ) )
+        for r in run_size( csv_path, args.repeat, not args.no_memory ):
+            r["rows"] = n_rows
+            results.append( r )
+
+    with open( args.output, "w" ) as f:
+        json.dump( { "environment": environment(), "results": results }, f, indent=2 )
+    print( "\nResultados gravados em {}".format( args.output ) )
+
+    if args.compare:
+        compare( results, args.compare )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#Gerador de dados sintéticos no mesmo formato do train.csv, para os benchmarks.
+#
+#Uso:
+#    python -m benchmarks.synthetic --rows 1000000 --output synthetic_1000000.csv
+
+#Bibliotecas necessárias
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+#Cardinalidades parecidas com as do train.csv original
+N_COURIERS = 1320
+N_RESTAURANTS = 400
+CITIES = [ "Metropolitian ", "Urban ", "Semi-Urban " ]
+CITY_WEIGHTS = [ 0.75, 0.22, 0.03 ]
+TRAFFIC = [ "Low ", "Jam ", "Medium ", "High " ]
+WEATHER = [ "conditions Cloudy", "conditions Fog", "conditions Sandstorms",
+            "conditions Stormy", "conditions Sunny", "conditions Windy" ]
+ORDER_TYPES = [ "Snack ", "Meal ", "Drinks ", "Buffet " ]
+VEHICLES = [ "motorcycle ", "scooter ", "electric_scooter ", "bicycle " ]
+CITY_CODES = [ "INDO", "BANG", "COIMB", "CHEN", "HYD", "RANCHI", "MYS", "DEH", "KOC", "PUNE",
+               "LUDH", "KNP", "MUM", "KOL", "JAP", "SUR", "GOA", "AURG", "AGR", "VAD", "ALH", "BHP" ]
+
+#Período das datas dos pedidos
+FIRST_DATE = pd.Timestamp( 2022, 2, 11 )
+N_DAYS = 55
+
+#Proporção de valores ausentes ( texto "NaN " ) por coluna
+NAN_RATES = {
+    "Delivery_person_Age": 0.04,
+    "multiple_deliveries": 0.02,
+    "Road_traffic_density": 0.013,
+    "City": 0.026,
+    "Festival": 0.005,
+    "Weatherconditions": 0.013,
+}
+
+#Proporção de coordenadas de restaurante zeradas ou com o sinal trocado
+ZERO_COORD_RATE = 0.008
+NEGATIVE_COORD_RATE = 0.008
+
+#-------------------
+#Funções
+#-------------------
+def _sentinel( rng, values, rate ):
+    """ Troca uma fração dos valores pelo texto "NaN " """
+    values = np.asarray( values, dtype=object )
+    values[rng.random( len( values ) ) < rate] = "NaN "
+    return values
+
+
+def _couriers( rng ):
+    """ Cria a tabela fixa de entregadores ( id, idade, avaliação, veículo ) """
+    codes = np.array( CITY_CODES, dtype=object )[rng.integers( 0, len( CITY_CODES ), N_COURIERS )]
+    ids = np.array( [ "{}RES{:02d}DEL0{} ".format( code, i % 20 + 1, i % 3 + 1 )
+                      for i, code in enumerate( codes ) ], dtype=object )
+    ids = pd.unique( ids )
+    return {
+        "id": ids,
+        "age": rng.integers( 20, 40, len( ids ) ),
+        "rating": np.round( np.clip( rng.normal( 4.6, 0.3, len( ids ) ), 1, 5 ), 1 ),
+    }
+
+
+def _restaurants( rng ):
+    """ Cria a tabela fixa de restaurantes ( latitude, longitude ) """
+    return {
+        "lat": rng.uniform( 9.0, 31.0, N_RESTAURANTS ),
+        "lon": rng.uniform( 72.0, 88.5, N_RESTAURANTS ),
+    }
+
+
+def generate_chunk( rng, n_rows, first_id=0, couriers=None, restaurants=None ):
+    """ Esta função tem a responsabilidade de gerar pedidos sintéticos
+
+        Input:
+            - rng: numpy Generator
+            - n_rows: Quantidade de pedidos
+            - first_id: Número do primeiro pedido ( para os IDs não se repetirem entre blocos )
+            - couriers, restaurants: Tabelas fixas ( criadas na hora se None )
+        Output: Dataframe com as mesmas colunas e o mesmo formato de texto do train.csv
+    """
+    couriers = couriers if couriers is not None else _couriers( rng )
+    restaurants = restaurants if restaurants is not None else _restaurants( rng )
+
+    courier = rng.integers( 0, len( couriers["id"] ), n_rows )
+    restaurant = rng.integers( 0, N_RESTAURANTS, n_rows )
+
+    rest_lat = restaurants["lat"][restaurant].copy()
+    rest_lon = restaurants["lon"][restaurant].copy()
+    deli_lat = rest_lat + rng.uniform( 0.01, 0.15, n_rows )
+    deli_lon = rest_lon + rng.uniform( 0.01, 0.15, n_rows )
+
+    zero = rng.random( n_rows ) < ZERO_COORD_RATE
+    rest_lat[zero] = 0.0
+    rest_lon[zero] = 0.0
+    deli_lat[zero] = rng.uniform( 0.01, 0.15, zero.sum() )
+    deli_lon[zero] = rng.uniform( 0.01, 0.15, zero.sum() )
+    rest_lat[rng.random( n_rows ) < NEGATIVE_COORD_RATE] *= -1
+
+    age = couriers["age"][courier].astype( str )
+    age = _sentinel( rng, age, NAN_RATES["Delivery_person_Age"] )
+    rating = np.where( age == "NaN ", "NaN ", couriers["rating"][courier].astype( str ) )
+
+    traffic = rng.integers( 0, len( TRAFFIC ), n_rows )
+    weather = rng.integers( 0, len( WEATHER ), n_rows )
+    time_taken = np.clip( rng.normal( 26, 9, n_rows ) + 3 * traffic, 10, 54 ).astype( int )
+
+    dates = FIRST_DATE + pd.to_timedelta( rng.integers( 0, N_DAYS, n_rows ), unit="D" )
+    minutes = rng.integers( 8 * 60, 23 * 60, n_rows )
+    ordered = pd.Series( minutes // 60 ).astype( str ).str.zfill( 2 ) + ":" + pd.Series( minutes % 60 ).astype( str ).str.zfill( 2 ) + ":00"
+    picked = pd.Series( ( minutes + 10 ) // 60 % 24 ).astype( str ).str.zfill( 2 ) + ":" + pd.Series( ( minutes + 10 ) % 60 ).astype( str ).str.zfill( 2 ) + ":00"
+
+    ids = pd.Series( np.arange( first_id, first_id + n_rows ) ).map( "0x{:x} ".format )
+
+    return pd.DataFrame( {
+        "ID": ids.to_numpy(),
+        "Delivery_person_ID": couriers["id"][courier],
+        "Delivery_person_Age": age,
+        "Delivery_person_Ratings": rating,
+        "Restaurant_latitude": np.round( rest_lat, 6 ),
+        "Restaurant_longitude": np.round( rest_lon, 6 ),
+        "Delivery_location_latitude": np.round( deli_lat, 6 ),
+        "Delivery_location_longitude": np.round( deli_lon, 6 ),
+        "Order_Date": dates.strftime( "%d-%m-%Y" ),
+        "Time_Orderd": _sentinel( rng, ordered.to_numpy( dtype=object ), 0.04 ),
+        "Time_Order_picked": picked.to_numpy( dtype=object ),
+        "Weatherconditions": np.where( rng.random( n_rows ) < NAN_RATES["Weatherconditions"],
+                                       "conditions NaN", np.array( WEATHER, dtype=object )[weather] ),
+        "Road_traffic_density": _sentinel( rng, np.array( TRAFFIC, dtype=object )[traffic], NAN_RATES["Road_traffic_density"] ),
+        "Vehicle_condition": rng.integers( 0, 3, n_rows ),
+        "Type_of_order": np.array( ORDER_TYPES, dtype=object )[rng.integers( 0, len( ORDER_TYPES ), n_rows )],
+        "Type_of_vehicle": np.array( VEHICLES, dtype=object )[rng.integers( 0, len( VEHICLES ), n_rows )],
+        "multiple_deliveries": _sentinel( rng, rng.integers( 0, 4, n_rows ).astype( str ), NAN_RATES["multiple_deliveries"] ),
+        "Festival": _sentinel( rng, np.where( rng.random( n_rows ) < 0.02, "Yes ", "No " ), NAN_RATES["Festival"] ),
+        "City": _sentinel( rng, np.array( CITIES, dtype=object )[rng.choice( len( CITIES ), n_rows, p=CITY_WEIGHTS )],
+                           NAN_RATES["City"] ),
+        "Time_taken(min)": pd.Series( time_taken ).map( "(min) {}".format ).to_numpy(),
+    } )
+
+
+def write_csv( path, n_rows, seed=0, chunk_size=500_000 ):
+    """ Esta função tem a responsabilidade de gravar um CSV sintético em blocos
+
+        A memória usada depende do tamanho do bloco, não do total de linhas.
+
+        Input: Caminho do CSV, quantidade de linhas, semente e tamanho do bloco
+        Output: Caminho do CSV
+    """
+    rng = np.random.default_rng( seed )
+    couriers = _couriers( rng )
+    restaurants = _restaurants( rng )
+
+    tmp_path = path + ".tmp"
+    written = 0
+    with open( tmp_path, "w", newline="" ) as f:
+        while written < n_rows:
+            n = min( chunk_size, n_rows - written )
+            chunk = generate_chunk( rng, n, written, couriers, restaurants )
+            chunk.to_csv( f, index=False, header=( written == 0 ) )
+            written += n
+    os.replace( tmp_path, path )
+
+    return path
+
+
+def synthetic_csv( n_rows, data_dir, seed=0 ):
+    """ Esta função tem a responsabilidade de devolver um CSV sintético, gerando só se ainda não existir
+
+        Input: Quantidade de linhas, pasta dos arquivos e semente
+        Output: Caminho do CSV
+    """
+    os.makedirs( data_dir, exist_ok=True )
+    path = os.path.join( data_dir, "synthetic_{}_{}.csv".format( n_rows, seed ) )
+    if not os.path.exists( path ):
+        write_csv( path, n_rows, seed )
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description="Gera um CSV sintético no formato do train.csv" )
+    parser.add_argument( "--rows", type=int, default=45_000 )
+    parser.add_argument( "--seed", type=int, default=0 )
+    parser.add_argument( "--output", default="train_synthetic.csv" )
+    args = parser.parse_args()
+
+    write_csv( args.output, args.rows, args.seed )
+    print( "{} linhas gravadas em {}".format( args.rows, args.output ) )
@@ -1,222 +1,59 @@
-#Libraries
-from haversine import haversine
-import plotly.express as px
-import plotly.graph_objects as go
-
 #Bibliotecas necessárias
+#( plotly e folium só são importados quando um gráfico ou mapa é desenhado, ver utils/visao_empresa.py )
 import pandas as pd
 import streamlit as st
+import streamlit.components.v1 as components
 from PIL import Image
-import folium
-from streamlit_folium import folium_static
-
-st.set_page_config( page_title="Visão Empresa", layout="wide" )
-
-#-------------------
-#Funções
-#-------------------
-def clean_code( df1 ):
-    """ Esta função tem a responsabilidade de limpar o data frame
-        
-        Tipos de limpeza:
-        1. Removação dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Removação dos espaços das variáveis de texto
-        4. Formação da coluna de datas
-        5. Limpeza da coluna de tempo ( remoção do texto da variável numérica )
-        
-        Input: Dataframe
-        Output: Dataframe
-    """    
-    
-    #1. Convertendo a coluna AGE de texto para número
-    linhas_selecionadas = (df1["Delivery_person_Age"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    df1["Delivery_person_Age"]=df1["Delivery_person_Age"].astype(int)
-
-    #2. Convertendo a coluna Ratings de texto para número decimal (float)
-    df1["Delivery_person_Ratings"] = df1["Delivery_person_Ratings"].astype(float)
-
-    #3. Convertendo a coluna Order_Date de texto para data
-    df1["Order_Date"] = pd.to_datetime( df1["Order_Date"], format= "%d-%m-%Y")
-
-    #4. Convertendo multiple_deliveries de texto para número inteiro (int)
-    linhas_selecionadas = (df1["multiple_deliveries"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1["multiple_deliveries"] = df1["multiple_deliveries"].astype(int)
-
-    #5. Vamos limpar a coluna Road tirando a linha NaN
-    linhas_selecionadas = (df1["Road_traffic_density"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    #6. Vamos limpar a coluna City tirando a linha NaN
-    linhas_selecionadas = (df1["City"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    #7. Removendo os espacos dentro de strings/texto/object
-    df1.loc[:, "ID"] = df1.loc[:, "ID"].str.strip()
-    df1.loc[:, "Road_traffic_density"] = df1.loc[:, "Road_traffic_density"].str.strip()
-    df1.loc[:, "Delivery_person_ID"] = df1.loc[:, "Delivery_person_ID"].str.strip()
-    df1.loc[:, "Type_of_order"] = df1.loc[:, "Type_of_order"].str.strip()
-    df1.loc[:, "Type_of_vehicle"] = df1.loc[:, "Type_of_vehicle"].str.strip()
-    df1.loc[:, "Festival"] = df1.loc[:, "Festival"].str.strip()
-    df1.loc[:, "City"] = df1.loc[:, "City"].str.strip()
-
-    #8. Limpando a coluna Time_taken
-    df1["Time_taken(min)"] = df1["Time_taken(min)"].apply( lambda x: x.split("(min)")[1])
-    df1["Time_taken(min)"] = df1["Time_taken(min)"].astype(int)
-    
-    return df1
-
-
-def order_metric( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De barras
-        Informação do gráfico: Número de pedidos por dia.
-        
-        Input: Dataframe
-        Output: Gráfico
-    """    
-    #Colunas
-    cols = ["ID", "Order_Date"]
-
-    #Seleção de linhas
-    df_aux = df1.loc[:, cols].groupby(["Order_Date"]).count().reset_index()
-
-    #Desenhar gráficos linhas
-    fig = px.bar(df_aux, x="Order_Date", y="ID")
-            
-    return fig
 
+from utils.cache import Lazy
+from utils.cube import load_cube, slice_cube
+from utils.data import load_data
+from utils.figures import cached_figure
+from utils.filters import filter_frame, filter_rows
+from utils.layout import data_status, lazy_tabs
+from utils.maps import cached_map_html
+from utils.precompute import load_precomputed, precomputed_enabled
+from utils.profiling import debug_panel, profile_step, show_chart, start_run
+from utils.refresh import pin_data_version
+from utils.sketches import approx_enabled, approx_note, load_sketches, slice_sketches
+from utils.sql import load_sql, slice_sql, sql_enabled
+from utils.streaming import (STREAMING_KLL_K, StreamingUnsupported, load_aggregates, slice_aggregates,
+                             streaming_enabled)
+from utils.visao_empresa import ( order_metric,
+                                   traffic_order_share,
+                                   traffic_order_city,
+                                   order_by_week,
+                                   order_share_by_week,
+                                   country_maps,
+                                   delivery_heatmap )
 
-def traffic_order_share( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De barras
-        Informação do gráfico: Distribuição de pedidos por tipo de tráfego.
-        
-        Input: Dataframe
-        Output: Gráfico
-    """
-    
-    df_aux = df1[["ID", "Road_traffic_density"]].groupby(["Road_traffic_density"]).count().reset_index()
-
-    #vou transformar a coluna ID em porcentagem criando uma nova coluna
-    df_aux["entregas_perc"] = df_aux["ID"] / df_aux["ID"].sum()
-
-    fig = px.pie(df_aux, values="entregas_perc", names="Road_traffic_density")
-                
-    return fig
-
-
-def traffic_order_city( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De barras
-        Informação do gráfico: Comparação do volume de pedidos por cidade e tipo de tráfego.
-        
-        Input: Dataframe
-        Output: Gráfico
-    """
-    
-    df_aux = (df1[["ID", "City", "Road_traffic_density"]]
-                 .groupby(["City", "Road_traffic_density"])
-                 .count()
-                 .reset_index())
-
-    fig = px.scatter (df_aux, x="City", y="Road_traffic_density", size="ID", color="City")
-                
-    return fig
-
-
-def order_by_week( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De barras
-        Informação do gráfico: Quantidade de pedidos por semana.
-        
-        Input: Dataframe
-        Output: Gráfico
-    """
-    
-    #Criar as colunas da semana
-    df1["week_of_year"] = df1["Order_Date"].dt.strftime("%U")
-    df_aux = df1.loc[: ,["ID", "week_of_year"]].groupby(["week_of_year"]).count().reset_index()
-    fig = px.line(df_aux, x="week_of_year", y="ID")
-    
-    return fig
-
-
-def order_share_by_week( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De barras
-        Informação do gráfico: Quantidade de pedidos por entregador e por semana.
-        
-        Input: Dataframe
-        Output: Gráfico
-    """
-    
-    # Quantidade de pedidos por semana / Quantidade de entregadores unicos por semana
-    df_aux1 = df1.loc[:, ["ID", "week_of_year"]].groupby(["week_of_year"]).count().reset_index()
-    df_aux2 = df1.loc[:, ["Delivery_person_ID", "week_of_year"]].groupby(["week_of_year"]).nunique().reset_index()
-
-    #aqui vamos juntar os dois date frames
-    df_aux = pd.merge(df_aux1, df_aux2, how="inner")
-            
-    #agora vamos criar uma nova coluna, e essa coluna será usada pra fazer o gráfico
-    df_aux["order_by_deliver"] = df_aux["ID"] / df_aux["Delivery_person_ID"]
+st.set_page_config( page_title="Visão Empresa", layout="wide" )
 
-    fig = px.line(df_aux, x="week_of_year", y="order_by_deliver")
-            
-    return fig
+#Começa a medição desta execução da página ( só com CURRY_PROFILE=1, ver utils/profiling.py )
+start_run( "visao_empresa" )
 
+#Fixa a versão dos dados desta execução: uma versão nova publicada no meio dela só vale para a próxima
+#( a versão nova é construída em segundo plano, ver utils/refresh.py )
+pin_data_version()
 
-def country_maps ( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De barras
-        Informação do gráfico: A localização central de cada cidade por tipo de tráfego.
-        
-        Input: Dataframe
-        Output: Mapa Gráfico
-    """
-    
-    #A biblioteca folium irá me ajudar a fazer um mapa com pinos, por isso importei ela.
-
-    df_aux = (df1.loc[:, ["City", "Road_traffic_density", "Delivery_location_latitude", "Delivery_location_longitude"]]
-                 .groupby(["City", "Road_traffic_density"])
-                 .median()
-                 .reset_index())
-    #Se você observar o código, eu utilizei a MEDIANA e não a MÉDIA, porque? A média altera o valor, por exemplo, se tivermos 2 + 3 = 5, a média disso é 2,5
-    #ou seja, ele alterou para um número que não existia, a Mediana não altera o valor, ela seleciona o número que esta literalmente no meio.
-    #ex: uma lista com [1,2,3,4,5], a mediana irá selecionar o 3, pois é o numero do "meio", caso fosse a média, ela iria somar tudo e dividir por 5.
-            
-    map = folium.Map()
-    #Agora vamos "desenhar" o mapa
-    #As únicas diferenças pra um loop for normal é que, eu preciso por o .iterrows e o INDEX
-    #E NÃO preciso utilizar o LOC e porque? Porque quem criou o folium quis assim.
-            
-    for index, location_info in df_aux.iterrows():
-        folium.Marker([location_info["Delivery_location_latitude"],
-                       location_info["Delivery_location_longitude"]],
-                       popup = location_info[["City", "Road_traffic_density"]]).add_to(map)
-        
-    folium_static( map, width=800, height=600 )
-            
 #-------------------------------------- Início da estrutura lógica do código -------------------------------------------
 
 #--------------------------
 #Import dataset
 #--------------------------
-df=pd.read_csv("train.csv")
-
-#--------------------------
-#Limpando os dados
-#--------------------------
-df1 = clean_code( df )
+#O dataset é lido e limpo uma única vez por processo ( ver utils/data.py )
+#Só as colunas usadas nesta página são lidas do snapshot
+COLUMNS = ["ID", "Order_Date", "Order_Week", "Road_traffic_density", "City", "Delivery_person_ID",
+           "Delivery_location_latitude", "Delivery_location_longitude",
+           "Restaurant_latitude", "Restaurant_longitude"]
+if streaming_enabled():
+    #Modo streaming: o CSV é lido em blocos e só os agregados ficam em memória ( ver utils/streaming.py )
+    aggregates = load_aggregates()
+elif sql_enabled():
+    #Backend SQL: as consultas rodam no DuckDB sobre o snapshot, sem carregar os pedidos ( ver utils/sql.py )
+    engine = load_sql()
+else:
+    df = load_data( columns=COLUMNS )
 
 
 
@@ -265,84 +102,135 @@ City = st.sidebar.multiselect(
 
 st.sidebar.markdown ( """---""" )
 st.sidebar.markdown ( "### Powered by Webert Bortolotti" )
-
-#Filtro de data
-linhas_selecionadas = df1[ "Order_Date" ] < date_slider
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de trânsito
-linhas_selecionadas = df1[ "Road_traffic_density"].isin ( traffic_options )
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de condição climática.
-linhas_selecionadas = df1[ "Weatherconditions"].isin ( weather_conditions )
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de cidade.
-linhas_selecionadas = df1[ "City"].isin ( City )
-df1 = df1.loc[ linhas_selecionadas, : ]
+data_status()
+
+if streaming_enabled():
+    #Os agregados filtrados respondem tanto os gráficos por pedido quanto os de contagem
+    view = slice_aggregates( aggregates, date_slider, traffic_options, weather_conditions, City )
+    cube = view.cube
+elif sql_enabled():
+    #Os filtros vão para o WHERE de cada consulta
+    view = slice_sql( engine, date_slider, traffic_options, weather_conditions, City )
+    cube = view.cube
+else:
+    #Filtros de data, trânsito, condição climática e cidade aplicados no cubo de pedidos,
+    #usado pelos gráficos de contagem
+    cube = slice_cube( load_cube(), date_slider, traffic_options, weather_conditions, City )
+
+#Modo aproximado ( só com os pedidos em memória; o SQL já responde com os valores exatos e o streaming
+#sempre usa sketches, ver utils/streaming.py )
+approximate = approx_enabled() and not ( streaming_enabled() or sql_enabled() )
+
+#Texto mostrado abaixo dos gráficos aproximados ( None quando os valores são exatos )
+if streaming_enabled():
+    note = approx_note( "CURRY_STREAMING=1", STREAMING_KLL_K )
+elif approximate:
+    note = approx_note()
+else:
+    note = None
+
+
+def filtered_orders():
+    """ Pedidos filtrados, montados só pelas seções que usam os pedidos ( Tática e Geográfica ) """
+    if streaming_enabled() or sql_enabled():
+        return view
+
+    #Modo aproximado: entregadores por semana e medianas do mapa saem dos sketches ( ver utils/sketches.py )
+    if approximate:
+        return slice_sketches( load_sketches(), date_slider, traffic_options, weather_conditions, City )
+
+    #Com o pré-cálculo ligado e atualizado, as consultas por semana e as medianas do mapa são lidas dele
+    store = load_precomputed() if precomputed_enabled() else None
+    if store is not None:
+        return store.view( cube, date_slider, traffic_options, weather_conditions, City )
+
+    #Filtros de data, trânsito, condição climática e cidade, aplicados de uma vez só
+    #( o índice dos filtros é construído uma única vez por dataset, ver utils/filters.py )
+    return filter_frame( df, date_slider, traffic_options, weather_conditions, City )
 
 # ============================================================================
 # Layout no StreamLit
 # ============================================================================
 
-tab1, tab2, tab3 = st.tabs( ["Visão Gerencial", "Visão Tática", "Visão Geográfica"] )
+#Só a seção escolhida é calculada e desenhada ( ver utils/layout.py )
+section = lazy_tabs( ["Visão Gerencial", "Visão Tática", "Visão Geográfica"], key="visao_empresa_secao" )
 
-with tab1:
+if section == "Visão Gerencial":
     with st.container ():
         st.markdown( "# Orders by Day" )
-        fig = order_metric( df1 )
-        st.plotly_chart( fig, use_container_width=True )
+        fig = cached_figure( order_metric, cube.key, cube )
+        show_chart( fig, use_container_width=True )
         
         
     with st.container():
         col1, col2 = st.columns(2)
         with col1:
             st.header( "Traffic Order Share" )
-            fig = traffic_order_share( df1 )
-            st.plotly_chart( fig, use_container_width=True )
+            fig = cached_figure( traffic_order_share, cube.key, cube )
+            show_chart( fig, use_container_width=True )
             
                 
         with col2:
             st.header( "Traffic Order City" )
-            fig = traffic_order_city( df1 )
-            st.plotly_chart( fig, use_container_width=True )
+            fig = cached_figure( traffic_order_city, cube.key, cube )
+            show_chart( fig, use_container_width=True )
 
             
 
 
-with tab2:
+elif section == "Visão Tática":
+    #Os pedidos filtrados são compartilhados pelos dois gráficos e só montados se algum não estiver em cache
+    orders = Lazy( filtered_orders )
     with st.container ():
         st.markdown( "# Order by Week" )
-        fig = order_by_week( df1 )
-        st.plotly_chart( fig, use_container_width=True )
+        fig = cached_figure( order_by_week, cube.key, orders )
+        show_chart( fig, use_container_width=True )
         
         
 
     with st.container ():
         st.markdown( "# Order Share by Week" )
-        fig = order_share_by_week( df1 )
-        st.plotly_chart( fig, use_container_width=True )
+        fig = cached_figure( order_share_by_week, cube.key, orders )
+        show_chart( fig, use_container_width=True )
+        if note is not None:
+            st.caption( note )
         
         
 
-with tab3:
+elif section == "Visão Geográfica":
     with st.container ():
         #Observando o gráfico abaixo, podemos ver que na semana 06, tivemos praticamente quase 3 entregas por entregador
         #Já na semana 11, podemos observar que tivemos quase 10 entregas por entregador
         #Com isso, podemos observar que, OU tivemos um aumento de pedidos, OU tivemos uma diminuição de entregadores.
         #Claro que devemos observar demais fatores, porém, já é uma métrica que conseguimos utilizar pra corrigir um possível gap
         st.markdown( "# Country Maps" )
-        country_maps ( df1 )
-        
-        
-        
-    
-
-
-        
-
-
-
+        map_types = ["Centro por cidade e tráfego", "Todas as entregas ( mapa de calor )"]
+        if streaming_enabled():
+            #O mapa de calor precisa das coordenadas de cada pedido, que o modo streaming não guarda
+            map_types = map_types[:1]
+            st.info( str( StreamingUnsupported( "O mapa de calor" ) ) )
+        map_type = st.radio( "Tipo de mapa", map_types, horizontal=True )
+        if map_type == "Centro por cidade e tráfego":
+            map_name, map_builder = "country_maps", lambda: country_maps( filtered_orders() )
+        elif sql_enabled():
+            map_name, map_builder = "delivery_heatmap", lambda: delivery_heatmap( view )
+        else:
+            #As células vêm do índice espacial do dataset inteiro, contando só as linhas filtradas
+            map_name, map_builder = "delivery_heatmap", lambda: delivery_heatmap(
+                df, filter_rows( df, date_slider, traffic_options, weather_conditions, City ) )
+
+        #O HTML do mapa fica em cache por dataset e estado dos filtros ( o cube.key identifica os dois ),
+        #então voltar para esta aba com os mesmos filtros não desenha o mapa de novo
+        html = cached_map_html( ( map_name, ) + cube.key, map_builder )
+        with profile_step( "components.html" ) as step:
+            if step:
+                step.payload_bytes = len( html )
+            components.html( html, width=800, height=600 )
+        if note is not None and map_name == "country_maps":
+            st.caption( note )
 
 
+#--------------------------
+#Tempos desta execução ( painel na barra lateral, só com CURRY_PROFILE=1 )
+#--------------------------
+debug_panel()
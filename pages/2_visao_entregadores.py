@@ -1,117 +1,44 @@
-#Libraries
-from haversine import haversine
-import plotly.express as px
-import plotly.graph_objects as go
-
 #Bibliotecas necessárias
 import pandas as pd
 import streamlit as st
 from PIL import Image
-import folium
-from streamlit_folium import folium_static
+
+from utils.cache import Lazy
+from utils.couriers import PAGE_SIZE, TABLE_COLUMNS
+from utils.cube import load_cube, slice_cube
+from utils.data import load_data
+from utils.filters import filter_frame
+from utils.precompute import load_precomputed, precomputed_enabled
+from utils.layout import data_status, lazy_tabs
+from utils.profiling import debug_panel, show_table, start_run
+from utils.refresh import pin_data_version
+from utils.sql import load_sql, slice_sql, sql_enabled
+from utils.streaming import StreamingUnsupported, load_aggregates, slice_aggregates, streaming_enabled
+from utils.visao_entregadores import (TOP_K, courier_stats_table, overall_metrics, top_delivers)
 
 st.set_page_config( page_title="Visão Entregadores", layout="wide" )
 
-#-------------------
-#Funções
-#-------------------
-def clean_code( df1 ):
-    """ Esta função tem a responsabilidade de limpar o data frame
-        
-        Tipos de limpeza:
-        1. Removação dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Removação dos espaços das variáveis de texto
-        4. Formação da coluna de datas
-        5. Limpeza da coluna de tempo ( remoção do texto da variável numérica )
-        
-        Input: Dataframe
-        Output: Dataframe
-    """    
-    #1. Convertendo a coluna AGE de texto para número
-    linhas_selecionadas = (df1["Delivery_person_Age"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    df1["Delivery_person_Age"]=df1["Delivery_person_Age"].astype(int)
-
-    #2. Convertendo a coluna Ratings de texto para número decimal (float)
-    df1["Delivery_person_Ratings"] = df1["Delivery_person_Ratings"].astype(float)
-
-    #3. Convertendo a coluna Order_Date de texto para data
-    df1["Order_Date"] = pd.to_datetime( df1["Order_Date"], format= "%d-%m-%Y")
-
-    #4. Convertendo multiple_deliveries de texto para número inteiro (int)
-    linhas_selecionadas = (df1["multiple_deliveries"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1["multiple_deliveries"] = df1["multiple_deliveries"].astype(int)
-
-    #5. Vamos limpar a coluna Road tirando a linha NaN
-    linhas_selecionadas = (df1["Road_traffic_density"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    #6. Vamos limpar a coluna City tirando a linha NaN
-    linhas_selecionadas = (df1["City"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    #7. Removendo os espacos dentro de strings/texto/object
-    df1.loc[:, "ID"] = df1.loc[:, "ID"].str.strip()
-    df1.loc[:, "Road_traffic_density"] = df1.loc[:, "Road_traffic_density"].str.strip()
-    df1.loc[:, "Delivery_person_ID"] = df1.loc[:, "Delivery_person_ID"].str.strip()
-    df1.loc[:, "Type_of_order"] = df1.loc[:, "Type_of_order"].str.strip()
-    df1.loc[:, "Type_of_vehicle"] = df1.loc[:, "Type_of_vehicle"].str.strip()
-    df1.loc[:, "Festival"] = df1.loc[:, "Festival"].str.strip()
-    df1.loc[:, "City"] = df1.loc[:, "City"].str.strip()
-
-    #8. Limpando a coluna Time_taken
-    df1["Time_taken(min)"] = df1["Time_taken(min)"].apply( lambda x: x.split("(min)")[1])
-    df1["Time_taken(min)"] = df1["Time_taken(min)"].astype(int)
-    
-    return df1
-
-def top_delivers ( df1, top_asc ):
-    """ Esta função tem a responsabilidade de plotar um data frame
-        
-        Data frame contém: Informações sobre os entregadores mais rápidos e lentos por cidade
-        
-        Input: Dataframe
-        Output: Dataframe filtrado
-    """    
-    #Na coluna Time_taken(min), temos um problema, pois a informação está ''suja'' com a informação (min)
-    #Aqui, vamos usar o .apply, é um comando que permite que a gente aplique outro comando linha a linha, ou seja:
-    #então quando eu uso o df1["Time_taken(min)"].apply, eu to dizendo assim: eu quero aplicar um comando em todas as linhas dessa coluna.
-    #mas qual a função? a função lambda ela é como uma função matemática:
-    #x=10
-    #f(x) = 1*10 + 2*10 + 2*10 = 50
-    #f(x=10) = 50
-    #Então nesse caso meu lambda é o meu f(x)
-    #Quando eu uso o lambda x: x.split eu tenho acesso ao x e quando eu uso .apply, meu x do x.split é exatamente meu valor de linha.
-    #e a cada linha eu estou dando um split("(min)")[1]).
-    #df1["Time_taken(min)"] = df1["Time_taken(min)"].apply( lambda x: x.split("(min)")[1])
-    #df1["Time_taken(min)"] = df1["Time_taken(min)"].astype(int)
-    #fiz a limpeza la em cima na área de limpeza, então o código acima está la naquela área.
-
-    df2 = ( df1.loc[:, ["Delivery_person_ID", "Time_taken(min)", "City"]]
-               .groupby(["Delivery_person_ID", "City"])
-               .min()
-               .sort_values(["City", "Time_taken(min)"], ascending=top_asc)
-               .reset_index())
-
-    df_aux01 = df2.loc[df2["City"] == "Metropolitian", :].head(10)
-    df_aux02 = df2.loc[df2["City"] == "Urban", :].head(10)
-    df_aux03 = df2.loc[df2["City"] == "Semi-Urban", :].head(10)
-
-    df3 = pd.concat([df_aux01, df_aux02, df_aux03]).reset_index(drop=True)
-    
-    return df3
-  
+#Começa a medição desta execução da página ( só com CURRY_PROFILE=1, ver utils/profiling.py )
+start_run( "visao_entregadores" )
+
+#Fixa a versão dos dados desta execução: uma versão nova publicada no meio dela só vale para a próxima
+#( a versão nova é construída em segundo plano, ver utils/refresh.py )
+pin_data_version()
+
 #-------------------------------------- Início da estrutura lógica do código -------------------------------------------
 #Import dataset
-df = pd.read_csv("train.csv")
-
-#--------------------------
-#Limpando os dados
-#--------------------------
-df1 = clean_code( df )
+#O dataset é lido e limpo uma única vez por processo ( ver utils/data.py )
+#Só as colunas usadas nesta página são lidas do snapshot
+COLUMNS = ["Delivery_person_ID", "Delivery_person_Age", "Delivery_person_Ratings",
+           "Vehicle_condition", "Time_taken(min)", "City", "Type_of_vehicle"]
+if streaming_enabled():
+    #Modo streaming: o CSV é lido em blocos e só os agregados ficam em memória ( ver utils/streaming.py )
+    aggregates = load_aggregates()
+elif sql_enabled():
+    #Backend SQL: as consultas rodam no DuckDB sobre o snapshot, sem carregar os pedidos ( ver utils/sql.py )
+    engine = load_sql()
+else:
+    df = load_data( columns=COLUMNS )
 
 
 
@@ -161,53 +88,70 @@ City = st.sidebar.multiselect(
 
 st.sidebar.markdown ( """---""" )
 st.sidebar.markdown ( "### Powered by Webert Bortolotti" )
-
-#Filtro de data
-linhas_selecionadas = df1[ "Order_Date" ] < date_slider
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de trânsito
-linhas_selecionadas = df1[ "Road_traffic_density"].isin ( traffic_options )
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de condição climática.
-linhas_selecionadas = df1[ "Weatherconditions"].isin ( weather_conditions )
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de cidade.
-linhas_selecionadas = df1[ "City"].isin ( City )
-df1 = df1.loc[ linhas_selecionadas, : ]
+data_status()
+
+if streaming_enabled():
+    #Os agregados filtrados respondem tanto as métricas por entregador quanto as tabelas de avaliação
+    df1 = slice_aggregates( aggregates, date_slider, traffic_options, weather_conditions, City )
+    cube = df1.cube
+elif sql_enabled():
+    #Métricas, avaliações e rankings são consultas com os filtros no WHERE
+    df1 = slice_sql( engine, date_slider, traffic_options, weather_conditions, City )
+    cube = df1.cube
+else:
+    #Os filtros aplicados no cubo de pedidos, usado pelas tabelas de avaliação
+    cube = slice_cube( load_cube(), date_slider, traffic_options, weather_conditions, City )
+
+    #Filtros de data, trânsito, condição climática e cidade, aplicados de uma vez só
+    #( o índice dos filtros é construído uma única vez por dataset, ver utils/filters.py ).
+    #A seleção só é montada se as métricas ou os rankings não estiverem em cache ( ver utils/cache.Lazy )
+    df1 = Lazy( lambda: filter_frame( df, date_slider, traffic_options, weather_conditions, City ) )
+
+    store = load_precomputed() if precomputed_enabled() else None
+    if store is not None:
+        #Métricas e rankings lidos do pré-cálculo, sem filtrar os pedidos ( ver utils/precompute.py );
+        #as avaliações e os rankings com outro k saem dos pedidos filtrados
+        df1 = store.view( cube, date_slider, traffic_options, weather_conditions, City, orders=df1 )
 
 # ============================================================================
 # Layout no StreamLit
 # ============================================================================
 
-tab1, tab2, tab3 = st.tabs( ["Visão Gerencial", "--", "--"] )
+#Só a seção escolhida é calculada e desenhada ( ver utils/layout.py ): a tabela por entregador e os
+#rankings, que olham os pedidos, só rodam quando a seção deles está aberta
+section = lazy_tabs( ["Visão Gerencial", "Avaliações por entregador", "Velocidade de entrega"],
+                     key="visao_entregadores_secao" )
+
+if streaming_enabled() and section != "Visão Gerencial":
+    #A tabela e os rankings precisam de uma linha por entregador, que o modo streaming não guarda
+    st.info( str( StreamingUnsupported( "A seção " + section ) ) )
+    section = None
 
-with tab1:
+if section == "Visão Gerencial":
     with st.container():
         st.title( "Overall Metrics" )
         
         col1, col2, col3, col4 = st.columns ( 4, gap="large" )
+        metricas = overall_metrics( df1, key=cube.key )
         with col1:
 #maior idade dos entregadores            
-            maior_idade = df1.loc[:, "Delivery_person_Age"].max()
+            maior_idade = metricas["maior_idade"]
             col1.metric( "Maior idade", maior_idade )               
 
             
         with col2:
 #menor idade dos entregadores
-            menor_idade = df1.loc[:, "Delivery_person_Age"].min()
+            menor_idade = metricas["menor_idade"]
             col2.metric( "Menor idade", menor_idade )
            
         with col3:
 #melhor condicao de veiculos
-            melhor_condicao = df1.loc[:, "Vehicle_condition"].max()
+            melhor_condicao = metricas["melhor_condicao"]
             col3.metric( "Melhor condição", melhor_condicao ) 
             
         with col4:
 #pior condicao de veiculos
-            pior_condicao = df1.loc[:, "Vehicle_condition"].min()
+            pior_condicao = metricas["pior_condicao"]
             col4.metric( "Pior condição", pior_condicao )
             
     with st.container():
@@ -215,51 +159,64 @@ with tab1:
         st.title( "Avaliações" )
         
         col1, col2 = st.columns ( 2 )
-        with col1:
-            st.markdown( "##### Avaliação média por entregador" )
-            av_media_entregador = round (df1[["Delivery_person_ID", "Delivery_person_Ratings"]]
-                                            .groupby("Delivery_person_ID")
-                                            .mean()
-                                            .reset_index(), 2 )
-            st.dataframe( av_media_entregador )
-
-        with col2:
-#Aqui, vamos aprender a usar a função .agg, onde vamos agregar a média e o desvio padrão em uma linha de código só.
-#Dentro do .agg, a primeira informação é a coluna que vai sofrer a operação, no caso a coluna referente a avaliação
-#A segunda informação é quais dados eu quero saber, no caso quero saber a média e o desvio padrão
+#A média e o desvio padrão saem do cubo de pedidos ( ver utils/cube.py ), que já guarda
+#a quantidade, a soma e a soma dos quadrados das avaliações de cada grupo.
 #Observe que eu alterei o nome dos index pra ficar visualmente mais bonito
+        with col1:
             st.markdown( "#### Avaliação média por trânsito" )
-            av_mean_std_traffic = round (df1[["Delivery_person_Ratings", "Road_traffic_density"]]
-                                            .groupby(["Road_traffic_density"])
-                                            .agg({"Delivery_person_Ratings": ["mean", "std"]}), 2 )
+            av_mean_std_traffic = round (cube.mean_std(["Road_traffic_density"], "Delivery_person_Ratings")
+                                            .set_index("Road_traffic_density"), 2 )
             #Mudança nome das colunas
             av_mean_std_traffic.columns = ["delivery_mean", "delivery_std"]
             #reset index
             av_mean_std_traffic.reset_index()
-            st.dataframe( av_mean_std_traffic )
+            show_table( av_mean_std_traffic )
             
+        with col2:
             st.markdown( "#### Avaliação média por clima" )
-            av_mean_std_weather = round (df1[["Delivery_person_Ratings", "Weatherconditions"]]
-                                            .groupby(["Weatherconditions"])
-                                            .agg({"Delivery_person_Ratings": ["mean", "std"]}), 2)
+            av_mean_std_weather = round (cube.mean_std(["Weatherconditions"], "Delivery_person_Ratings")
+                                            .set_index("Weatherconditions"), 2)
             #Mudança nome das colunas
             av_mean_std_weather.columns = ["delivery_mean", "delivery_std"]
             #reset index
             av_mean_std_weather.reset_index()
-            st.dataframe( av_mean_std_weather )
+            show_table( av_mean_std_weather )
             
+elif section == "Avaliações por entregador":
+    with st.container():
+        st.title( "Avaliação média por entregador" )
+        #As estatísticas por entregador dos pedidos filtrados são calculadas uma única vez por estado dos filtros
+        #( ver utils/couriers.py ), e só a página escolhida é enviada para o navegador
+        stats = courier_stats_table( df1, key=cube.key )
+        busca = st.text_input( "Buscar entregador" )
+        ordem = st.selectbox( "Ordenar por", TABLE_COLUMNS, index=TABLE_COLUMNS.index( "rating_mean" ) )
+        crescente = st.checkbox( "Crescente", value=False )
+        pagina = st.number_input( "Página", min_value=1, value=1 )
+        av_media_entregador, encontrados = stats.page( busca, ordem, crescente, pagina, PAGE_SIZE )
+        show_table( round ( av_media_entregador, 2 ) )
+        st.caption( f"{encontrados} entregadores encontrados" )
+
+
+elif section == "Velocidade de entrega":
     with st.container():
-        st.markdown( """---""" )
         st.title ( "Velocidade de entrega" )
+        top_k = st.number_input( "Entregadores por cidade", min_value=1, max_value=100, value=TOP_K )
         
+        #As duas listas saem de um único cálculo, guardado por dataset e estado dos filtros ( o cube.key identifica os dois )
         col1, col2 = st.columns ( 2 )
         with col1:
             st.markdown( "#### Entregadores mais rápidos" )
-            df3 = top_delivers( df1, top_asc=True )
-            st.dataframe( df3 )
+            df3 = top_delivers( df1, top_asc=True, k=top_k, key=cube.key )
+            show_table( df3 )
             
 
         with col2:
             st.markdown( "#### Entregadores mais lentos" )
-            df3 = top_delivers( df1, top_asc=False )
-            st.dataframe( df3 )
+            df3 = top_delivers( df1, top_asc=False, k=top_k, key=cube.key )
+            show_table( df3 )
+
+
+#--------------------------
+#Tempos desta execução ( painel na barra lateral, só com CURRY_PROFILE=1 )
+#--------------------------
+debug_panel()
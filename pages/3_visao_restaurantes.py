@@ -1,185 +1,47 @@
-#Libraries
-from haversine import haversine
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
-
 #Bibliotecas necessárias
+#( plotly só é importado quando um gráfico é desenhado, ver utils/visao_restaurantes.py )
 import pandas as pd
 import streamlit as st
 from PIL import Image
-import folium
-from streamlit_folium import folium_static
-
-st.set_page_config( page_title="Visão Restaurantes", layout="wide" )
-
-#-------------------
-#Funções
-#-------------------
-def clean_code( df1 ):
-    """ Esta função tem a responsabilidade de limpar o data frame
-        
-        Tipos de limpeza:
-        1. Removação dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Removação dos espaços das variáveis de texto
-        4. Formação da coluna de datas
-        5. Limpeza da coluna de tempo ( remoção do texto da variável numérica )
-        
-        Input: Dataframe
-        Output: Dataframe
-    """    
-    #1. Convertendo a coluna AGE de texto para número
-    linhas_selecionadas = (df1["Delivery_person_Age"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    df1["Delivery_person_Age"]=df1["Delivery_person_Age"].astype(int)
-
-    #2. Convertendo a coluna Ratings de texto para número decimal (float)
-    df1["Delivery_person_Ratings"] = df1["Delivery_person_Ratings"].astype(float)
-
-    #3. Convertendo a coluna Order_Date de texto para data
-    df1["Order_Date"] = pd.to_datetime( df1["Order_Date"], format= "%d-%m-%Y")
-
-    #4. Convertendo multiple_deliveries de texto para número inteiro (int)
-    linhas_selecionadas = (df1["multiple_deliveries"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1["multiple_deliveries"] = df1["multiple_deliveries"].astype(int)
-
-    #5. Vamos limpar a coluna Road tirando a linha NaN
-    linhas_selecionadas = (df1["Road_traffic_density"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    #6. Vamos limpar a coluna City tirando a linha NaN
-    linhas_selecionadas = (df1["City"] != "NaN ")
-    df1 = df1.loc[linhas_selecionadas, :].copy()
 
-    #7. Removendo os espacos dentro de strings/texto/object
-    df1.loc[:, "ID"] = df1.loc[:, "ID"].str.strip()
-    df1.loc[:, "Road_traffic_density"] = df1.loc[:, "Road_traffic_density"].str.strip()
-    df1.loc[:, "Delivery_person_ID"] = df1.loc[:, "Delivery_person_ID"].str.strip()
-    df1.loc[:, "Type_of_order"] = df1.loc[:, "Type_of_order"].str.strip()
-    df1.loc[:, "Type_of_vehicle"] = df1.loc[:, "Type_of_vehicle"].str.strip()
-    df1.loc[:, "Festival"] = df1.loc[:, "Festival"].str.strip()
-    df1.loc[:, "City"] = df1.loc[:, "City"].str.strip()
-
-    #8. Limpando a coluna Time_taken
-    df1["Time_taken(min)"] = df1["Time_taken(min)"].apply( lambda x: x.split("(min)")[1])
-    df1["Time_taken(min)"] = df1["Time_taken(min)"].astype(int)
-    
-    return df1
-
-def distance( df1 ):
-    """ Esta função tem a responsabilidade de mostrar uma informação.
-        
-        Tipo de informação: Tempo Médio das entregas.
-        
-        Input: Dataframe
-        Output: Número mostrando o tempo médio das entregas.
-    """
-    #Pra calcular a distancia entre locais, existe a biblioteca haversine, que já importei la em cima, somado a função lambda,         que percorre linha a linha
-    #você calcula a latitude e longitude do local e ela mostra a distancia entre eles, ai eu crio uma nova coluna chamada             distance, assim dando o resultado.
-    #Final da aula 41 ele explica melhor como funciona a função apply somado ao haversine e ao lambda.
-
-    cols = ["Restaurant_latitude", "Restaurant_longitude", "Delivery_location_latitude", "Delivery_location_longitude"]
-    df1 ["distance"] = df1.loc[0:10, cols].apply(lambda x:
-                                          haversine((x["Restaurant_latitude"], x["Restaurant_longitude"]),
-                                          (x["Delivery_location_latitude"], x["Delivery_location_longitude"])), axis=1)
-
-    avg_distance = round( df1["distance"].mean(), 2 )
-    
-    return avg_distance
-
-def avg_std_time_delivery( df1, festival, op ):
-    """ Esta função calcula o tempo médio e o desvio padrão do tempo de entrega com e sem festival
-        Paramêtros:
-            Input: 
-                - df1: Dataframe com os dados necessários para o cálculo.
-                - op: Tipo de operação que precisa ser calculado;
-                      "avg_time": Calcula o tempo médio;
-                      "std_time": Calcula o desvio padrão do tempo.
-                - festival:
-                      "Yes": Calcula a operação com o festival;
-                      "No": Calcula a operação sem o festival.
-                      
-            Output: 
-                - df: Dataframe com 2 colunas e 1 linha.
-    """
-    df_aux = df1[["Time_taken(min)", "Festival"]].groupby(["Festival"]).agg({"Time_taken(min)": ["mean", "std"]})
-    df_aux.columns=["avg_time", "std_time"]
-    df_aux = df_aux.reset_index()
-
-    df_aux = round( df_aux.loc[df_aux["Festival"] == festival, op ], 2 )
-    
-    return df_aux
-
-def avg_std_time_graph( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De barras
-        Informação do gráfico: Tempo médio de entregas por cidade, com desvio padrão.
-        
-        Input: Dataframe
-        Output: Gráfico
-    """    
-    df_aux = df1[["Time_taken(min)", "City"]].groupby(["City"]).agg({"Time_taken(min)": ["mean", "std"]})
-    df_aux.columns=["avg_time", "std_time"]
-    df_aux = df_aux.reset_index()
-    fig = go.Figure()
-    fig.add_trace( go.Bar( name="Control", x=df_aux["City"], y=df_aux["avg_time"], error_y=dict(type="data",                                             array=df_aux["std_time"]) ) ) 
-    fig.update_layout(barmode="group")
-    
-    return fig
+from utils.cube import load_cube, slice_cube
+from utils.data import load_data
+from utils.figures import cached_figure
+from utils.layout import data_status, lazy_tabs
+from utils.profiling import debug_panel, show_chart, start_run
+from utils.refresh import pin_data_version
+from utils.sql import load_sql, slice_sql, sql_enabled
+from utils.sketches import approx_note
+from utils.streaming import STREAMING_KLL_K, load_aggregates, streaming_enabled
+from utils.visao_restaurantes import ( distance,
+                                        avg_std_time_delivery,
+                                        avg_std_time_graph,
+                                        avg_std_city_traffic,
+                                        avg_restaurant_city )
 
+st.set_page_config( page_title="Visão Restaurantes", layout="wide" )
 
-def avg_std_city_traffic( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De sunburst.
-        Informação do gráfico: Tempo médio e desvio padrão por cidade e tipo de trafego.
-        
-        Input: Dataframe
-        Output: Gráfico
-    """    
-    df_aux =(df1[["Time_taken(min)", "City", "Road_traffic_density"]]
-                .groupby(["City",  "Road_traffic_density"])
-                .agg({"Time_taken(min)": ["mean", "std"]}))
-    df_aux.columns=["avg_time", "std_time"]
-    df_aux = df_aux.reset_index()
-    fig = px.sunburst(df_aux, path=["City", "Road_traffic_density"], values="avg_time",
-                      color="std_time", color_continuous_scale="RdBu",
-                      color_continuous_midpoint=np.average(df_aux["std_time"] ) )
-    
-    return fig
-
+#Começa a medição desta execução da página ( só com CURRY_PROFILE=1, ver utils/profiling.py )
+start_run( "visao_restaurantes" )
 
-def avg_restaurant_city( df1 ):
-    """ Esta função tem a responsabilidade de plotar um gráfico
-        
-        Tipo de gráfico: De pizza.
-        Informação do gráfico: A distância média dos resturantes e locais de entrega.
-        
-        Input: Dataframe
-        Output: Gráfico
-    """    
-    cols = ["Restaurant_latitude", "Restaurant_longitude", "Delivery_location_latitude", "Delivery_location_longitude"]
-    df1 ["distance"] = df1.loc[:, cols].apply(lambda x:
-                          haversine(
-                          (x["Restaurant_latitude"], x["Restaurant_longitude"]),
-                          (x["Delivery_location_latitude"], x["Delivery_location_longitude"])), axis=1)
-    avg_distance = df1[[ "City", "distance" ]].groupby([ "City" ]).mean().reset_index()
-    fig = go.Figure( data=[ go.Pie( labels=avg_distance["City"], values=avg_distance["distance"], pull=[0, 0.1, 0])])
-    
-    return fig
+#Fixa a versão dos dados desta execução: uma versão nova publicada no meio dela só vale para a próxima
+#( a versão nova é construída em segundo plano, ver utils/refresh.py )
+pin_data_version()
 
 #-------------------------------------- Início da estrutura lógica do código -------------------------------------------
 #Import dataset
-df = pd.read_csv("train.csv")
-
-#--------------------------
-#Limpando os dados
-#--------------------------
-df1 = clean_code( df )
+#O dataset é lido e limpo uma única vez por processo ( ver utils/data.py )
+#Só as colunas usadas nesta página são lidas do snapshot
+#( os gráficos e métricas filtrados vêm do cubo de pedidos, ver utils/cube.py )
+COLUMNS = ["Delivery_person_ID"]
+if streaming_enabled():
+    #Modo streaming: o CSV é lido em blocos e só os agregados ficam em memória ( ver utils/streaming.py )
+    aggregates = load_aggregates()
+elif sql_enabled():
+    #Backend SQL: as consultas rodam no DuckDB sobre o snapshot, sem carregar os pedidos ( ver utils/sql.py )
+    engine = load_sql()
+else:
+    df = load_data( columns=COLUMNS )
 
 
 
@@ -228,56 +90,58 @@ City = st.sidebar.multiselect(
 
 st.sidebar.markdown ( """---""" )
 st.sidebar.markdown ( "### Powered by Webert Bortolotti" )
+data_status()
 
-#Filtro de data
-linhas_selecionadas = df1[ "Order_Date" ] < date_slider
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de trânsito
-linhas_selecionadas = df1[ "Road_traffic_density"].isin ( traffic_options )
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de condição climática.
-linhas_selecionadas = df1[ "Weatherconditions"].isin ( weather_conditions )
-df1 = df1.loc[ linhas_selecionadas, : ]
-
-#Filtro de cidade.
-linhas_selecionadas = df1[ "City"].isin ( City )
-df1 = df1.loc[ linhas_selecionadas, : ]
+#Filtros de data, trânsito, condição climática e cidade, aplicados no cubo de pedidos
+#( o cubo é construído uma única vez por dataset, ver utils/cube.py )
+if sql_enabled() and not streaming_enabled():
+    #No backend SQL o cubo filtrado responde as mesmas agregações com consultas
+    cube = slice_sql( engine, date_slider, traffic_options, weather_conditions, City ).cube
+else:
+    cube = slice_cube( aggregates.cube if streaming_enabled() else load_cube(),
+                       date_slider, traffic_options, weather_conditions, City )
 
 # ============================================================================
 # Layout no StreamLit
 # ============================================================================
 
-tab1, tab2, tab3 = st.tabs( ["Visão Gerencial", "--", "--"] )
+#Só a seção escolhida é calculada e desenhada ( ver utils/layout.py )
+section = lazy_tabs( ["Visão Gerencial", "Visão Tática"], key="visao_restaurantes_secao" )
 
-with tab1:
+if section == "Visão Gerencial":
     with st.container():
         st.markdown( "### Overal Metrics" )
         
         col1, col2, col3, col4, col5, col6 = st.columns( 6 )
         with col1:
-            delivery_unique = len(df["Delivery_person_ID"].unique())
-            col1.metric( "ID's únicos", delivery_unique )
+            if streaming_enabled():
+                delivery_unique = aggregates.unique_couriers()
+            elif sql_enabled():
+                delivery_unique = engine.unique_couriers()
+            else:
+                delivery_unique = len(df["Delivery_person_ID"].unique())
+            #No modo streaming a contagem é estimada ( HyperLogLog, ver utils/streaming.py )
+            col1.metric( "ID's únicos", delivery_unique,
+                         help=approx_note( "CURRY_STREAMING=1", STREAMING_KLL_K ) if streaming_enabled() else None )
             
         with col2:
-            avg_distance = distance( df1 )
+            avg_distance = distance( cube )
             col2.metric( "AVG das entregas", avg_distance )
             
         with col3:
-            df_aux = avg_std_time_delivery( df1, "Yes", "avg_time" )
+            df_aux = avg_std_time_delivery( cube, "Yes", "avg_time" )
             col3.metric( "AVG com festival", df_aux )
         
         with col4:
-            df_aux = avg_std_time_delivery( df1, "Yes", "std_time" )
+            df_aux = avg_std_time_delivery( cube, "Yes", "std_time" )
             col4.metric( "STD com festival", df_aux )
             
         with col5:
-            df_aux = avg_std_time_delivery( df1, "No", "avg_time" )
+            df_aux = avg_std_time_delivery( cube, "No", "avg_time" )
             col5.metric( "AVG sem festival", df_aux )
         
         with col6:
-            df_aux = avg_std_time_delivery( df1, "No", "std_time" )
+            df_aux = avg_std_time_delivery( cube, "No", "std_time" )
             col6.metric( "STD sem festival", df_aux )
             
             
@@ -286,33 +150,30 @@ with tab1:
         col1, col2 = st.columns( 2 )
         with col1:
             st.markdown( "#### Tempo médio de entrega por cidade" )
-            fig = avg_std_time_graph( df1 )
-            st.plotly_chart( fig, use_container_width=True )
+            fig = cached_figure( avg_std_time_graph, cube.key, cube )
+            show_chart( fig, use_container_width=True )
             
         with col2:
             st.markdown( "#### AVG e STD por cidade e tipo de pedido" )
-            df_aux =( df1[["Time_taken(min)", "City", "Type_of_order"]]
-                         .groupby(["City", "Type_of_order"])
-                         .agg({"Time_taken(min)":["mean", "std"]}))
-        
-            df_aux.columns=["avg_time", "std_time"]
-            df_aux = df_aux.reset_index()
+            df_aux = cube.mean_std(["City", "Type_of_order"], "Time_taken(min)")
+            df_aux.columns=["City", "Type_of_order", "avg_time", "std_time"]
             df_aux
         
+elif section == "Visão Tática":
     with st.container():
-        st.markdown( """---""" )
-        
         col1, col2 = st.columns( 2 )
         with col1:
             st.markdown( "#### AVG e STD por cidade e tipo de tráfego" )
-            fig = avg_std_city_traffic( df1 )
-            st.plotly_chart( fig, use_container_width=True  )
+            fig = cached_figure( avg_std_city_traffic, cube.key, cube )
+            show_chart( fig, use_container_width=True  )
         
         with col2:
             st.markdown( "#### A distância média dos resturantes e locais de entrega" )
-            fig = avg_restaurant_city( df1 )
-            st.plotly_chart( fig, use_container_width=True  )
-        
-            
-            
-      
\ No newline at end of file
+            fig = cached_figure( avg_restaurant_city, cube.key, cube )
+            show_chart( fig, use_container_width=True  )
+
+
+#--------------------------
+#Tempos desta execução ( painel na barra lateral, só com CURRY_PROFILE=1 )
+#--------------------------
+debug_panel()
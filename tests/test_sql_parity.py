@@ -0,0 +1,17 @@
+#Paridade do backend SQL ( utils/sql.py ) com o pandas num dataset sintético pequeno.
+#
+#Rodar da raiz do projeto: python -m pytest tests
+
+#Bibliotecas necessárias
+import pytest
+
+pytest.importorskip( "duckdb" )
+
+from benchmarks.synthetic import write_csv
+from utils.sql import check_parity, load_sql
+
+
+def test_sql_matches_pandas( tmp_path ):
+    path = write_csv( str( tmp_path / "synthetic.csv" ), n_rows=5000, seed=1 )
+
+    assert check_parity( load_sql( path ), path, n_states=10 ) == []
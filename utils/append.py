@@ -0,0 +1,103 @@
+#Adiciona pedidos novos ao dataset sem limpar o histórico de novo.
+#
+#Uso:
+#    python -m utils.append novos_pedidos.csv
+#    python -m utils.append novos_pedidos.csv --data train.csv
+
+#Bibliotecas necessárias
+import argparse
+import threading
+
+from utils import snapshot
+from utils.data import DATA_PATH, append_cached, clean_code, clean_report, read_raw_csv, snapshot_parts, source_fingerprint
+from utils.sketches import append_sketches
+from utils.streaming import append_aggregates
+
+#Só um lote é adicionado por vez em cada processo
+_append_lock = threading.Lock()
+
+#-------------------
+#Funções
+#-------------------
+def _append_text( batch_path, path ):
+    """ Copia as linhas do lote para o fim do CSV, sem o cabeçalho
+
+        O texto é copiado como está, então o CSV continua idêntico a um arquivo
+        que já tivesse esses pedidos desde o início.
+    """
+    with open( path, "rb" ) as f:
+        header = f.readline()
+        f.seek( -1, 2 )
+        needs_newline = f.read( 1 ) != b"\n"
+
+    with open( batch_path, "rb" ) as f:
+        batch_header = f.readline()
+        rows = f.read()
+
+    if batch_header.strip() != header.strip():
+        raise ValueError( "O cabeçalho de {} é diferente do cabeçalho de {}".format( batch_path, path ) )
+
+    if rows and not rows.endswith( b"\n" ):
+        rows += b"\n"
+
+    with open( path, "ab" ) as f:
+        if needs_newline:
+            f.write( b"\n" )
+        f.write( rows )
+
+
+def append_csv( batch_path, path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de adicionar um lote de pedidos novos ao dataset
+
+        Passos:
+        1. Limpa só o lote, com as mesmas regras do clean_code ( inclusive a coluna distance )
+        2. Copia as linhas do lote para o fim do CSV
+        3. Grava o lote limpo como uma parte nova do snapshot ( as partes antigas não são reescritas )
+        4. Atualiza os data frames, o cubo, os agregados e os sketches em cache neste processo só com o lote
+
+        Outros processos ( ex: o dashboard ) veem o CSV novo na próxima execução e leem só a parte nova
+        do snapshot, juntando-a às versões que já têm em memória ( ver utils.data.appended_rows ).
+
+        Input: Caminho do CSV do lote ( mesmo formato e cabeçalho do train.csv ) e caminho do dataset
+        Output: Relatório do clean_code do lote
+    """
+    with _append_lock:
+        old_fingerprint = source_fingerprint( path )
+        snap_path = snapshot.snapshot_path( path )
+        metadata = snapshot.read_metadata( snap_path )
+
+        fresh = snapshot.is_fresh( snap_path, old_fingerprint )
+
+        #Os índices do lote continuam a numeração das linhas do CSV, igual a uma limpeza completa
+        raw = read_raw_csv( batch_path )
+        if fresh:
+            raw.index = raw.index + metadata.get( "clean_report", {} ).get( "rows_in", 0 )
+        batch = clean_code( raw )
+
+        _append_text( batch_path, path )
+        new_fingerprint = source_fingerprint( path )
+
+        #Sem um snapshot atualizado não dá para saber a numeração das linhas: o snapshot e os
+        #data frames em cache são refeitos por completo na próxima leitura
+        if fresh:
+            try:
+                snapshot.append_snapshot( batch, snap_path, old_fingerprint, new_fingerprint )
+            except OSError:
+                pass
+            append_cached( batch, old_fingerprint, new_fingerprint, parts=snapshot_parts( path, new_fingerprint ) )
+
+        append_aggregates( batch, old_fingerprint, new_fingerprint )
+        append_sketches( batch, old_fingerprint, new_fingerprint )
+
+    return clean_report( batch )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description="Adiciona pedidos novos ao dataset" )
+    parser.add_argument( "batch", help="CSV com os pedidos novos ( mesmo formato do train.csv )" )
+    parser.add_argument( "--data", default=DATA_PATH, help="CSV do dataset" )
+    args = parser.parse_args()
+
+    report = append_csv( args.batch, args.data )
+    print( "{} pedidos lidos, {} adicionados, {} removidos na limpeza".format(
+        report["rows_in"], report["rows_out"], report["rows_dropped"] ) )
@@ -0,0 +1,153 @@
+#Bibliotecas necessárias
+import threading
+from collections import OrderedDict
+
+#Lock de cada chave em construção no build_once, por ( id do cache, chave )
+_building = {}
+_building_lock = threading.Lock()
+
+#-------------------
+#Funções
+#-------------------
+class LRUCache:
+    """ Esta classe tem a responsabilidade de guardar resultados já calculados
+
+        Guarda no máximo maxsize itens; quando enche, descarta o item usado há mais tempo ( LRU ).
+        Com maxbytes, também descarta os itens mais antigos enquanto a soma de sizeof( item )
+        passar de maxbytes ( um item maior que maxbytes não é guardado ).
+        Pode ser usada por várias sessões ao mesmo tempo ( thread-safe ) e conta acertos e erros.
+    """
+
+    def __init__( self, maxsize=256, maxbytes=None, sizeof=len ):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__( self ):
+        return len( self._items )
+
+    def get( self, key, default=None ):
+        """ Retorna o item da chave ( e marca como usado agora ), ou default se não existir """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end( key )
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def put( self, key, value ):
+        """ Guarda o item, descartando os mais antigos se passar do limite """
+        size = self.sizeof( value ) if self.maxbytes is not None else 0
+        with self._lock:
+            self._discard( key )
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+
+            self._items[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            while len( self._items ) > self.maxsize or ( self.maxbytes is not None and self.nbytes > self.maxbytes ):
+                self._discard( next( iter( self._items ) ) )
+
+    def _discard( self, key ):
+        """ Descarta um item ( chamada com o lock ) """
+        if key in self._items:
+            del self._items[key]
+            self.nbytes -= self._sizes.pop( key )
+
+    def get_or_compute( self, key, builder ):
+        """ Esta função tem a responsabilidade de calcular cada resultado uma única vez
+
+            Input: Chave ( precisa ser hashable ) e função sem argumentos que calcula o resultado
+            Output: O resultado guardado, ou o recém calculado
+        """
+        missing = object()
+        value = self.get( key, missing )
+        if value is missing:
+            value = builder()
+            self.put( key, value )
+        return value
+
+    def clear( self ):
+        """ Descarta todos os itens """
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def stats( self ):
+        """ Retorna os contadores de acertos e erros, o número de itens guardados e os bytes usados """
+        with self._lock:
+            return { "hits": self.hits, "misses": self.misses, "size": len( self._items ), "maxsize": self.maxsize,
+                     "bytes": self.nbytes, "maxbytes": self.maxbytes }
+
+
+class Lazy:
+    """ Esta classe tem a responsabilidade de adiar um cálculo até ele ser necessário
+
+        Usada nas páginas para os pedidos filtrados: quando os gráficos e tabelas da execução já estão
+        nos caches compartilhados ( ver utils/figures.py ), a sessão nem chega a montar a sua cópia filtrada.
+        O resultado é calculado uma única vez por objeto.
+    """
+
+    def __init__( self, builder ):
+        self.builder = builder
+        self._value = None
+        self._built = False
+
+    def get( self ):
+        """ Retorna o resultado, calculando na primeira chamada """
+        if not self._built:
+            self._value = self.builder()
+            self._built = True
+        return self._value
+
+
+def resolve( value ):
+    """ Retorna o resultado de um Lazy, ou o próprio valor se não for um Lazy """
+    return value.get() if isinstance( value, Lazy ) else value
+
+
+def build_once( cache, lock, key, builder, store=None ):
+    """ Esta função tem a responsabilidade de ler um valor de um cache, construindo uma única vez se faltar
+
+        O lock do cache só é usado para ler e guardar: a construção ( que pode levar segundos, ex: limpar
+        o CSV ) acontece fora dele, com um lock só daquela chave. Assim, quem pede outra chave ( ex: a versão
+        atual do dataset, enquanto a próxima é construída em segundo plano ) não espera, e quem pede a
+        mesma chave espera a construção em andamento em vez de construir de novo.
+
+        Input: Dicionário do cache, lock do cache, chave, função que constrói o valor e função que guarda
+               o valor ( store( key, value ), chamada com o lock; padrão: cache[key] = value )
+        Output: Valor guardado na chave
+    """
+    with lock:
+        if key in cache:
+            return cache[key]
+
+    building_key = ( id( cache ), key )
+    with _building_lock:
+        key_lock = _building.setdefault( building_key, threading.Lock() )
+
+    try:
+        with key_lock:
+            with lock:
+                if key in cache:
+                    return cache[key]
+
+            value = builder()
+            with lock:
+                if store is None:
+                    cache[key] = value
+                else:
+                    store( key, value )
+            return value
+    finally:
+        with _building_lock:
+            _building.pop( building_key, None )
@@ -0,0 +1,273 @@
+#Bibliotecas necessárias
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.cube import moments
+from utils.data import derived, register_updater
+from utils.profiling import profiled
+
+#Colunas que as estatísticas por entregador precisam ler do dataset
+COURIER_COLUMNS = [ "Delivery_person_ID", "Time_taken(min)", "Delivery_person_Ratings",
+                    "Delivery_person_Age", "Type_of_vehicle", "City" ]
+
+#Somas guardadas por entregador e como juntar cada uma entre partes do dataset
+SUMS = {
+    "orders": "sum",
+    "time_count": "sum",
+    "time_sum": "sum",
+    "time_min": "min",
+    "time_max": "max",
+    "rating_count": "sum",
+    "rating_sum": "sum",
+    "rating_sumsq": "sum",
+    "age_min": "min",
+    "age_max": "max",
+}
+
+#Colunas da tabela mostrada na página ( ver CourierStats.table )
+TABLE_COLUMNS = [ "Delivery_person_ID", "orders", "time_mean", "time_min", "time_max",
+                  "rating_mean", "rating_std", "age", "vehicles", "cities" ]
+
+#Quantidade padrão de entregadores por página
+PAGE_SIZE = 50
+
+#-------------------
+#Funções
+#-------------------
+def _bits( values, labels ):
+    """ Máscara de bits de cada linha: o bit i indica labels[i] ( valores ausentes não marcam bit ) """
+    codes = pd.Index( labels ).get_indexer( values )
+    return np.where( codes >= 0, np.left_shift( 1, np.maximum( codes, 0 ) ), 0 ).astype( np.int64 )
+
+
+def _remap( masks, labels, new_labels ):
+    """ Traduz máscaras de bits de uma lista de categorias para outra que contém a primeira """
+    positions = pd.Index( new_labels ).get_indexer( labels )
+    result = np.zeros( len( masks ), dtype=np.int64 )
+    for old, new in enumerate( positions ):
+        result |= ( ( masks >> old ) & 1 ) << new
+    return result
+
+
+def _group( values, keys=() ):
+    """ Agrupa as linhas por entregador e keys ( colunas ou índices ): somas e máscaras de bits """
+    grouped = values.groupby( [ "Delivery_person_ID" ] + list( keys ), sort=True, dropna=False )
+    sums = grouped.agg( SUMS )
+
+    #As máscaras são juntadas com OU bit a bit, direto nos arrays
+    groups = grouped.ngroup().to_numpy()
+    vehicles = np.zeros( len( sums ), dtype=np.int64 )
+    cities = np.zeros( len( sums ), dtype=np.int64 )
+    np.bitwise_or.at( vehicles, groups, values["vehicles"].to_numpy() )
+    np.bitwise_or.at( cities, groups, values["cities"].to_numpy() )
+
+    return sums, vehicles, cities
+
+
+def _labels( masks, labels ):
+    """ Transforma máscaras de bits em texto ( categorias separadas por vírgula ) """
+    cache = {}
+    out = np.empty( len( masks ), dtype=object )
+    for i, mask in enumerate( masks ):
+        if mask not in cache:
+            cache[mask] = ", ".join( label for bit, label in enumerate( labels ) if mask >> bit & 1 )
+        out[i] = cache[mask]
+    return out
+
+
+class CourierStats:
+    """ Esta classe tem a responsabilidade de guardar as estatísticas de cada entregador
+
+        Uma linha por entregador com somas que podem ser juntadas entre partes do dataset
+        ( quantidade, soma, mínimo, máximo e soma dos quadrados ), então um lote novo só
+        precisa ser agregado e juntado ( ver append ). Os tipos de veículo e as cidades de cada
+        entregador ficam numa máscara de bits sobre a lista de categorias.
+
+        Com keys ( ex: as dimensões dos filtros da barra lateral ), as somas ficam por entregador e
+        combinação dessas colunas, como os agregados do modo streaming: slice junta só as combinações
+        selecionadas e devolve as estatísticas por entregador dos pedidos filtrados.
+
+        A tabela da página ( ver table ) é calculada uma única vez, e as ordenações de cada
+        coluna também, então cada página servida é só um recorte ( ver page ).
+    """
+
+    def __init__( self, sums, vehicles, vehicle_labels, cities, city_labels, keys=() ):
+        self.sums = sums
+        self.vehicles = vehicles
+        self.vehicle_labels = list( vehicle_labels )
+        self.cities = cities
+        self.city_labels = list( city_labels )
+        self.keys = list( keys )
+
+        self._table = None
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__( self ):
+        if self.keys:
+            return self.sums.index.get_level_values( "Delivery_person_ID" ).nunique()
+        return len( self.sums )
+
+    @classmethod
+    def from_frame( cls, df1, keys=() ):
+        """ Esta função tem a responsabilidade de agregar um data frame já limpo por entregador
+
+            Input: Dataframe limpo ( com as colunas COURIER_COLUMNS e keys ) e colunas extras das somas
+            Output: CourierStats
+        """
+        time = df1["Time_taken(min)"].to_numpy( dtype=float )
+        rating = df1["Delivery_person_Ratings"].to_numpy( dtype=float )
+        has_time = ~np.isnan( time )
+        has_rating = ~np.isnan( rating )
+        rating = np.where( has_rating, rating, 0.0 )
+
+        vehicle_labels = sorted( df1["Type_of_vehicle"].dropna().unique() )
+        city_labels = sorted( df1["City"].dropna().unique() )
+
+        values = pd.DataFrame( {
+            "Delivery_person_ID": df1["Delivery_person_ID"].to_numpy(),
+            "orders": np.ones( len( df1 ), dtype=np.int64 ),
+            "time_count": has_time.astype( np.int64 ),
+            "time_sum": np.where( has_time, time, 0.0 ),
+            "time_min": time,
+            "time_max": time,
+            "rating_count": has_rating.astype( np.int64 ),
+            "rating_sum": rating,
+            "rating_sumsq": rating * rating,
+            "age_min": df1["Delivery_person_Age"].to_numpy( dtype=float ),
+            "age_max": df1["Delivery_person_Age"].to_numpy( dtype=float ),
+            "vehicles": _bits( df1["Type_of_vehicle"], vehicle_labels ),
+            "cities": _bits( df1["City"], city_labels ),
+            **{ key: df1[key].to_numpy() for key in keys },
+        } )
+        sums, vehicles, cities = _group( values.loc[values["Delivery_person_ID"].notna(), :], keys )
+
+        return cls( sums, vehicles, vehicle_labels, cities, city_labels, keys )
+
+    @classmethod
+    def merge( cls, parts ):
+        """ Esta função tem a responsabilidade de juntar estatísticas de partes diferentes do dataset
+
+            Input: Lista de CourierStats
+            Output: CourierStats
+        """
+        vehicle_labels = sorted( set().union( *( part.vehicle_labels for part in parts ) ) )
+        city_labels = sorted( set().union( *( part.city_labels for part in parts ) ) )
+
+        values = pd.concat( [
+            part.sums.assign( vehicles=_remap( part.vehicles, part.vehicle_labels, vehicle_labels ),
+                              cities=_remap( part.cities, part.city_labels, city_labels ) )
+            for part in parts ] )
+        sums, vehicles, cities = _group( values, parts[0].keys )
+
+        return cls( sums, vehicles, vehicle_labels, cities, city_labels, parts[0].keys )
+
+    def append( self, batch ):
+        """ Esta função tem a responsabilidade de adicionar um lote novo ( só o lote é agregado )
+
+            Input: Dataframe do lote ( já limpo )
+            Output: Novo CourierStats ( o atual não é alterado )
+        """
+        return CourierStats.merge( [ self, CourierStats.from_frame( batch, self.keys ) ] )
+
+    def slice( self, date_max=None, **selections ):
+        """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral nas somas
+
+            Só vale com keys: as combinações selecionadas são juntadas por entregador.
+
+            Input: Mesmos parâmetros do OrderCube.slice ( ver utils/cube.py )
+            Output: CourierStats por entregador ( sem keys ) só com os pedidos selecionados
+        """
+        index = self.sums.index
+        keep = np.ones( len( index ), dtype=bool )
+        if date_max is not None:
+            keep &= np.asarray( index.get_level_values( "Order_Date" ) < date_max )
+        for dim, values in selections.items():
+            keep &= index.get_level_values( dim ).isin( list( values ) )
+
+        values = ( self.sums.loc[keep]
+                       .reset_index( level=self.keys, drop=True )
+                       .assign( vehicles=self.vehicles[keep], cities=self.cities[keep] ) )
+        sums, vehicles, cities = _group( values )
+        return CourierStats( sums, vehicles, self.vehicle_labels, cities, self.city_labels )
+
+    def table( self ):
+        """ Esta função tem a responsabilidade de montar a tabela de estatísticas por entregador
+
+            O desvio padrão é o amostral ( ddof=1 ), igual ao std() do pandas.
+
+            Output: Dataframe com as colunas TABLE_COLUMNS, um entregador por linha
+        """
+        with self._lock:
+            if self._table is None:
+                self._table = ( self.slice() if self.keys else self )._build_table()
+            return self._table
+
+    def _build_table( self ):
+        sums = self.sums
+        time_n = sums["time_count"].to_numpy( dtype=float )
+        with np.errstate( invalid="ignore", divide="ignore" ):
+            time_mean = np.where( time_n > 0, sums["time_sum"].to_numpy( dtype=float ) / time_n, np.nan )
+        rating_mean, rating_std = moments( sums["rating_count"], sums["rating_sum"], sums["rating_sumsq"] )
+
+        return pd.DataFrame( {
+            "Delivery_person_ID": sums.index.to_numpy(),
+            "orders": sums["orders"].to_numpy(),
+            "time_mean": time_mean,
+            "time_min": sums["time_min"].to_numpy(),
+            "time_max": sums["time_max"].to_numpy(),
+            "rating_mean": rating_mean,
+            "rating_std": rating_std,
+            "age": sums["age_max"].to_numpy(),
+            "vehicles": _labels( self.vehicles, self.vehicle_labels ),
+            "cities": _labels( self.cities, self.city_labels ),
+        } )
+
+    def _order( self, sort_by, ascending ):
+        """ Ordem das linhas da tabela por uma coluna ( calculada uma única vez por coluna e sentido ) """
+        key = ( sort_by, ascending )
+        with self._lock:
+            order = self._orders.get( key )
+        if order is None:
+            order = ( self.table()
+                         .sort_values( [ sort_by, "Delivery_person_ID" ], ascending=[ ascending, True ],
+                                       kind="stable", na_position="last" )
+                         .index.to_numpy() )
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    @profiled( "CourierStats.page" )
+    def page( self, search="", sort_by="Delivery_person_ID", ascending=True, page=1, page_size=PAGE_SIZE ):
+        """ Esta função tem a responsabilidade de servir uma página da tabela de entregadores
+
+            Input:
+                - search: Texto procurado no Delivery_person_ID ( sem diferenciar maiúsculas ), "" = todos
+                - sort_by, ascending: Coluna e sentido da ordenação ( ver TABLE_COLUMNS )
+                - page, page_size: Número da página ( começa em 1 ) e quantidade de linhas por página
+            Output: ( Dataframe só com as linhas da página, quantidade de entregadores encontrados )
+        """
+        table = self.table()
+        order = self._order( sort_by, ascending )
+
+        if search:
+            found = table["Delivery_person_ID"].astype( str ).str.contains( search, case=False, regex=False ).to_numpy()
+            order = order[found[order]]
+
+        start = max( page - 1, 0 ) * page_size
+        return table.iloc[order[start:start + page_size]].reset_index( drop=True ), len( order )
+
+
+@profiled()
+def courier_stats( df1 ):
+    """ Esta função tem a responsabilidade de devolver as estatísticas por entregador do dataset
+
+        Input: Dataframe do load_data ( com as colunas COURIER_COLUMNS )
+        Output: CourierStats ( construído uma única vez por dataset e atualizado a cada lote novo )
+    """
+    return derived( df1, "courier_stats", CourierStats.from_frame )
+
+
+register_updater( "courier_stats", lambda stats, batch, df1: stats.append( batch ) )
@@ -0,0 +1,222 @@
+#Bibliotecas necessárias
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache
+from utils.data import DATA_PATH, derived, load_data, plain_columns, register_updater
+from utils.profiling import profiled
+
+#Dimensões do cubo: todas as colunas usadas pelos filtros e pelos agrupamentos dos gráficos
+DIMENSIONS = [ "Order_Date", "City", "Road_traffic_density", "Weatherconditions", "Festival", "Type_of_order" ]
+
+#Medidas guardadas em cada célula ( quantidade, soma e soma dos quadrados )
+MEASURES = [ "Time_taken(min)", "Delivery_person_Ratings", "distance" ]
+
+#Colunas que o cubo precisa ler do dataset
+CUBE_COLUMNS = DIMENSIONS + MEASURES
+
+#Margem do erro de arredondamento da variância calculada pelas somas ( ver moments ), em n * eps * média²
+VARIANCE_NOISE = 4
+
+#Número máximo de agregações e de recortes guardados ( de todas as sessões e estados de filtro ).
+#Os recortes guardam células do cubo, por isso o limite deles é menor.
+AGGREGATION_CACHE_SIZE = 512
+SLICE_CACHE_SIZE = 32
+
+#Agregações já calculadas, por ( versão do cubo, estado dos filtros, agrupamento, medida )
+_aggregations = LRUCache( maxsize=AGGREGATION_CACHE_SIZE )
+
+#Recortes já calculados, por ( versão do cubo, estado dos filtros )
+_slices = LRUCache( maxsize=SLICE_CACHE_SIZE )
+
+#Cada cubo construído recebe uma versão única no processo
+_versions = itertools.count()
+
+#-------------------
+#Funções
+#-------------------
+class OrderCube:
+    """ Esta classe tem a responsabilidade de responder as agregações dos gráficos sem olhar os pedidos
+
+        Os pedidos são agrupados uma única vez por todas as dimensões ( DIMENSIONS ). Cada célula guarda
+        o número de pedidos e, para cada medida, a quantidade de valores, a soma e a soma dos quadrados.
+        Essas somas podem ser juntadas entre células, então qualquer agrupamento dos gráficos é
+        uma soma de células, e a média e o desvio padrão saem das somas.
+
+        Os filtros da barra lateral viram um recorte das células ( ver slice ).
+
+        Os recortes e as agregações são memorizados por estado de filtro ( ver key ), então uma
+        mesma agregação pedida várias vezes na página é calculada uma única vez.
+    """
+
+    def __init__( self, df1=None, cells=None, key=None ):
+        if cells is None:
+            cells = self._build_cells( df1 )
+        self.cells = cells
+
+        #Identifica o cubo e o estado dos filtros que gerou este recorte
+        self.key = key if key is not None else ( "cube", next( _versions ) )
+
+    @staticmethod
+    def _build_cells( df1 ):
+        values = { dim: df1[dim] for dim in DIMENSIONS }
+        values["orders"] = np.ones( len( df1 ), dtype=np.int64 )
+        for measure in MEASURES:
+            col = df1[measure].to_numpy( dtype=float )
+            present = ~np.isnan( col )
+            col = np.where( present, col, 0.0 )
+            values[measure + "_count"] = present.astype( np.int64 )
+            values[measure + "_sum"] = col
+            values[measure + "_sumsq"] = col * col
+
+        cells = ( pd.DataFrame( values, index=df1.index )
+                    .groupby( DIMENSIONS, sort=False, dropna=False, observed=True )
+                    .sum()
+                    .reset_index() )
+        return plain_columns( cells )
+
+    def slice( self, date_max=None, **selections ):
+        """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral no cubo
+
+            Input:
+                - date_max: Data limite ( exclusiva ), ou None para não filtrar por data
+                - selections: Categorias selecionadas por dimensão,
+                              ex: Road_traffic_density=["Low", "Jam"], City=["Urban"]
+            Output: Novo OrderCube só com as células selecionadas ( o mesmo objeto para o mesmo estado de filtro )
+        """
+        key = self.key + ( ( "date", date_max ), ) + tuple(
+            ( dim, tuple( sorted( values ) ) ) for dim, values in sorted( selections.items() ) )
+
+        return _slices.get_or_compute( key, lambda: self._slice( key, date_max, selections ) )
+
+    def _slice( self, key, date_max, selections ):
+        mask = np.ones( len( self.cells ), dtype=bool )
+        if date_max is not None:
+            mask &= ( self.cells["Order_Date"] < date_max ).to_numpy()
+        for dim, values in selections.items():
+            mask &= self.cells[dim].isin( list( values ) ).to_numpy()
+
+        return OrderCube( cells=self.cells.loc[mask, :], key=key )
+
+    def count( self, by ):
+        """ Esta função tem a responsabilidade de contar os pedidos por grupo
+
+            Input: Lista de dimensões
+            Output: Dataframe com as dimensões e a coluna orders
+        """
+        key = self.key + ( "count", tuple( by ) )
+        result = _aggregations.get_or_compute(
+            key, lambda: self.cells.groupby( by )["orders"].sum().reset_index() )
+        return result.copy()
+
+    def mean_std( self, by, measure ):
+        """ Esta função tem a responsabilidade de calcular a média e o desvio padrão de uma medida por grupo
+
+            O desvio padrão é o amostral ( ddof=1 ), igual ao std() do pandas.
+
+            Input: Lista de dimensões ( lista vazia = total ) e nome da medida
+            Output: Dataframe com as dimensões e as colunas mean e std
+        """
+        key = self.key + ( "mean_std", tuple( by ), measure )
+        result = _aggregations.get_or_compute( key, lambda: self._mean_std( by, measure ) )
+        return result.copy()
+
+    def _mean_std( self, by, measure ):
+        cols = [ measure + "_count", measure + "_sum", measure + "_sumsq" ]
+        if by:
+            sums = self.cells.groupby( by )[cols].sum()
+        else:
+            sums = self.cells[cols].sum().to_frame().T
+
+        mean, std = moments( sums[cols[0]], sums[cols[1]], sums[cols[2]] )
+        result = pd.DataFrame( { "mean": mean, "std": std }, index=sums.index )
+        return result.reset_index( drop=not by )
+
+
+def moments( n, total, total_sq ):
+    """ Esta função tem a responsabilidade de calcular a média e o desvio padrão a partir das somas
+
+        O desvio padrão é o amostral ( ddof=1 ), igual ao std() do pandas.
+
+        A diferença total_sq - total * mean perde precisão quando os valores do grupo são quase iguais
+        ( cancelamento ): o erro de arredondamento das somas chega a ~n * eps * mean² na variância.
+        Variâncias abaixo desse ruído ( VARIANCE_NOISE ) viram 0, como o std() do pandas dá para valores iguais.
+
+        Input: Quantidade de valores, soma e soma dos quadrados ( arrays, um grupo por posição )
+        Output: ( médias, desvios padrão ) - arrays, NaN quando não há valores suficientes
+    """
+    n = np.asarray( n, dtype=float )
+    total = np.asarray( total, dtype=float )
+    total_sq = np.asarray( total_sq, dtype=float )
+
+    with np.errstate( invalid="ignore", divide="ignore" ):
+        mean = np.where( n > 0, total / n, np.nan )
+        var = np.where( n > 1, ( total_sq - total * mean ) / ( n - 1 ), np.nan )
+        var = np.where( var <= VARIANCE_NOISE * n * np.finfo( float ).eps * mean * mean, 0.0, var )
+
+    return mean, np.sqrt( var )
+
+
+def merge_cells( cells_list ):
+    """ Esta função tem a responsabilidade de juntar células de cubos de partes diferentes do dataset
+
+        Como as medidas são somas, juntar células com as mesmas dimensões é só somar.
+
+        Input: Lista de data frames de células ( OrderCube.cells )
+        Output: Data frame de células juntas
+    """
+    return ( pd.concat( cells_list, ignore_index=True )
+               .groupby( DIMENSIONS, sort=False, dropna=False )
+               .sum()
+               .reset_index() )
+
+
+def _append_cube( cube, batch, df1 ):
+    """ Atualiza o cubo com um lote novo: só o lote é agregado e as células são juntadas """
+    return OrderCube( cells=merge_cells( [ cube.cells, OrderCube( batch ).cells ] ) )
+
+
+register_updater( "order_cube", _append_cube )
+
+
+@profiled()
+def load_cube( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de devolver o cubo de pedidos do dataset
+
+        Input: Caminho do arquivo
+        Output: OrderCube ( construído uma única vez por versão do dataset )
+    """
+    df1 = load_data( path, columns=CUBE_COLUMNS )
+    return derived( df1, "order_cube", OrderCube )
+
+
+@profiled()
+def slice_cube( cube, date_max, traffic_options, weather_conditions, cities ):
+    """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral no cubo
+
+        Input:
+            - cube: OrderCube
+            - date_max: Data limite ( exclusiva )
+            - traffic_options, weather_conditions, cities: Listas selecionadas nos multiselects
+        Output: OrderCube filtrado
+    """
+    return cube.slice( date_max,
+                       Road_traffic_density=traffic_options,
+                       Weatherconditions=weather_conditions,
+                       City=cities )
+
+
+def clear_aggregation_cache():
+    """ Esta função tem a responsabilidade de descartar os recortes e agregações memorizados ( ex: benchmarks ) """
+    _aggregations.clear()
+    _slices.clear()
+
+
+def aggregation_stats():
+    """ Esta função tem a responsabilidade de mostrar o uso do cache de agregações
+
+        Output: Dicionário com os contadores ( hits, misses, size e maxsize ) das agregações e dos recortes
+    """
+    return { "aggregations": _aggregations.stats(), "slices": _slices.stats() }
@@ -0,0 +1,746 @@
+#Bibliotecas necessárias
+import contextlib
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from utils import snapshot
+from utils.cache import build_once
+from utils.dates import calendar_columns
+from utils.geo import delivery_distance
+from utils.profiling import profiled
+
+#Caminho padrão do dataset usado pelas páginas
+DATA_PATH = "train.csv"
+
+#Texto usado no CSV para indicar valor ausente
+NAN_SENTINEL = "NaN "
+
+#Linhas com valor ausente em qualquer uma destas colunas são removidas
+REQUIRED_COLUMNS = [ "Delivery_person_Age", "multiple_deliveries", "Road_traffic_density", "City" ]
+
+#Colunas de texto que chegam com espaços sobrando
+STRING_COLUMNS = [ "ID", "Road_traffic_density", "Delivery_person_ID", "Type_of_order",
+                   "Type_of_vehicle", "Festival", "City" ]
+
+#Parâmetros do read_csv: o "NaN " das colunas numéricas e obrigatórias já vira NaN na leitura
+READ_CSV_OPTIONS = {
+    "na_values": { col: [ NAN_SENTINEL ] for col in REQUIRED_COLUMNS + [ "Delivery_person_Ratings" ] },
+    "dtype": { "Restaurant_latitude": "float64", "Restaurant_longitude": "float64",
+               "Delivery_location_latitude": "float64", "Delivery_location_longitude": "float64",
+               "Vehicle_condition": "int64" },
+}
+
+#Colunas de texto com poucos valores distintos, guardadas como categóricas ( cada valor vira um código inteiro
+#e o texto fica uma única vez na lista de categorias ). O Delivery_person_ID também: cada entregador
+#vira um código inteiro.
+CATEGORICAL_COLUMNS = [ "City", "Road_traffic_density", "Weatherconditions", "Type_of_order",
+                        "Type_of_vehicle", "Festival", "Delivery_person_ID" ]
+
+#Colunas inteiras guardadas com menos bytes ( os valores do dataset cabem com folga nesses tipos )
+COMPACT_DTYPES = { "Delivery_person_Age": "int16", "Vehicle_condition": "int8",
+                   "multiple_deliveries": "int8", "Time_taken(min)": "int16" }
+
+#Colunas usadas pelos filtros da barra lateral, sempre carregadas
+FILTER_COLUMNS = [ "Order_Date", "Road_traffic_density", "Weatherconditions", "City" ]
+
+#Cache do processo: guarda um data frame limpo por arquivo de origem e conjunto de colunas.
+#A chave inclui a identidade do arquivo (caminho, tamanho e mtime), então qualquer alteração
+#no arquivo gera uma chave nova e o data frame é limpo novamente na próxima chamada.
+_cache = {}
+_cache_lock = threading.Lock()
+
+#Só uma versão nova é montada a partir da anterior por vez ( ver _catch_up )
+_catch_up_lock = threading.Lock()
+
+#Estruturas derivadas ( índices, agregados ) de cada data frame do cache, por ( id do df, nome )
+_derived = {}
+_derived_lock = threading.RLock()
+
+#Funções que atualizam uma estrutura derivada com um lote novo, por nome ( ver register_updater )
+_updaters = {}
+
+#Função que constrói cada estrutura derivada, por nome, para reconstruir numa versão nova ( ver warm_version )
+_builders = {}
+
+#Quando o espaço reservado no fim dos data frames acaba, a capacidade passa a ser APPEND_GROWTH vezes
+#a quantidade de linhas ( ver AppendBuffer )
+APPEND_GROWTH = 1.5
+
+#Colunas com espaço reservado de cada data frame que recebeu um lote, por id do df ( ver append_frame )
+_append_buffers = {}
+
+#Versão publicada de cada arquivo pelo atualizador em segundo plano ( ver utils/refresh.py ), por caminho
+#absoluto: ( fingerprint publicada, fingerprint anterior, momento da publicação )
+_published = {}
+
+#Versão fixada por cada execução da página ( cada sessão do Streamlit roda numa thread )
+_local = threading.local()
+
+#-------------------
+#Funções
+#-------------------
+def source_fingerprint( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de identificar a versão do arquivo de dados
+
+        Input: Caminho do arquivo
+        Output: Tupla ( caminho absoluto, tamanho em bytes, mtime em nanossegundos )
+    """
+    stat = os.stat( path )
+    return ( os.path.abspath( path ), stat.st_size, stat.st_mtime_ns )
+
+
+def publish_version( path, fingerprint ):
+    """ Esta função tem a responsabilidade de publicar uma versão nova do arquivo de dados
+
+        A troca é atômica ( uma única atribuição ): as execuções que começarem depois usam a versão
+        nova, e as que já fixaram a anterior ( ver pin_version ) continuam com ela até o fim. A versão
+        anterior continua nos caches até a próxima publicação ( ver retire_versions ).
+
+        Input: Caminho do arquivo e fingerprint da versão, já construída
+        Output: None
+    """
+    path = os.path.abspath( path )
+    current = _published.get( path )
+    previous = current[0] if current is not None and current[0] != tuple( fingerprint ) else None
+    _published[path] = ( tuple( fingerprint ), previous, time.time() )
+
+
+def published_version( path=DATA_PATH ):
+    """ Retorna ( fingerprint, fingerprint anterior, momento da publicação ) da versão publicada, ou None """
+    return _published.get( os.path.abspath( path ) )
+
+
+def pin_version( path=DATA_PATH, fingerprint=None ):
+    """ Esta função tem a responsabilidade de fixar a versão do arquivo usada pela thread atual
+
+        Input: Caminho do arquivo e fingerprint ( None = volta a usar a versão publicada )
+        Output: None
+    """
+    pins = _local.__dict__.setdefault( "pins", {} )
+    if fingerprint is None:
+        pins.pop( os.path.abspath( path ), None )
+    else:
+        pins[os.path.abspath( path )] = tuple( fingerprint )
+
+
+@contextlib.contextmanager
+def pinned_version( path, fingerprint ):
+    """ Fixa a versão do arquivo dentro do bloco with e volta para a versão fixada antes """
+    before = _local.__dict__.get( "pins", {} ).get( os.path.abspath( path ) )
+    pin_version( path, fingerprint )
+    try:
+        yield
+    finally:
+        pin_version( path, before )
+
+
+def data_version( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de dizer qual versão do arquivo de dados deve ser lida
+
+        Usada por todos os caches do dataset ( load_data, load_aggregates, load_sql, ... ).
+
+        Input: Caminho do arquivo
+        Output: Fingerprint da versão fixada pela execução atual; senão, a publicada pelo atualizador;
+                sem atualizador, a do arquivo no disco ( ver source_fingerprint )
+    """
+    path = os.path.abspath( path )
+    pinned = _local.__dict__.get( "pins", {} ).get( path )
+    if pinned is not None:
+        return pinned
+
+    published = _published.get( path )
+    if published is not None:
+        return published[0]
+
+    return source_fingerprint( path )
+
+
+def retire_versions( cache, fingerprint, version_of=lambda key: key ):
+    """ Esta função tem a responsabilidade de descartar de um cache as versões antigas de um arquivo
+
+        Ao guardar a versão fingerprint, as outras versões do mesmo arquivo são descartadas, menos a
+        publicada e a anterior a ela ( execuções que começaram antes da troca ainda podem estar usando ).
+        Deve ser chamada com o lock do cache.
+
+        Input: Dicionário do cache, fingerprint da versão guardada e função que acha a fingerprint de cada chave
+        Output: None
+    """
+    published = _published.get( fingerprint[0], () )
+    keep = { tuple( fingerprint ) } | { fp for fp in published[:2] if fp is not None }
+    for key in [ k for k in cache if version_of( k )[0] == fingerprint[0] and version_of( k ) not in keep ]:
+        del cache[key]
+
+
+@profiled()
+def read_raw_csv( path=DATA_PATH, **kwargs ):
+    """ Esta função tem a responsabilidade de ler o CSV bruto
+
+        O próprio read_csv já converte o texto "NaN " das colunas obrigatórias em NaN e
+        lê as colunas numéricas com o tipo certo, assim o clean_code não precisa comparar texto.
+
+        Input: Caminho do arquivo ( e parâmetros extras do pd.read_csv, ex: chunksize )
+        Output: Dataframe bruto
+    """
+    options = dict( READ_CSV_OPTIONS )
+    options.update( kwargs )
+    return pd.read_csv( path, **options )
+
+
+def _is_missing( col ):
+    """ Retorna a máscara de valores ausentes, aceitando NaN de verdade ou o texto "NaN " """
+    missing = col.isna()
+    if col.dtype == object:
+        missing |= ( col == NAN_SENTINEL )
+    return missing
+
+
+def _strip( col ):
+    """ Remove os espaços de uma coluna de texto
+
+        Colunas com poucos valores distintos são fatoradas antes, então o strip roda uma vez
+        por valor distinto e não uma vez por linha.
+    """
+    if col.dtype != object:
+        return col
+    codes, uniques = pd.factorize( col )
+    stripped = pd.Index( uniques ).str.strip().to_numpy( dtype=object )
+    values = stripped.take( codes, mode="clip" )
+    values[codes == -1] = np.nan
+    return pd.Series( values, index=col.index, name=col.name )
+
+
+@profiled()
+def clean_code( df1 ):
+    """ Esta função tem a responsabilidade de limpar o data frame
+        
+        Tipos de limpeza:
+        1. Removação dos dados NaN ( uma única máscara para todas as colunas )
+        2. Mudança do tipo da coluna de dados
+        3. Removação dos espaços das variáveis de texto
+        4. Formação da coluna de datas
+        5. Limpeza da coluna de tempo ( remoção do texto da variável numérica )
+        6. Cálculo da distância entre restaurante e local de entrega ( coluna distance )
+        7. Tipos compactos: colunas categóricas e inteiros menores ( ver compact_frame )
+        8. Colunas de calendário: dia, dia da semana, semana e semana ISO, inteiras ( ver utils/dates.py )
+
+        Aceita tanto o data frame do read_raw_csv quanto o de um pd.read_csv simples.
+        O número de linhas removidas, e o motivo, fica em df1.attrs["clean_report"].
+        
+        Input: Dataframe
+        Output: Dataframe
+    """    
+    #1. Uma única máscara com todas as colunas obrigatórias, e uma única cópia
+    missing = { col: _is_missing( df1[col] ) for col in REQUIRED_COLUMNS }
+    linhas_invalidas = np.logical_or.reduce( [ mask.to_numpy() for mask in missing.values() ] )
+
+    report = {
+        "rows_in": len( df1 ),
+        "rows_dropped": int( linhas_invalidas.sum() ),
+        "missing_by_column": { col: int( mask.sum() ) for col, mask in missing.items() },
+    }
+
+    df1 = df1.loc[~linhas_invalidas, :].copy()
+
+    #2. Convertendo Age e multiple_deliveries para inteiro e Ratings para decimal (float)
+    df1["Delivery_person_Age"] = df1["Delivery_person_Age"].astype( int )
+    df1["multiple_deliveries"] = df1["multiple_deliveries"].astype( int )
+    df1["Delivery_person_Ratings"] = df1["Delivery_person_Ratings"].astype( float )
+
+    #3. Convertendo a coluna Order_Date de texto para data
+    df1["Order_Date"] = pd.to_datetime( df1["Order_Date"], format="%d-%m-%Y" )
+
+    #4. Removendo os espacos dentro de strings/texto/object
+    for col in STRING_COLUMNS:
+        df1[col] = _strip( df1[col] )
+
+    #5. Limpando a coluna Time_taken ( "(min) 24" -> 24 ) sem passar linha a linha
+    if df1["Time_taken(min)"].dtype == object:
+        df1["Time_taken(min)"] = df1["Time_taken(min)"].str.extract( r"(\d+)\s*$", expand=False )
+    df1["Time_taken(min)"] = df1["Time_taken(min)"].astype( int )
+
+    #6. Distância em km, calculada uma única vez para todos os pedidos.
+    #Pedidos com coordenadas zeradas ou fora dos limites ficam com distância NaN.
+    df1["distance"] = delivery_distance( df1 )
+    report["invalid_coordinates"] = int( df1["distance"].isna().sum() )
+
+    #7. Tipos compactos ( ver memory_report )
+    df1 = compact_frame( df1 )
+
+    #8. Calendário calculado uma única vez aqui: os gráficos por semana agrupam por inteiros,
+    #sem formatar as datas como texto a cada execução da página
+    for col, values in calendar_columns( df1["Order_Date"] ).items():
+        df1[col] = values
+
+    report["rows_out"] = len( df1 )
+    df1.attrs["clean_report"] = report
+
+    return df1
+
+
+def compact_frame( df1 ):
+    """ Esta função tem a responsabilidade de guardar as colunas com o menor tipo possível
+
+        As colunas de texto de CATEGORICAL_COLUMNS viram categóricas, com as categorias em ordem
+        alfabética ( os agrupamentos saem na mesma ordem que com texto ), e as colunas de
+        COMPACT_DTYPES viram inteiros menores. As demais colunas não mudam.
+
+        Input: Dataframe limpo
+        Output: O mesmo data frame, com os tipos compactos
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df1.columns and not isinstance( df1[col].dtype, pd.CategoricalDtype ):
+            categories = np.sort( df1[col].dropna().unique().astype( str ) )
+            df1[col] = pd.Categorical( df1[col], categories=categories )
+    for col, dtype in COMPACT_DTYPES.items():
+        if col in df1.columns:
+            df1[col] = df1[col].astype( dtype )
+    return df1
+
+
+def plain_columns( df1 ):
+    """ Esta função tem a responsabilidade de voltar as colunas categóricas para texto
+
+        Usada nas tabelas de agregados ( pequenas ), que são juntadas e agrupadas de novo: assim os
+        agrupamentos seguintes ordenam pelo texto, como antes dos tipos compactos.
+
+        Input: Dataframe
+        Output: O mesmo data frame, sem colunas categóricas
+    """
+    for col in df1.columns:
+        if isinstance( df1[col].dtype, pd.CategoricalDtype ):
+            df1[col] = df1[col].astype( object )
+    return df1
+
+
+def concat_frames( frames ):
+    """ Esta função tem a responsabilidade de juntar data frames limpos mantendo os tipos compactos
+
+        As colunas categóricas recebem a mesma lista de categorias ( a união, em ordem alfabética )
+        antes de juntar; sem isso o pandas transformaria essas colunas em texto.
+
+        Input: Lista de data frames limpos
+        Output: Dataframe com todas as linhas
+    """
+    frames = list( frames )
+    for col in CATEGORICAL_COLUMNS:
+        if not all( col in df1.columns and isinstance( df1[col].dtype, pd.CategoricalDtype ) for df1 in frames ):
+            continue
+        categories = frames[0][col].cat.categories
+        for df1 in frames[1:]:
+            categories = categories.union( df1[col].cat.categories )
+        frames = [ df1 if df1[col].cat.categories.equals( categories )
+                   else df1.assign( **{ col: df1[col].cat.set_categories( categories ) } )
+                   for df1 in frames ]
+    return pd.concat( frames )
+
+
+def memory_report( df1 ):
+    """ Esta função tem a responsabilidade de mostrar a memória usada por coluna
+
+        Compara o data frame compacto com o mesmo data frame nos tipos antigos
+        ( texto como objetos Python e inteiros de 64 bits ).
+
+        Input: Dataframe limpo
+        Output: Dataframe com uma linha por coluna ( e o total ): before_bytes, after_bytes e ratio
+    """
+    wide = df1.copy( deep=False )
+    for col in wide.columns:
+        if isinstance( wide[col].dtype, pd.CategoricalDtype ):
+            wide[col] = wide[col].astype( object )
+        elif col in COMPACT_DTYPES:
+            wide[col] = wide[col].astype( "int64" )
+
+    report = pd.DataFrame( { "before_bytes": wide.memory_usage( deep=True, index=False ),
+                             "after_bytes": df1.memory_usage( deep=True, index=False ) } )
+    report.loc["total"] = report.sum()
+    report["ratio"] = ( report["before_bytes"] / report["after_bytes"] ).round( 2 )
+    return report
+
+
+def clean_report( df1 ):
+    """ Esta função tem a responsabilidade de mostrar quantas linhas o clean_code removeu e por quê
+
+        Input: Dataframe limpo
+        Output: Dicionário com rows_in, rows_out, rows_dropped, missing_by_column
+                ( uma linha pode faltar em mais de uma coluna ) e invalid_coordinates
+                ( linhas mantidas, mas sem distância )
+    """
+    return df1.attrs.get( "clean_report", {} )
+
+
+def refresh_snapshot( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de garantir que o snapshot do CSV está atualizado
+
+        Usada por quem lê o snapshot sem passar pelo pandas ( ex: o backend SQL, ver utils/sql.py ).
+
+        Input: Caminho do CSV
+        Output: Caminho do snapshot ( refeito a partir do CSV se estava desatualizado )
+    """
+    fingerprint = source_fingerprint( path )
+    snap_path = snapshot.snapshot_path( path )
+    if not snapshot.is_fresh( snap_path, fingerprint ):
+        snapshot.write_snapshot( clean_code( read_raw_csv( path ) ), snap_path, fingerprint )
+    return snap_path
+
+
+def _load_frame( path, fingerprint, columns ):
+    """ Lê o data frame limpo a partir do snapshot, refazendo o snapshot quando o CSV mudou
+
+        Se não for possível gravar o snapshot ( ex: pasta somente leitura ), o CSV é limpo em memória.
+
+        Output: ( dataframe, True se ele é mesmo da versão fingerprint e pode ir para o cache )
+    """
+    snap_path = snapshot.snapshot_path( path )
+
+    if not snapshot.is_fresh( snap_path, fingerprint ):
+        #O CSV no disco já é outro ( ex: a versão fixada pela execução é anterior a um append ): ele é
+        #limpo para esta leitura, mas não grava o snapshot nem entra no cache com a fingerprint antiga
+        current = source_fingerprint( path )
+        df1 = clean_code( read_raw_csv( path ) )
+        if current != tuple( fingerprint ) or source_fingerprint( path ) != current:
+            return ( df1 if columns is None else df1.loc[:, columns] ), False
+        try:
+            snapshot.write_snapshot( df1, snap_path, fingerprint )
+        except OSError:
+            return ( df1 if columns is None else df1.loc[:, columns] ), True
+
+    return snapshot.read_snapshot( snap_path, columns ), True
+
+
+@profiled()
+def load_data( path=DATA_PATH, columns=None ):
+    """ Esta função tem a responsabilidade de carregar o dataset limpo uma única vez por processo
+
+        Na primeira leitura o CSV é limpo e gravado num snapshot colunar ( ver utils/snapshot.py );
+        as próximas leituras, inclusive de outros processos, usam o snapshot via memory map.
+        O snapshot é refeito automaticamente quando o CSV muda.
+
+        O data frame fica em cache enquanto o arquivo não mudar. Quando o tamanho ou a data de
+        modificação do arquivo mudam, a versão antiga é descartada. Com o atualizador em segundo plano
+        ( ver utils/refresh.py ), a versão lida é a fixada pela execução ( ver data_version ) e a nova
+        é construída fora das execuções.
+
+        O data frame retornado é compartilhado entre todas as páginas e sessões, por isso ele
+        NÃO deve ser alterado: os filtros devem sempre gerar um novo data frame.
+
+        Input: Caminho do arquivo e colunas necessárias ( None = todas; as colunas dos filtros
+               são sempre incluídas )
+        Output: Dataframe limpo
+    """
+    fingerprint = data_version( path )
+    if columns is not None:
+        columns = tuple( dict.fromkeys( list( columns ) + FILTER_COLUMNS ) )
+
+    cacheable = {}
+
+    def build():
+        df1, cacheable["ok"] = _load_frame( path, fingerprint, None if columns is None else list( columns ) )
+        return df1
+
+    def store( key, df1 ):
+        #Um data frame lido de um CSV mais novo que a versão pedida não fica em cache ( ver _load_frame )
+        if not cacheable["ok"]:
+            return
+        #Descarta as versões antigas do mesmo arquivo
+        retire_versions( _cache, fingerprint, version_of=lambda k: k[0] )
+        _cache[key] = df1
+
+    #Uma versão nova que só adicionou partes ao snapshot é montada a partir da anterior ( ver _catch_up )
+    if ( fingerprint, columns ) not in _cache:
+        _catch_up( path, fingerprint )
+
+    return build_once( _cache, _cache_lock, ( fingerprint, columns ), build, store=store )
+
+
+def snapshot_parts( path, fingerprint ):
+    """ Retorna as partes do snapshot do CSV, se ele estiver atualizado com a versão fingerprint, senão None """
+    metadata = snapshot.read_metadata( snapshot.snapshot_path( path ) )
+    if ( metadata is None or metadata["schema_version"] != snapshot.SCHEMA_VERSION
+         or metadata["source"] != tuple( fingerprint ) ):
+        return None
+    return tuple( metadata["parts"] )
+
+
+def appended_rows( path, versions, fingerprint, columns=None ):
+    """ Esta função tem a responsabilidade de achar os pedidos adicionados desde uma versão já em memória
+
+        A versão nova é só um append de uma versão antiga quando as partes do snapshot da antiga são o começo
+        das partes da nova ( ver utils.snapshot.append_snapshot ). Depois de uma compactação, de um CSV
+        reescrito ou sem snapshot, não é, e a versão nova deve ser construída por completo.
+
+        Input:
+            - path: Caminho do CSV
+            - versions: Dicionário { fingerprint em memória: partes do snapshot dela ( ou None ) }
+            - fingerprint: Fingerprint da versão nova
+            - columns: Colunas a ler ( None = todas )
+        Output: ( fingerprint antiga, dataframe só com as partes novas, partes da versão nova ), ou None
+    """
+    parts = snapshot_parts( path, fingerprint )
+    if parts is None:
+        return None
+
+    #Entre as versões em memória, a mais recente que a nova estende
+    candidates = [ ( len( old ), fp ) for fp, old in versions.items()
+                   if old and fp[0] == fingerprint[0] and len( old ) < len( parts ) and parts[:len( old )] == tuple( old ) ]
+    if not candidates:
+        return None
+    n, old_fingerprint = max( candidates, key=lambda candidate: candidate[0] )
+
+    try:
+        batch = snapshot.read_snapshot( snapshot.snapshot_path( path ), columns, parts=parts[n:] )
+    except OSError:
+        return None
+    return old_fingerprint, batch, parts
+
+
+def _catch_up( path, fingerprint ):
+    """ Monta os data frames da versão fingerprint a partir dos da versão anterior, lendo só as partes novas
+
+        Usada quando o append foi feito por outro processo ( ex: python -m utils.append com o dashboard
+        aberto ): o snapshot já tem o lote numa parte nova, e os data frames em cache recebem só ela
+        ( ver append_cached ). Se a versão nova não é só um append, nada é feito.
+    """
+    with _catch_up_lock:
+        with _cache_lock:
+            if any( key[0] == tuple( fingerprint ) for key in _cache ):
+                return
+            versions = { key[0]: df1.attrs.get( "snapshot_parts" ) for key, df1 in _cache.items() }
+        if not any( versions.values() ):
+            return
+
+        change = appended_rows( path, versions, fingerprint )
+        if change is not None:
+            old_fingerprint, batch, parts = change
+            append_cached( batch, old_fingerprint, fingerprint, report=batch.attrs["clean_report"], parts=parts )
+
+
+def _drop_derived( df_id ):
+    """ Descarta as estruturas derivadas de um data frame que saiu do cache """
+    with _derived_lock:
+        for key in [ k for k in _derived if k[0] == df_id ]:
+            del _derived[key]
+
+
+def derived( df1, name, builder ):
+    """ Esta função tem a responsabilidade de guardar estruturas calculadas a partir do dataset
+
+        Cada estrutura ( ex: índice de filtros ) é construída uma única vez para cada data frame
+        retornado pelo load_data e é descartada junto com ele, quando o CSV muda.
+
+        Input: Dataframe do load_data, nome da estrutura e função que a constrói a partir do data frame
+        Output: A estrutura construída
+    """
+    _builders[name] = builder
+    return build_once( _derived, _derived_lock, ( id( df1 ), name ), lambda: builder( df1 ),
+                       store=lambda key, value: _store_derived( df1, name, value ) )
+
+
+def warm_version( path, fingerprint, like ):
+    """ Esta função tem a responsabilidade de construir uma versão nova do dataset antes de publicá-la
+
+        Carrega, para a versão fingerprint, os mesmos data frames ( conjuntos de colunas ) e as mesmas
+        estruturas derivadas que já existem para a versão like, que são as que as páginas usam.
+
+        Input: Caminho do arquivo, fingerprint da versão nova e fingerprint da versão atual
+        Output: Quantidade de estruturas construídas ( data frames e estruturas derivadas )
+    """
+    with _cache_lock:
+        frames = [ ( key[1], df1 ) for key, df1 in _cache.items() if like is not None and key[0] == tuple( like ) ]
+
+    built = 0
+    with pinned_version( path, fingerprint ):
+        for columns, old_df in frames:
+            with _derived_lock:
+                names = [ name for df_id, name in _derived if df_id == id( old_df ) ]
+
+            new_df = load_data( path, None if columns is None else list( columns ) )
+            for name in names:
+                derived( new_df, name, _builders[name] )
+            built += 1 + len( names )
+
+    return built
+
+
+def _store_derived( df1, name, value ):
+    """ Guarda uma estrutura derivada, registrando o descarte junto com o data frame """
+    df_id = id( df1 )
+    with _derived_lock:
+        if not any( k[0] == df_id for k in _derived ):
+            weakref.finalize( df1, _drop_derived, df_id )
+        _derived[( df_id, name )] = value
+
+
+def register_updater( name, updater ):
+    """ Esta função tem a responsabilidade de registrar como atualizar uma estrutura derivada
+
+        Quando um lote novo é adicionado ( ver append_cached ), a estrutura é atualizada com
+        updater( estrutura_antiga, lote_limpo, novo_df ) em vez de ser construída de novo.
+        Estruturas sem updater são descartadas e reconstruídas quando forem pedidas.
+
+        Input: Nome da estrutura ( o mesmo usado no derived ) e função de atualização
+        Output: None
+    """
+    _updaters[name] = updater
+
+
+def _categorical( codes, dtype ):
+    """ Coluna categórica a partir de códigos já válidos, sem cópia e sem conferir os códigos ( uma passada no histórico ) """
+    try:
+        return pd.Categorical.from_codes( codes, dtype=dtype, validate=False )
+    except TypeError:
+        #pandas < 2.1 não tem o validate: o fastpath também não confere os códigos
+        return pd.Categorical( codes, dtype=dtype, fastpath=True )
+
+
+class AppendBuffer:
+    """ Esta classe tem a responsabilidade de guardar as colunas de um data frame com espaço livre no fim
+
+        Cada coluna ( e o índice ) fica num array maior que a quantidade de linhas; as colunas categóricas
+        guardam só os códigos. Um lote é copiado para o espaço livre e o data frame novo é uma visão das
+        primeiras linhas dos arrays, sem copiar o histórico, então o custo de um lote depende só do
+        tamanho do lote. Os data frames anteriores não mudam: eles enxergam só as linhas que já tinham.
+
+        Quando o espaço acaba, os arrays são realocados com APPEND_GROWTH vezes as linhas ( uma cópia do
+        histórico a cada crescimento, custo amortizado por lote ). Um lote com uma categoria nova refaz os
+        códigos só daquela coluna, em arrays novos.
+    """
+
+    def __init__( self, df1, capacity ):
+        self.n = len( df1 )
+        self.index_name = df1.index.name
+        self.index = self._allocate( df1.index.to_numpy(), capacity )
+        self.dtypes = {}
+        self.columns = {}
+        for col in df1.columns:
+            values = df1[col]
+            self.dtypes[col] = values.dtype
+            if isinstance( values.dtype, pd.CategoricalDtype ):
+                values = values.cat.codes
+            self.columns[col] = self._allocate( values.to_numpy(), capacity )
+
+    @staticmethod
+    def _allocate( values, capacity ):
+        """ Array com capacity posições, começando pelos valores """
+        out = np.empty( capacity, dtype=values.dtype )
+        out[:len( values )] = values
+        return out
+
+    @property
+    def capacity( self ):
+        return len( self.index )
+
+    def accepts( self, batch ):
+        """ True se o lote tem as mesmas colunas e os mesmos tipos ( as categorias podem ser outras ) """
+        if set( batch.columns ) != set( self.columns ):
+            return False
+        for col, dtype in self.dtypes.items():
+            if isinstance( dtype, pd.CategoricalDtype ):
+                if not isinstance( batch[col].dtype, pd.CategoricalDtype ):
+                    return False
+            elif batch[col].dtype != dtype:
+                return False
+        return True
+
+    def _recode( self, col, categories ):
+        """ Refaz os códigos de uma coluna categórica para uma lista de categorias maior ( arrays novos ) """
+        dtype = pd.CategoricalDtype( categories, ordered=self.dtypes[col].ordered )
+        codes = self.frame()[col].cat.set_categories( categories ).cat.codes.to_numpy()
+        self.columns[col] = self._allocate( codes, self.capacity )
+        self.dtypes[col] = dtype
+
+    def append( self, batch ):
+        """ Esta função tem a responsabilidade de copiar um lote para o fim das colunas
+
+            Input: Dataframe do lote ( já limpo, com as mesmas colunas, ver accepts )
+            Output: Dataframe com as linhas antigas e as do lote
+        """
+        end = self.n + len( batch )
+        if end > self.capacity:
+            capacity = max( int( end * APPEND_GROWTH ), end )
+            self.index = self._allocate( self.index[:self.n], capacity )
+            self.columns = { col: self._allocate( values[:self.n], capacity ) for col, values in self.columns.items() }
+
+        self.index[self.n:end] = batch.index.to_numpy()
+        for col, dtype in self.dtypes.items():
+            values = batch[col]
+            if isinstance( dtype, pd.CategoricalDtype ):
+                new = values.cat.categories.difference( dtype.categories )
+                if len( new ):
+                    self._recode( col, dtype.categories.union( new ) )
+                values = values.cat.set_categories( self.dtypes[col].categories ).cat.codes
+            self.columns[col][self.n:end] = values.to_numpy()
+
+        self.n = end
+        return self.frame()
+
+    def frame( self ):
+        """ Dataframe com as linhas já adicionadas ( visão dos arrays, sem cópia ) """
+        n = self.n
+        data = {}
+        for col, dtype in self.dtypes.items():
+            values = self.columns[col][:n]
+            if isinstance( dtype, pd.CategoricalDtype ):
+                values = _categorical( values, dtype )
+            data[col] = values
+        return pd.DataFrame( data, index=pd.Index( self.index[:n], name=self.index_name, copy=False ), copy=False )
+
+
+def append_frame( df1, batch ):
+    """ Esta função tem a responsabilidade de adicionar um lote no fim de um data frame limpo
+
+        Na primeira vez as colunas vão para um AppendBuffer ( uma cópia do histórico ); nas próximas, só o
+        lote é copiado. Cada data frame devolvido pode receber um único lote pelo espaço livre ( o buffer
+        passa para o data frame novo ); os demais casos ( colunas ou tipos diferentes ) usam concat_frames.
+
+        Input: Dataframe limpo e dataframe do lote ( já limpo )
+        Output: Novo dataframe ( o data frame de entrada não é alterado )
+    """
+    buffer = _append_buffers.pop( id( df1 ), None )
+    if buffer is None or buffer.n != len( df1 ):
+        buffer = AppendBuffer( df1, max( int( ( len( df1 ) + len( batch ) ) * APPEND_GROWTH ), len( df1 ) + len( batch ) ) )
+    if not buffer.accepts( batch ):
+        return concat_frames( [ df1, batch ] )
+
+    new_df = buffer.append( batch )
+    _append_buffers[id( new_df )] = buffer
+    weakref.finalize( new_df, _append_buffers.pop, id( new_df ), None )
+    return new_df
+
+
+def append_cached( batch, old_fingerprint, new_fingerprint, report=None, parts=None ):
+    """ Esta função tem a responsabilidade de adicionar um lote já limpo aos data frames em cache
+
+        Os data frames da versão antiga do arquivo viram novos data frames com o lote no fim
+        ( ver append_frame: só o lote é copiado; os antigos não são alterados, então quem já está usando
+        a versão antiga continua com ela ), e as estruturas derivadas com updater registrado são
+        atualizadas só com o lote. A versão antiga sai do cache como em uma troca de versão ( ver retire_versions ).
+
+        Input:
+            - batch: Dataframe do lote ( já limpo, ver clean_code )
+            - old_fingerprint, new_fingerprint: Fingerprint antes e depois do lote
+            - report: Relatório do clean_code da versão nova ( None = soma o da versão antiga com o do lote )
+            - parts: Partes do snapshot da versão nova ( ver _catch_up; None = desconhecidas )
+        Output: None
+    """
+    with _cache_lock:
+        for key in [ k for k in _cache if k[0] == tuple( old_fingerprint ) ]:
+            old_df = _cache[key]
+            columns = key[1]
+            part = batch if columns is None else batch.loc[:, list( columns )]
+
+            new_df = append_frame( old_df, part )
+            new_df.attrs["clean_report"] = report or snapshot.merge_reports( clean_report( old_df ), clean_report( batch ) )
+            new_df.attrs["snapshot_parts"] = parts
+            _cache[( tuple( new_fingerprint ), columns )] = new_df
+
+            with _derived_lock:
+                for ( df_id, name ), value in list( _derived.items() ):
+                    if df_id == id( old_df ) and name in _updaters:
+                        _store_derived( new_df, name, _updaters[name]( value, part, new_df ) )
+
+        retire_versions( _cache, new_fingerprint, version_of=lambda k: k[0] )
@@ -0,0 +1,66 @@
+#Bibliotecas necessárias
+import numpy as np
+
+#Colunas de calendário calculadas na limpeza ( ver utils/data.clean_code ) e o tipo de cada uma:
+#1. Order_Day: Dia ( dias desde 01-01-1970 ), para agrupar e comparar datas com inteiros
+#2. Order_Weekday: Dia da semana ( segunda = 0 ... domingo = 6, igual ao dt.weekday do pandas )
+#3. Order_Week: Semana do ano começando no domingo ( mesmo número do strftime( "%U" ) )
+#4. Order_ISO_Week: Semana ISO ( começa na segunda, igual ao dt.isocalendar().week )
+#Pedidos sem data ficam com -1 em todas elas.
+CALENDAR_COLUMNS = { "Order_Day": "int32", "Order_Weekday": "int8", "Order_Week": "int8", "Order_ISO_Week": "int8" }
+
+#-------------------
+#Funções
+#-------------------
+def _days( dates ):
+    """ Dias desde 01-01-1970 de cada data e máscara das datas presentes """
+    dates = np.asarray( dates, dtype="datetime64[ns]" )
+    present = ~np.isnat( dates )
+    days = np.where( present, dates.astype( "datetime64[D]" ).astype( np.int64 ), 0 )
+    return days, present
+
+
+def _year_start( days ):
+    """ Dia ( desde 01-01-1970 ) do primeiro dia do ano de cada dia """
+    return days.astype( "datetime64[D]" ).astype( "datetime64[Y]" ).astype( "datetime64[D]" ).astype( np.int64 )
+
+
+def week_of_year( dates ):
+    """ Esta função tem a responsabilidade de calcular a semana do ano ( mesmo número do strftime( "%U" ) )
+
+        A semana começa no domingo e os dias antes do primeiro domingo do ano são a semana 0.
+
+        Input: Array ( ou Series ) de datas
+        Output: Array de inteiros ( -1 para datas ausentes )
+    """
+    days, present = _days( dates )
+
+    #01-01-1970 foi uma quinta-feira: ( dias + 4 ) % 7 dá o dia da semana com domingo = 0
+    sunday_weekday = ( days + 4 ) % 7
+    week = ( days - _year_start( days ) + 7 - sunday_weekday ) // 7
+    return np.where( present, week, -1 )
+
+
+def calendar_columns( dates ):
+    """ Esta função tem a responsabilidade de calcular as colunas de calendário ( CALENDAR_COLUMNS )
+
+        Tudo é aritmética sobre o número de dias de cada data, sem formatar texto linha a linha.
+
+        Input: Array ( ou Series ) de datas
+        Output: Dicionário com um array por coluna, já com o tipo de CALENDAR_COLUMNS
+    """
+    days, present = _days( dates )
+    weekday = ( days + 3 ) % 7
+
+    #A semana ISO de um dia é a semana da quinta-feira da mesma semana, contada no ano dessa quinta-feira
+    thursday = days - weekday + 3
+    iso_week = ( thursday - _year_start( thursday ) ) // 7 + 1
+
+    columns = {
+        "Order_Day": days,
+        "Order_Weekday": weekday,
+        "Order_Week": week_of_year( dates ),
+        "Order_ISO_Week": iso_week,
+    }
+    return { col: np.where( present, values, -1 ).astype( CALENDAR_COLUMNS[col] ) for col, values in columns.items() }
+
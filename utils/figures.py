@@ -0,0 +1,55 @@
+#Bibliotecas necessárias
+import os
+
+from utils.cache import LRUCache, resolve
+from utils.profiling import profile_step
+
+#Memória máxima dos gráficos guardados, em MB ( pode ser alterada pela variável de ambiente CURRY_FIGURE_CACHE_MB )
+FIGURE_CACHE_ENV = "CURRY_FIGURE_CACHE_MB"
+FIGURE_CACHE_MB = 64
+
+#Quantidade máxima de gráficos guardados, independente do tamanho
+FIGURE_CACHE_SIZE = 1024
+
+#JSON dos gráficos já gerados, por ( função do gráfico, versão do dataset e estado dos filtros )
+_figures = LRUCache( maxsize=FIGURE_CACHE_SIZE,
+                     maxbytes=int( float( os.environ.get( FIGURE_CACHE_ENV, FIGURE_CACHE_MB ) ) * 1024 ** 2 ) )
+
+#-------------------
+#Funções
+#-------------------
+def cached_figure( chart, key, *args ):
+    """ Esta função tem a responsabilidade de gerar cada gráfico uma única vez por estado de filtro
+
+        O gráfico é guardado como JSON ( o tamanho do JSON conta para o limite de memória ) e
+        reconstruído a partir dele, então quem recebe o gráfico pode alterá-lo sem afetar o cache.
+
+        Input:
+            - chart: Função que gera o gráfico ( ex: order_metric )
+            - key: Identifica a versão do dataset e o estado dos filtros ( ex: cube.key do cubo filtrado )
+            - args: Parâmetros da função do gráfico ( um Lazy, ver utils/cache.py, só é calculado
+                    se o gráfico não estiver guardado )
+        Output: Gráfico ( plotly Figure )
+    """
+    #plotly só é importado quando o primeiro gráfico é desenhado
+    import plotly.io as pio
+
+    name = chart.__module__ + "." + chart.__qualname__
+    with profile_step( "cached_figure:" + chart.__name__ ) as step:
+        figure_json = _figures.get_or_compute( ( name, ) + tuple( key ), lambda: chart( *map( resolve, args ) ).to_json() )
+        if step:
+            step.payload_bytes = len( figure_json )
+        return pio.from_json( figure_json )
+
+
+def figure_cache_stats():
+    """ Esta função tem a responsabilidade de mostrar o uso do cache de gráficos
+
+        Output: Dicionário com hits, misses, size, maxsize, bytes e maxbytes
+    """
+    return _figures.stats()
+
+
+def clear_figure_cache():
+    """ Descarta todos os gráficos guardados """
+    _figures.clear()
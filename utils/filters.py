@@ -0,0 +1,201 @@
+#Bibliotecas necessárias
+import copy
+
+import numpy as np
+import pandas as pd
+
+from utils.data import derived, register_updater
+from utils.profiling import profile_step, profiled
+
+#Colunas categóricas filtradas pela barra lateral
+CATEGORY_COLUMNS = [ "Road_traffic_density", "Weatherconditions", "City" ]
+
+#Opções de cada multiselect da barra lateral ( as mesmas listas das páginas )
+SIDEBAR_OPTIONS = {
+    "Road_traffic_density": [ "Low", "Medium", "High", "Jam" ],
+    "Weatherconditions": [ "conditions Cloudy", "conditions Fog", "conditions Sandstorms",
+                           "conditions Stormy", "conditions Sunny", "conditions Windy" ],
+    "City": [ "Metropolitian", "Urban", "Semi-Urban" ],
+}
+
+#-------------------
+#Funções
+#-------------------
+def option_order( dim, values ):
+    """ Esta função tem a responsabilidade de ordenar as categorias de uma dimensão para exibição
+
+        Input: Nome da dimensão ( ex: City ) e valores presentes nos dados
+        Output: Lista com os valores na ordem das opções da barra lateral ( SIDEBAR_OPTIONS ) e, depois,
+                os que não estão nas opções ( ex: uma cidade nova ), em ordem alfabética
+    """
+    present = set( values )
+    options = SIDEBAR_OPTIONS.get( dim, [] )
+    return [ option for option in options if option in present ] + sorted( present.difference( options ) )
+
+
+class FilterIndex:
+    """ Esta classe tem a responsabilidade de aplicar os filtros da barra lateral de uma vez só
+
+        É construída uma única vez por dataset e guarda:
+        1. Para cada coluna categórica, o código de cada linha e a lista de categorias
+        2. As datas ordenadas ( e a posição de cada linha nessa ordem ) para o corte de data
+
+        Assim, cada filtro vira uma consulta numa tabela pequena, e todos os filtros ativos
+        são combinados numa única seleção de linhas, sem criar data frames intermediários.
+    """
+
+    def __init__( self, df1 ):
+        self.n_rows = len( df1 )
+
+        self.codes = {}
+        self.categories = {}
+        self.has_missing = {}
+        for col in CATEGORY_COLUMNS:
+            codes, uniques = pd.factorize( df1[col] )
+            self.codes[col] = codes.astype( np.int32 )
+            self.categories[col] = pd.Index( uniques )
+            self.has_missing[col] = bool( ( codes < 0 ).any() )
+
+        dates = df1["Order_Date"].to_numpy()
+        self.date_order = np.argsort( dates, kind="stable" )
+        self.sorted_dates = dates[self.date_order]
+        self.date_rank = np.empty( self.n_rows, dtype=np.int64 )
+        self.date_rank[self.date_order] = np.arange( self.n_rows )
+
+    def append( self, batch ):
+        """ Esta função tem a responsabilidade de montar o índice do data frame com um lote novo no fim
+
+            Só o lote é codificado e ordenado: as categorias novas entram no fim da lista e as datas do
+            lote são intercaladas nas datas ordenadas ( depois das datas iguais, como na ordenação estável ).
+            O índice atual não é alterado ( execuções com a versão antiga continuam usando ).
+
+            Input: Dataframe do lote ( já limpo, com as colunas dos filtros )
+            Output: Novo FilterIndex, igual ao construído com o data frame inteiro
+        """
+        new = copy.copy( self )
+        new.n_rows = self.n_rows + len( batch )
+
+        new.codes, new.categories, new.has_missing = {}, {}, {}
+        for col in CATEGORY_COLUMNS:
+            values = batch[col].astype( object )
+            present = values.notna().to_numpy()
+            added = pd.Index( values[present].unique() ).difference( self.categories[col], sort=False )
+            categories = self.categories[col].append( added )
+            codes = np.where( present, categories.get_indexer( values ), -1 ).astype( np.int32 )
+            new.codes[col] = np.concatenate( [ self.codes[col], codes ] )
+            new.categories[col] = categories
+            new.has_missing[col] = self.has_missing[col] or not present.all()
+
+        dates = batch["Order_Date"].to_numpy()
+        order = np.argsort( dates, kind="stable" )
+        at = np.searchsorted( self.sorted_dates, dates[order], side="right" )
+        new.sorted_dates = np.insert( self.sorted_dates, at, dates[order] )
+        new.date_order = np.insert( self.date_order, at, self.n_rows + order )
+        new.date_rank = np.empty( new.n_rows, dtype=np.int64 )
+        new.date_rank[new.date_order] = np.arange( new.n_rows )
+        return new
+
+    def category_mask( self, col, values ):
+        """ Retorna a máscara das linhas cuja categoria está em values, ou None se todas estão """
+        #Uma posição a mais no fim para o código -1 ( valor ausente ), que nunca é selecionado
+        lookup = np.append( self.categories[col].isin( list( values ) ), False )
+        if lookup[:-1].all() and not self.has_missing[col]:
+            return None
+        return lookup[self.codes[col]]
+
+    def select( self, date_max=None, **selections ):
+        """ Esta função tem a responsabilidade de combinar todos os filtros ativos
+
+            Input:
+                - date_max: Data limite ( exclusiva ), ou None para não filtrar por data
+                - selections: Categorias selecionadas por coluna,
+                              ex: Road_traffic_density=["Low", "Jam"], City=["Urban"]
+            Output: Array com as posições das linhas selecionadas, ou None se todas foram selecionadas
+        """
+        #Cada filtro é medido como um passo ( ver utils/profiling.py ), com as linhas que ele sozinho seleciona
+        mask = None
+        for col, values in selections.items():
+            with profile_step( "filter:" + col, self.n_rows ) as step:
+                col_mask = self.category_mask( col, values )
+                if step:
+                    step.rows_out = self.n_rows if col_mask is None else int( col_mask.sum() )
+            if col_mask is None:
+                continue
+            if mask is None:
+                mask = col_mask
+            else:
+                mask &= col_mask
+
+        n_dates = self.n_rows
+        if date_max is not None:
+            with profile_step( "filter:Order_Date", self.n_rows ) as step:
+                n_dates = int( np.searchsorted( self.sorted_dates, np.datetime64( date_max ), side="left" ) )
+                if step:
+                    step.rows_out = n_dates
+
+        if n_dates < self.n_rows:
+            if mask is None:
+                return np.sort( self.date_order[:n_dates] )
+            mask &= ( self.date_rank < n_dates )
+
+        if mask is None:
+            return None
+
+        return np.flatnonzero( mask )
+
+
+def filter_index( df1 ):
+    """ Esta função tem a responsabilidade de devolver o índice de filtros do dataset
+
+        Input: Dataframe do load_data
+        Output: FilterIndex ( construído uma única vez por dataset )
+    """
+    return derived( df1, "filter_index", FilterIndex )
+
+
+#Com um lote novo ( ver utils.data.append_cached ), o índice é estendido só com o lote
+register_updater( "filter_index", lambda index, batch, df1: index.append( batch ) )
+
+
+@profiled()
+def filter_rows( df1, date_max, traffic_options, weather_conditions, cities ):
+    """ Esta função tem a responsabilidade de achar as linhas selecionadas pelos filtros da barra lateral
+
+        Input: Mesmos parâmetros do filter_frame
+        Output: Array com as posições das linhas selecionadas, ou None se todas foram selecionadas
+    """
+    return filter_index( df1 ).select( date_max,
+                                       Road_traffic_density=traffic_options,
+                                       Weatherconditions=weather_conditions,
+                                       City=cities )
+
+
+@profiled()
+def filter_frame( df1, date_max, traffic_options, weather_conditions, cities ):
+    """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral
+
+        Input:
+            - df1: Dataframe do load_data
+            - date_max: Data limite ( exclusiva )
+            - traffic_options, weather_conditions, cities: Listas selecionadas nos multiselects
+        Output: Dataframe filtrado ( um único data frame novo; o compartilhado não é alterado )
+    """
+    rows = filter_rows( df1, date_max, traffic_options, weather_conditions, cities )
+    if rows is None:
+        return df1.copy( deep=False )
+
+    return df1.take( rows )
+
+
+def filter_state_key( date_max, traffic_options, weather_conditions, cities ):
+    """ Esta função tem a responsabilidade de identificar o estado dos filtros da barra lateral
+
+        A ordem das opções selecionadas não muda a chave.
+
+        Input: Mesmos parâmetros do filter_frame ( sem o data frame )
+        Output: Tupla que pode ser usada como chave de cache
+    """
+    return ( date_max,
+             tuple( sorted( traffic_options ) ),
+             tuple( sorted( weather_conditions ) ),
+             tuple( sorted( cities ) ) )
@@ -0,0 +1,90 @@
+#Bibliotecas necessárias
+import numpy as np
+
+#Mesmo raio médio da Terra usado pela biblioteca haversine, para os valores baterem
+EARTH_RADIUS_KM = 6371.0088
+
+#Tamanho da célula da grade do mapa de calor das entregas, em graus ( ~1 km )
+HEATMAP_CELL_DEG = 0.01
+
+#-------------------
+#Funções
+#-------------------
+def valid_coordinates( lat, lon ):
+    """ Esta função tem a responsabilidade de marcar as coordenadas que podem ser usadas
+
+        Coordenadas zeradas ( 0, 0 ) ou fora dos limites ( latitude entre -90 e 90,
+        longitude entre -180 e 180 ) são consideradas inválidas.
+
+        Input: Arrays de latitude e longitude
+        Output: Array booleano, True quando a coordenada é válida
+    """
+    lat = np.asarray( lat, dtype=float )
+    lon = np.asarray( lon, dtype=float )
+    return ( ( np.abs( lat ) <= 90 ) & ( np.abs( lon ) <= 180 )
+             & ~( ( lat == 0 ) | ( lon == 0 ) ) )
+
+
+def haversine_np( lat1, lon1, lat2, lon2 ):
+    """ Esta função tem a responsabilidade de calcular a distância entre dois pontos
+
+        Mesmo cálculo da função haversine, mas sobre arrays inteiros de uma vez só
+        em vez de uma linha por vez.
+
+        Input: Arrays de latitude e longitude ( em graus ) dos dois pontos
+        Output: Array com as distâncias em km
+    """
+    lat1, lon1, lat2, lon2 = ( np.radians( np.asarray( v, dtype=float ) ) for v in ( lat1, lon1, lat2, lon2 ) )
+
+    d = ( np.sin( ( lat2 - lat1 ) * 0.5 ) ** 2
+          + np.cos( lat1 ) * np.cos( lat2 ) * np.sin( ( lon2 - lon1 ) * 0.5 ) ** 2 )
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin( np.sqrt( d ) )
+
+
+def delivery_distance( df1 ):
+    """ Esta função tem a responsabilidade de calcular a distância entre o restaurante e o local de entrega
+
+        Linhas com coordenadas inválidas ( ver valid_coordinates ) ficam com distância NaN,
+        então não entram nas médias.
+
+        Input: Dataframe com as colunas de latitude e longitude do restaurante e da entrega
+        Output: Array com a distância em km de cada pedido
+    """
+    rest_lat = df1["Restaurant_latitude"].to_numpy()
+    rest_lon = df1["Restaurant_longitude"].to_numpy()
+    deli_lat = df1["Delivery_location_latitude"].to_numpy()
+    deli_lon = df1["Delivery_location_longitude"].to_numpy()
+
+    distance = haversine_np( rest_lat, rest_lon, deli_lat, deli_lon )
+
+    valid = valid_coordinates( rest_lat, rest_lon ) & valid_coordinates( deli_lat, deli_lon )
+    distance[~valid] = np.nan
+
+    return distance
+
+
+def grid_cells( lat, lon, cell_deg ):
+    """ Esta função tem a responsabilidade de achar a célula de uma grade regular de cada coordenada
+
+        Input: Arrays de latitude e longitude e tamanho da célula da grade em graus
+        Output: ( linha da célula, coluna da célula, coordenada válida ) - arrays, uma posição por coordenada.
+                A célula das coordenadas inválidas ( ver valid_coordinates ) é 0.
+    """
+    lat = np.asarray( lat, dtype=float )
+    lon = np.asarray( lon, dtype=float )
+    valid = valid_coordinates( lat, lon )
+
+    rows = np.floor( np.where( valid, lat, 0.0 ) / cell_deg ).astype( np.int64 )
+    cols = np.floor( np.where( valid, lon, 0.0 ) / cell_deg ).astype( np.int64 )
+    return rows, cols, valid
+
+
+def cell_centers( rows, cols, cell_deg ):
+    """ Esta função tem a responsabilidade de achar a coordenada do centro das células da grade
+
+        Input: Arrays de linha e coluna das células e tamanho da célula em graus
+        Output: ( latitude, longitude ) - arrays
+    """
+    return ( np.asarray( rows ) + 0.5 ) * cell_deg, ( np.asarray( cols ) + 0.5 ) * cell_deg
+
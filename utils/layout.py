@@ -0,0 +1,48 @@
+#Componentes de layout compartilhados pelas páginas.
+
+#Bibliotecas necessárias
+import streamlit as st
+
+from utils.refresh import version_info
+
+#-------------------
+#Funções
+#-------------------
+def lazy_tabs( labels, key ):
+    """ Esta função tem a responsabilidade de escolher qual seção da página é desenhada
+
+        O st.tabs roda o conteúdo de todas as abas em toda interação, mesmo as que não estão
+        visíveis. Aqui as seções são escolhidas num seletor horizontal e a página só executa a
+        seção escolhida ( ex: if secao == "Visão Tática": ... ), então as demais não custam nada.
+        A escolha fica guardada na sessão ( key ), então continua a mesma quando os filtros mudam.
+
+        Input: Nomes das seções e chave única do seletor na página
+        Output: Nome da seção escolhida
+    """
+    return st.radio( "Seção", labels, horizontal=True, key=key, label_visibility="collapsed" )
+
+
+def _age( seconds ):
+    """ Idade em texto curto ( ex: 40 s, 5 min, 3 h, 2 dias ) """
+    if seconds < 60:
+        return "{:.0f} s".format( seconds )
+    if seconds < 3600:
+        return "{:.0f} min".format( seconds // 60 )
+    if seconds < 86400:
+        return "{:.0f} h".format( seconds // 3600 )
+    return "{:.0f} dias".format( seconds // 86400 )
+
+
+def data_status():
+    """ Esta função tem a responsabilidade de mostrar na barra lateral a versão e a idade dos dados
+
+        A versão é a fixada por esta execução ( ver utils/refresh.py ), então os números da página
+        sempre correspondem a ela, mesmo se uma versão nova for publicada no meio da execução.
+    """
+    info = version_info()
+    st.sidebar.caption( "Dados: versão {} · CSV atualizado há {}".format( info["version"], _age( info["age_s"] ) ) )
+    if info["published_age_s"] is not None:
+        st.sidebar.caption( "Versão publicada há {}".format( _age( info["published_age_s"] ) ) )
+    if info["refresh_error"] is not None:
+        st.sidebar.caption( "A última atualização falhou ( a versão acima continua valendo ): {}".format(
+            info["refresh_error"] ) )
@@ -0,0 +1,44 @@
+#Bibliotecas necessárias
+from utils.cache import LRUCache
+from utils.profiling import profile_step
+
+#Quantidade de mapas ( HTML pronto ) guardados, de todas as sessões e estados de filtro
+MAP_CACHE_SIZE = 64
+
+#HTML dos mapas já desenhados, por ( mapa, versão do dataset, estado dos filtros )
+_maps = LRUCache( maxsize=MAP_CACHE_SIZE )
+
+#-------------------
+#Funções
+#-------------------
+def render_map( map ):
+    """ Esta função tem a responsabilidade de transformar o mapa em HTML
+
+        Gera o mesmo HTML que o folium_static desenharia.
+
+        Input: folium.Map
+        Output: HTML ( texto )
+    """
+    #folium só é importado quando o primeiro mapa é desenhado ( ver utils/visao_empresa.py )
+    import folium
+
+    return folium.Figure().add_child( map ).render()
+
+
+def cached_map_html( key, builder ):
+    """ Esta função tem a responsabilidade de desenhar cada mapa uma única vez por estado de filtro
+
+        Input: Chave ( ex: nome do mapa, versão do dataset e estado dos filtros ) e função sem
+               argumentos que devolve o folium.Map
+        Output: HTML do mapa
+    """
+    with profile_step( "cached_map_html:" + str( key[0] ) ) as step:
+        return step.output( _maps.get_or_compute( key, lambda: render_map( builder() ) ) )
+
+
+def map_cache_stats():
+    """ Esta função tem a responsabilidade de mostrar o uso do cache de mapas
+
+        Output: Dicionário com hits, misses, size e maxsize
+    """
+    return _maps.stats()
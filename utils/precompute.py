@@ -0,0 +1,684 @@
+#Pré-cálculo, em lote, das consultas das páginas para todos os estados da barra lateral.
+#
+#Uso:
+#    python -m utils.precompute
+#    python -m utils.precompute --data train.csv --workers 8 --check 200
+#
+#A barra lateral tem 4 opções de trânsito, 6 de clima e 3 cidades ( multiselects ) e uma data limite,
+#então o número de estados é finito: cada combinação não vazia das opções ( 15 x 63 x 7 = 6615 ) vezes
+#cada data limite que muda o resultado ( uma por dia com pedidos, mais "todas" ).
+#
+#As agregações que saem de somas de células ( contagens, médias e desvios ) já são consultas no cubo de
+#pedidos ( ver utils/cube.py ). Aqui ficam as que não podem ser somadas entre células e que as páginas
+#calculavam a partir dos pedidos filtrados:
+#1. Pedidos e entregadores únicos por semana ( Visão Tática )
+#2. Mediana das coordenadas por cidade e tráfego ( mapa )
+#3. Maior e menor idade e condição de veículo ( métricas dos entregadores )
+#4. Os TOP_K entregadores mais rápidos e mais lentos de cada cidade
+#
+#O cálculo é dividido por combinação entre os processos de um pool ( todos os núcleos por padrão ).
+#Cada combinação é calculada para todas as datas limite de uma vez: os pedidos ficam ordenados
+#por data, então cada data limite é um prefixo deles.
+#
+#O resultado é gravado numa pasta ( .precomputed/<nome do CSV> ) com um manifest.json e um arquivo .npy
+#por agregação, de tamanho fixo por estado ( não depende da quantidade de pedidos ). As páginas abrem
+#os arquivos via memory map e cada estado da barra lateral vira uma leitura por posição ( ver view ).
+
+#Bibliotecas necessárias
+import argparse
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import Lazy, resolve
+from utils.couriers import CourierStats
+from utils.data import DATA_PATH, data_version, load_data, retire_versions, source_fingerprint
+from utils.dates import week_of_year
+from utils.filters import SIDEBAR_OPTIONS, filter_frame, option_order
+from utils.profiling import profiled
+from utils.streaming import StreamingView, _location_counts
+
+#Liga a leitura do pré-cálculo nas páginas ( CURRY_PRECOMPUTED=1 ), quando ele existe e está atualizado
+PRECOMPUTED_ENV = "CURRY_PRECOMPUTED"
+
+#Versão do formato do armazenamento. Deve ser incrementada sempre que as agregações mudarem
+PRECOMPUTE_VERSION = 2
+
+#Pasta onde o pré-cálculo fica guardado ( ao lado do CSV, como o snapshot )
+PRECOMPUTE_DIR = ".precomputed"
+MANIFEST = "manifest.json"
+
+#Colunas lidas do dataset
+PRECOMPUTE_COLUMNS = [ "Order_Date", "Road_traffic_density", "Weatherconditions", "City", "Delivery_person_ID",
+                       "Time_taken(min)", "Delivery_person_Age", "Vehicle_condition",
+                       "Delivery_location_latitude", "Delivery_location_longitude" ]
+
+#Quantidade de entregadores guardados por cidade ( o mesmo padrão da página, ver utils/visao_entregadores.py )
+PRECOMPUTE_TOP_K = 10
+
+#Combinações calculadas por tarefa do pool
+CHUNK_SIZE = 64
+
+#Agregações de cada estado, na ordem das colunas do arquivo overall
+OVERALL = [ "maior_idade", "menor_idade", "melhor_condicao", "pior_condicao" ]
+
+#Dados de cada processo do pool ( ver _init_worker )
+_worker = {}
+
+#-------------------
+#Funções
+#-------------------
+def precompute_path( source_path, precompute_dir=PRECOMPUTE_DIR ):
+    """ Esta função tem a responsabilidade de definir onde fica o pré-cálculo de um CSV
+
+        Input: Caminho do CSV
+        Output: Caminho da pasta do pré-cálculo
+    """
+    name = os.path.splitext( os.path.basename( source_path ) )[0]
+    return os.path.join( os.path.dirname( os.path.abspath( source_path ) ), precompute_dir, name )
+
+
+def combinations():
+    """ Esta função tem a responsabilidade de listar as combinações não vazias das opções da barra lateral
+
+        Output: Lista de tuplas de máscaras de bits ( uma por multiselect, na ordem do SIDEBAR_OPTIONS;
+                o bit i indica a opção i ), na ordem das linhas do armazenamento
+    """
+    return list( itertools.product( *( range( 1, 2 ** len( options ) ) for options in SIDEBAR_OPTIONS.values() ) ) )
+
+
+def _combination_index( masks ):
+    """ Linha do armazenamento de uma combinação ( mesma ordem do combinations ) """
+    index = 0
+    for mask, options in zip( masks, SIDEBAR_OPTIONS.values() ):
+        index = index * ( 2 ** len( options ) - 1 ) + ( mask - 1 )
+    return index
+
+
+def _prepare( df1 ):
+    """ Esta função tem a responsabilidade de transformar as colunas usadas em arrays de códigos
+
+        Os pedidos ficam ordenados por data, então os pedidos antes de cada data limite são um prefixo.
+
+        Input: Dataframe do load_data ( com as colunas PRECOMPUTE_COLUMNS )
+        Output: Dicionário com os arrays por pedido e as listas de rótulos ( datas, semanas, entregadores... )
+    """
+    order = np.argsort( df1["Order_Date"].to_numpy(), kind="stable" )
+    df1 = df1.iloc[order]
+
+    dates, day = np.unique( df1["Order_Date"].to_numpy(), return_inverse=True )
+    week_labels, week_of_day = np.unique( week_of_year( dates ), return_inverse=True )
+    courier, couriers = pd.factorize( df1["Delivery_person_ID"].astype( object ).to_numpy(), sort=True )
+    cities = sorted( df1["City"].dropna().unique() )
+    traffics = sorted( df1["Road_traffic_density"].dropna().unique() )
+
+    city = pd.Index( cities ).get_indexer( df1["City"] )
+    traffic = pd.Index( traffics ).get_indexer( df1["Road_traffic_density"] )
+
+    data = {
+        "n_rows": len( df1 ),
+        "dates": dates,
+        "weeks": week_labels.tolist(),
+        "week_of_day": week_of_day,
+        "couriers": list( couriers ),
+        "cities": cities,
+        "traffics": traffics,
+        "day": day,
+        "courier": courier,
+        "city": city,
+        "group": np.where( ( city >= 0 ) & ( traffic >= 0 ), city * len( traffics ) + traffic, -1 ),
+        "time": df1["Time_taken(min)"].to_numpy( dtype=float ),
+        "age": df1["Delivery_person_Age"].to_numpy( dtype=float ),
+        "vehicle": df1["Vehicle_condition"].to_numpy( dtype=float ),
+        "lat": df1["Delivery_location_latitude"].to_numpy( dtype=float ),
+        "lon": df1["Delivery_location_longitude"].to_numpy( dtype=float ),
+    }
+    #Código de cada pedido na lista de opções de cada multiselect ( -1 = fora das opções, nunca selecionado )
+    for col, options in SIDEBAR_OPTIONS.items():
+        data[col] = pd.Index( options ).get_indexer( df1[col] )
+
+    return data
+
+
+def _prefix_extreme( values, bounds, func ):
+    """ func ( np.minimum ou np.maximum ) de values[:bounds[k]] para cada k, NaN se o prefixo está vazio """
+    out = np.full( len( bounds ), np.nan )
+    starts = bounds[:-1]
+    nonempty = bounds[1:] > starts
+    if not nonempty.any():
+        return out
+
+    #Os pedidos estão ordenados por data: cada dia com pedidos é um trecho contínuo
+    per_day = func.accumulate( func.reduceat( values, starts[nonempty] ) )
+    last_day = np.cumsum( nonempty ) - 1
+    out[1:] = np.where( last_day >= 0, per_day[np.maximum( last_day, 0 )], np.nan )
+    return out
+
+
+def _prefix_medians( values, bounds ):
+    """ Esta função tem a responsabilidade de calcular a mediana de cada prefixo de values
+
+        Os valores ordenados são divididos em blocos de ~raiz(n) posições. Para cada data limite, a
+        contagem de valores do prefixo em cada bloco ( soma acumulada das contagens por dia ) diz em que
+        bloco está o valor do meio, e só as posições desse bloco são conferidas. Tempo e memória
+        O( n log n + datas x raiz(n) ), em vez de uma matriz datas x n.
+
+        Input: Valores ( na ordem dos pedidos ) e tamanhos dos prefixos, em ordem crescente
+        Output: Mediana de values[:bounds[k]] para cada k ( mesmo resultado do median() do pandas ), NaN se vazio
+    """
+    out = np.full( len( bounds ), np.nan )
+    valid = bounds > 0
+    n = len( values )
+    if n == 0 or not valid.any():
+        return out
+
+    order = np.argsort( values, kind="stable" )
+    sorted_values = values[order]
+    rank = np.empty( n, dtype=np.int64 )
+    rank[order] = np.arange( n )
+
+    #Valores de cada bloco ( das posições ordenadas ) no prefixo de cada data limite
+    block_size = max( int( np.sqrt( n ) ), 1 )
+    n_blocks = -( -n // block_size )
+    segment = np.searchsorted( bounds, np.arange( n ), side="right" )
+    counts = np.bincount( segment * n_blocks + rank // block_size, minlength=( len( bounds ) + 1 ) * n_blocks )
+    in_blocks = np.cumsum( np.cumsum( counts.reshape( -1, n_blocks )[:len( bounds )], axis=0 ), axis=1 )[valid]
+
+    #Posições, dentro do bloco, de cada valor ordenado ( n = fora do dataset, nunca no prefixo )
+    padded = np.append( order, np.full( n_blocks * block_size - n, n ) ).reshape( n_blocks, block_size )
+    valid_bounds = bounds[valid]
+
+    def select( target ):
+        #O target-ésimo valor ( a partir de 0 ) do prefixo
+        block = ( in_blocks <= target[:, None] ).sum( axis=1 )
+        before = np.where( block > 0, in_blocks[np.arange( len( block ) ), np.maximum( block - 1, 0 )], 0 )
+        in_prefix = np.cumsum( padded[block] < valid_bounds[:, None], axis=1 )
+        offset = ( in_prefix <= ( target - before )[:, None] ).sum( axis=1 )
+        return sorted_values[block * block_size + offset]
+
+    #Valor do meio ( ou média dos dois valores do meio, com quantidade par )
+    out[valid] = ( select( ( valid_bounds - 1 ) // 2 ) + select( valid_bounds // 2 ) ) / 2
+    return out
+
+
+def _aggregate( masks, data, top_k ):
+    """ Esta função tem a responsabilidade de calcular uma combinação para todas as datas limite
+
+        Input: Máscaras de bits da combinação, dados do _prepare e quantidade de entregadores por cidade
+        Output: Dicionário com os arrays da combinação ( ver PrecomputedStore )
+    """
+    from utils.visao_entregadores import rank_city
+
+    selected = np.ones( data["n_rows"], dtype=bool )
+    for mask, ( col, options ) in zip( masks, SIDEBAR_OPTIONS.items() ):
+        #Uma posição a mais no fim para o código -1, que nunca é selecionado
+        lookup = np.append( ( mask >> np.arange( len( options ) ) ) & 1, 0 ).astype( bool )
+        selected &= lookup[data[col]]
+    rows = np.flatnonzero( selected )
+
+    n_days = len( data["dates"] )
+    cutoffs = np.arange( n_days + 1 )
+    day = data["day"][rows]
+    bounds = np.searchsorted( day, cutoffs, side="left" )
+
+    #1. Pedidos por dia e, por dia, os entregadores que aparecem pela primeira vez na semana
+    courier = data["courier"][rows]
+    has_courier = courier >= 0
+    week_courier = data["week_of_day"][day[has_courier]].astype( np.int64 ) * len( data["couriers"] ) + courier[has_courier]
+    _, first = np.unique( week_courier, return_index=True )
+
+    result = {
+        "orders_day": np.bincount( day, minlength=n_days ),
+        "new_couriers_day": np.bincount( day[has_courier][first], minlength=n_days ),
+    }
+
+    #2. Idade e condição de veículo, acumuladas dia a dia
+    result["overall"] = np.column_stack( [
+        _prefix_extreme( data["age"][rows], bounds, np.maximum ),
+        _prefix_extreme( data["age"][rows], bounds, np.minimum ),
+        _prefix_extreme( data["vehicle"][rows], bounds, np.maximum ),
+        _prefix_extreme( data["vehicle"][rows], bounds, np.minimum ),
+    ] )
+
+    #3. Medianas das coordenadas por cidade e tráfego
+    n_groups = len( data["cities"] ) * len( data["traffics"] )
+    medians = np.full( ( n_days + 1, n_groups, 2 ), np.nan )
+    group = data["group"][rows]
+    for g in range( n_groups ):
+        in_group = group == g
+        if not in_group.any():
+            continue
+        for i, col in enumerate( [ "lat", "lon" ] ):
+            values = data[col][rows[in_group]]
+            present = ~np.isnan( values )
+            group_bounds = np.searchsorted( day[in_group][present], cutoffs, side="left" )
+            medians[:, g, i] = _prefix_medians( values[present], group_bounds )
+    result["medians"] = medians
+
+    #4. Para cada cidade e data limite, o menor tempo de cada entregador e os mais rápidos e mais lentos
+    top_ids = np.full( ( n_days + 1, len( data["cities"] ), 2, top_k ), -1, dtype=np.int32 )
+    top_times = np.zeros( ( n_days + 1, len( data["cities"] ), 2, top_k ), dtype=np.float64 )
+    city = data["city"][rows]
+    for c in range( len( data["cities"] ) ):
+        in_city = ( city == c ) & has_courier
+        if not in_city.any():
+            continue
+        city_days = day[in_city]
+        ids, position = np.unique( courier[in_city], return_inverse=True )
+        best = np.full( ( len( ids ), n_days ), np.inf )
+        np.minimum.at( best, ( position, city_days ), data["time"][rows[in_city]] )
+        best = np.minimum.accumulate( best, axis=1 )
+        days_with_orders = np.bincount( city_days, minlength=n_days ) > 0
+
+        for k in range( 1, n_days + 1 ):
+            if not days_with_orders[k - 1]:
+                #Nenhum pedido novo da cidade nesse dia: o resultado é o mesmo da data limite anterior
+                top_ids[k, c], top_times[k, c] = top_ids[k - 1, c], top_times[k - 1, c]
+                continue
+            times = best[:, k - 1]
+            present = np.isfinite( times )
+            times, present_ids = times[present], ids[present]
+            for side, positions in enumerate( rank_city( times, present_ids, top_k ) ):
+                top_ids[k, c, side, :len( positions )] = present_ids[positions]
+                top_times[k, c, side, :len( positions )] = times[positions]
+
+    result["top_ids"] = top_ids
+    result["top_times"] = top_times
+    return result
+
+
+def _init_worker( path, top_k ):
+    """ Lê o dataset uma única vez em cada processo do pool ( a partir do snapshot, via memory map ) """
+    _worker["data"] = _prepare( load_data( path, columns=PRECOMPUTE_COLUMNS ) )
+    _worker["top_k"] = top_k
+
+
+def _run_chunk( chunk ):
+    """ Calcula um bloco de combinações no processo do pool """
+    return chunk, [ _aggregate( masks, _worker["data"], _worker["top_k"] ) for masks in chunk ]
+
+
+def _shapes( data, n_combinations, top_k ):
+    """ Formato e tipo de cada arquivo do armazenamento """
+    n_days = len( data["dates"] )
+    n_cities = len( data["cities"] )
+    id_dtype = np.int16 if len( data["couriers"] ) < np.iinfo( np.int16 ).max else np.int32
+    return {
+        "orders_day": ( ( n_combinations, n_days ), np.int32 ),
+        "new_couriers_day": ( ( n_combinations, n_days ), np.int32 ),
+        "overall": ( ( n_combinations, n_days + 1, len( OVERALL ) ), np.float32 ),
+        "medians": ( ( n_combinations, n_days + 1, n_cities * len( data["traffics"] ), 2 ), np.float64 ),
+        "top_ids": ( ( n_combinations, n_days + 1, n_cities, 2, top_k ), id_dtype ),
+        "top_times": ( ( n_combinations, n_days + 1, n_cities, 2, top_k ), np.int16 ),
+    }
+
+
+def build_precomputed( path=DATA_PATH, workers=None, chunk_size=CHUNK_SIZE, top_k=PRECOMPUTE_TOP_K ):
+    """ Esta função tem a responsabilidade de calcular e gravar o pré-cálculo de um CSV
+
+        As combinações são divididas em blocos entre os processos do pool. A pasta nova é montada ao
+        lado da antiga e trocada no fim, então um leitor nunca vê um pré-cálculo pela metade.
+
+        Input: Caminho do CSV, quantidade de processos ( None = todos os núcleos ), combinações por
+               tarefa e quantidade de entregadores por cidade
+        Output: Dicionário com o caminho, a quantidade de estados, o tempo, a vazão e o tamanho em disco
+    """
+    started = time.perf_counter()
+    fingerprint = source_fingerprint( path )
+    workers = workers or os.cpu_count() or 1
+
+    #O processo principal também lê o dataset ( e grava o snapshot, se preciso ) antes de abrir o pool
+    data = _prepare( load_data( path, columns=PRECOMPUTE_COLUMNS ) )
+    all_combinations = combinations()
+    shapes = _shapes( data, len( all_combinations ), top_k )
+
+    final_path = precompute_path( path )
+    tmp_path = "{}.tmp-{}".format( final_path, uuid.uuid4().hex )
+    os.makedirs( tmp_path )
+    arrays = { name: np.lib.format.open_memmap( os.path.join( tmp_path, name + ".npy" ), mode="w+",
+                                                dtype=dtype, shape=shape )
+               for name, ( shape, dtype ) in shapes.items() }
+
+    chunks = [ all_combinations[i:i + chunk_size] for i in range( 0, len( all_combinations ), chunk_size ) ]
+    compute_started = time.perf_counter()
+    with ProcessPoolExecutor( max_workers=workers, initializer=_init_worker, initargs=( path, top_k ) ) as pool:
+        for chunk, results in pool.map( _run_chunk, chunks ):
+            for masks, result in zip( chunk, results ):
+                row = _combination_index( masks )
+                for name, values in result.items():
+                    arrays[name][row] = values
+    compute_s = time.perf_counter() - compute_started
+
+    for values in arrays.values():
+        values.flush()
+    del arrays
+
+    n_states = len( all_combinations ) * ( len( data["dates"] ) + 1 )
+    report = {
+        "path": final_path,
+        "workers": workers,
+        "combinations": len( all_combinations ),
+        "cutoffs": len( data["dates"] ) + 1,
+        "states": n_states,
+        "rows": data["n_rows"],
+        "compute_s": round( compute_s, 3 ),
+        "total_s": round( time.perf_counter() - started, 3 ),
+        "states_per_s": round( n_states / compute_s, 1 ),
+        "rows_per_s": round( len( all_combinations ) * data["n_rows"] / compute_s, 1 ),
+        "bytes": sum( os.path.getsize( os.path.join( tmp_path, name + ".npy" ) ) for name in shapes ),
+    }
+
+    with open( os.path.join( tmp_path, MANIFEST ), "w" ) as f:
+        json.dump( {
+            "version": PRECOMPUTE_VERSION,
+            "source": list( fingerprint ),
+            "options": SIDEBAR_OPTIONS,
+            "dates": [ str( d ) for d in pd.DatetimeIndex( data["dates"] ).date ],
+            "weeks": data["weeks"],
+            "week_of_day": data["week_of_day"].tolist(),
+            "couriers": data["couriers"],
+            "cities": data["cities"],
+            "traffics": data["traffics"],
+            "top_k": top_k,
+            "arrays": sorted( shapes ),
+            "build": report,
+        }, f )
+
+    #Troca a pasta antiga pela nova ( arquivos já abertos por outros processos continuam válidos )
+    old_path = None
+    if os.path.exists( final_path ):
+        old_path = "{}.old-{}".format( final_path, uuid.uuid4().hex )
+        os.replace( final_path, old_path )
+    os.replace( tmp_path, final_path )
+    if old_path is not None:
+        shutil.rmtree( old_path, ignore_errors=True )
+
+    return report
+
+
+class PrecomputedStore:
+    """ Esta classe tem a responsabilidade de responder as consultas a partir do pré-cálculo
+
+        Os arquivos ficam abertos via memory map: cada consulta lê só as posições do estado pedido.
+    """
+
+    def __init__( self, path, manifest ):
+        self.path = path
+        self.manifest = manifest
+        self.source = manifest["source"][0]
+        self.options = manifest["options"]
+        self.dates = pd.DatetimeIndex( manifest["dates"] ).to_numpy()
+        self.weeks = np.asarray( manifest["weeks"], dtype=np.int64 )
+        self.week_of_day = np.asarray( manifest["week_of_day"], dtype=np.int64 )
+        self.couriers = np.asarray( manifest["couriers"], dtype=object )
+        self.cities = manifest["cities"]
+        self.traffics = manifest["traffics"]
+        self.top_k = manifest["top_k"]
+        self.arrays = { name: np.load( os.path.join( path, name + ".npy" ), mmap_mode="r" )
+                        for name in manifest["arrays"] }
+
+    @classmethod
+    def open( cls, path, fingerprint=None ):
+        """ Esta função tem a responsabilidade de abrir o pré-cálculo
+
+            Input: Caminho da pasta e fingerprint do CSV ( None = não confere se está atualizado )
+            Output: PrecomputedStore, ou None se não existe, tem outra versão ou veio de outro CSV
+        """
+        try:
+            with open( os.path.join( path, MANIFEST ) ) as f:
+                manifest = json.load( f )
+        except ( OSError, ValueError ):
+            return None
+
+        if manifest.get( "version" ) != PRECOMPUTE_VERSION or manifest.get( "options" ) != SIDEBAR_OPTIONS:
+            return None
+        if fingerprint is not None and tuple( manifest.get( "source", () ) ) != tuple( fingerprint ):
+            return None
+
+        return cls( path, manifest )
+
+    def state( self, date_max, traffic_options, weather_conditions, cities ):
+        """ Esta função tem a responsabilidade de achar a posição de um estado da barra lateral
+
+            Input: Mesmos parâmetros do filter_frame ( sem o data frame )
+            Output: ( linha da combinação, ou None se algum multiselect está vazio, e data limite )
+        """
+        masks = []
+        for selected, options in zip( ( traffic_options, weather_conditions, cities ), self.options.values() ):
+            mask = sum( 1 << i for i, option in enumerate( options ) if option in set( selected ) )
+            if mask == 0:
+                return None, 0
+            masks.append( mask )
+
+        cutoff = len( self.dates )
+        if date_max is not None:
+            cutoff = int( np.searchsorted( self.dates, np.datetime64( date_max ), side="left" ) )
+
+        return _combination_index( masks ), cutoff
+
+    def view( self, cube, date_max, traffic_options, weather_conditions, cities, orders=None ):
+        """ Esta função tem a responsabilidade de responder um estado da barra lateral
+
+            Input:
+                - cube: Cubo de pedidos já filtrado com o mesmo estado ( ver utils/cube.py )
+                - date_max, traffic_options, weather_conditions, cities: Estado da barra lateral
+                - orders: Pedidos filtrados com o mesmo estado ( data frame ou Lazy, ver utils/cache.py ),
+                          usados só pelas consultas que não ficam no pré-cálculo. None = filtra o dataset do CSV
+            Output: PrecomputedView
+        """
+        row, cutoff = self.state( date_max, traffic_options, weather_conditions, cities )
+        if orders is None:
+            orders = Lazy( lambda: filter_frame( load_data( self.source ), date_max, traffic_options,
+                                                 weather_conditions, cities ) )
+        return PrecomputedView( self, cube, row, cutoff, orders )
+
+
+class PrecomputedView( StreamingView ):
+    """ Esta classe tem a responsabilidade de responder as consultas das páginas a partir do pré-cálculo
+
+        Responde as mesmas consultas do StreamingView que ficam no pré-cálculo ( pedidos e entregadores
+        por semana, medianas do mapa e métricas dos entregadores ) e os PRECOMPUTE_TOP_K entregadores
+        mais rápidos e mais lentos ( ver top_couriers ). As outras ( mapa de calor, menor tempo e
+        avaliações por entregador ) são calculadas a partir dos pedidos filtrados, montados só na
+        primeira consulta que precisar deles.
+    """
+
+    def __init__( self, store, cube, row, cutoff, orders ):
+        self.store = store
+        self.cube = cube
+        self.row = row
+        self.cutoff = cutoff
+        self.orders = orders
+        self.top_k = store.top_k
+
+    def _get( self, name ):
+        return np.asarray( self.store.arrays[name][self.row] )
+
+    def __len__( self ):
+        if self.row is None:
+            return 0
+        return int( self._get( "orders_day" )[:self.cutoff].sum() )
+
+    def _by_week( self, name, column ):
+        counts = np.zeros( len( self.store.weeks ), dtype=np.int64 )
+        if self.row is not None:
+            np.add.at( counts, self.store.week_of_day[:self.cutoff], self._get( name )[:self.cutoff] )
+        present = counts > 0
+        return pd.DataFrame( { "week_of_year": self.store.weeks[present], column: counts[present] } )
+
+    def orders_by_week( self ):
+        """ Pedidos por semana ( colunas week_of_year e ID ) """
+        return self._by_week( "orders_day", "ID" )
+
+    def couriers_by_week( self ):
+        """ Entregadores únicos por semana ( colunas week_of_year e Delivery_person_ID ) """
+        return self._by_week( "new_couriers_day", "Delivery_person_ID" )
+
+    def map_medians( self ):
+        """ Mediana das coordenadas de entrega por cidade e tipo de tráfego """
+        groups = list( itertools.product( self.store.cities, self.store.traffics ) )
+        medians = np.full( ( len( groups ), 2 ), np.nan )
+        if self.row is not None:
+            medians = self._get( "medians" )[self.cutoff]
+        present = ~np.isnan( medians[:, 0] )
+        return pd.DataFrame( {
+            "City": [ city for ( city, _ ), keep in zip( groups, present ) if keep ],
+            "Road_traffic_density": [ traffic for ( _, traffic ), keep in zip( groups, present ) if keep ],
+            "Delivery_location_latitude": medians[present, 0],
+            "Delivery_location_longitude": medians[present, 1],
+        } )
+
+    def overall_metrics( self ):
+        """ Maior e menor idade e melhor e pior condição de veículo """
+        values = np.full( len( OVERALL ), np.nan )
+        if self.row is not None:
+            values = self._get( "overall" )[self.cutoff]
+        return { name: int( value ) if np.isfinite( value ) else np.nan for name, value in zip( OVERALL, values ) }
+
+    def top_couriers( self ):
+        """ Os PRECOMPUTE_TOP_K mais rápidos e mais lentos de cada cidade ( mesmo formato do top_couriers ) """
+        frames = []
+        for side in range( 2 ):
+            ids, times, cities = [], [], []
+            if self.row is not None:
+                top_ids = self._get( "top_ids" )[self.cutoff]
+                top_times = self._get( "top_times" )[self.cutoff]
+                #Cidades na ordem da barra lateral ( ver utils.filters.option_order ), igual ao top_couriers
+                for city in option_order( "City", self.store.cities ):
+                    c = self.store.cities.index( city )
+                    present = top_ids[c, side] >= 0
+                    ids.extend( self.store.couriers[top_ids[c, side][present]] )
+                    times.extend( top_times[c, side][present] )
+                    cities.extend( [ city ] * int( present.sum() ) )
+            frames.append( pd.DataFrame( { "Delivery_person_ID": pd.Series( ids, dtype=object ),
+                                           "City": pd.Series( cities, dtype=object ),
+                                           "Time_taken(min)": np.asarray( times, dtype=np.int16 ) } ) )
+        return frames[0], frames[1]
+
+    def location_counts( self ):
+        """ Entregas por célula da grade do mapa de calor ( colunas lat_cell, lon_cell e count ) """
+        cells = _location_counts( resolve( self.orders ) )
+        return cells.groupby( [ "lat_cell", "lon_cell" ] )["count"].sum().reset_index()
+
+    def min_time_by_courier( self ):
+        """ Menor tempo de entrega por entregador e cidade ( colunas Delivery_person_ID, City, Time_taken(min) ) """
+        return ( resolve( self.orders ).groupby( [ "Delivery_person_ID", "City" ], observed=True )["Time_taken(min)"]
+                     .min()
+                     .sort_index() )
+
+    def ratings_by_courier( self ):
+        """ Avaliação média por entregador ( colunas Delivery_person_ID e Delivery_person_Ratings ) """
+        from utils.visao_entregadores import ratings_by_courier
+        return ratings_by_courier( resolve( self.orders ) )
+
+    def courier_stats( self ):
+        """ Estatísticas por entregador dos pedidos filtrados ( CourierStats, ver utils/couriers.py ) """
+        return CourierStats.from_frame( resolve( self.orders ) )
+
+
+def precomputed_enabled():
+    """ Esta função tem a responsabilidade de dizer se as páginas devem usar o pré-cálculo
+
+        Output: True se a variável de ambiente CURRY_PRECOMPUTED for 1
+    """
+    return os.environ.get( PRECOMPUTED_ENV, "0" ) == "1"
+
+
+#Pré-cálculo aberto por arquivo, igual ao cache do load_data
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+@profiled()
+def load_precomputed( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de abrir o pré-cálculo uma única vez por processo
+
+        Input: Caminho do CSV
+        Output: PrecomputedStore, ou None se o pré-cálculo não existe ou não é do CSV atual
+                ( rode python -m utils.precompute para refazer )
+    """
+    fingerprint = data_version( path )
+    with _cache_lock:
+        if fingerprint in _cache:
+            return _cache[fingerprint]
+
+        #Sem pré-cálculo atualizado, nada fica em cache: a próxima chamada confere a pasta de novo
+        #( o pré-cálculo pode ser gravado depois, com o mesmo CSV )
+        store = PrecomputedStore.open( precompute_path( path ), fingerprint )
+        if store is not None:
+            retire_versions( _cache, fingerprint )
+            _cache[fingerprint] = store
+        return store
+
+
+def check_parity( store, df1, n_states=100, seed=0 ):
+    """ Esta função tem a responsabilidade de comparar o pré-cálculo com o cálculo a partir dos pedidos
+
+        Sorteia estados da barra lateral e compara, em cada um, as consultas do PrecomputedView com as
+        mesmas funções das páginas aplicadas nos pedidos filtrados.
+
+        Input: PrecomputedStore, dataframe do load_data, quantidade de estados e semente
+        Output: Lista de ( estado, consulta ) que não bateram ( vazia se tudo bateu )
+    """
+    from utils.visao_empresa import _weekly, country_maps_data
+    from utils.visao_entregadores import _top_couriers, overall_metrics
+
+    rng = np.random.default_rng( seed )
+    mismatches = []
+    for _ in range( n_states ):
+        selections = [ [ option for option in options if rng.random() < 0.6 ] or [ rng.choice( options ) ]
+                       for options in SIDEBAR_OPTIONS.values() ]
+        cutoff = int( rng.integers( 0, len( store.dates ) + 1 ) )
+        date_max = None if cutoff == len( store.dates ) else pd.Timestamp( store.dates[cutoff] ).to_pydatetime()
+
+        orders = filter_frame( df1, date_max, *selections )
+        view = store.view( None, date_max, *selections )
+
+        checks = {
+            "orders_by_week": ( _weekly( orders, "ID", "count" ), view.orders_by_week() ),
+            "couriers_by_week": ( _weekly( orders, "Delivery_person_ID", "nunique" ), view.couriers_by_week() ),
+            "map_medians": ( country_maps_data( orders ), view.map_medians() ),
+            "top_couriers": ( pd.concat( _top_couriers( orders, store.top_k ) ), pd.concat( view.top_couriers() ) ),
+        }
+        for name, ( expected, found ) in checks.items():
+            expected = expected.astype( object ).reset_index( drop=True )
+            found = found.astype( object ).reset_index( drop=True )
+            if not expected.equals( found ):
+                mismatches.append( ( ( date_max, *selections ), name ) )
+
+        expected = { name: float( value ) for name, value in overall_metrics( orders ).items() }
+        found = { name: float( value ) for name, value in view.overall_metrics().items() }
+        if not all( ( np.isnan( expected[name] ) and np.isnan( found[name] ) ) or expected[name] == found[name]
+                    for name in OVERALL ):
+            mismatches.append( ( ( date_max, *selections ), "overall_metrics" ) )
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description="Pré-calcula as consultas das páginas para todos os estados da barra lateral" )
+    parser.add_argument( "--data", default=DATA_PATH, help="CSV do dataset" )
+    parser.add_argument( "--workers", type=int, default=None, help="processos do pool ( padrão: todos os núcleos )" )
+    parser.add_argument( "--chunk-size", type=int, default=CHUNK_SIZE, help="combinações por tarefa" )
+    parser.add_argument( "--check", type=int, default=0, help="estados sorteados para comparar com o cálculo normal" )
+    args = parser.parse_args()
+
+    report = build_precomputed( args.data, args.workers, args.chunk_size )
+    print( "{combinations} combinações x {cutoffs} datas = {states} estados em {compute_s} s "
+           "com {workers} processos ( {states_per_s} estados/s, {rows_per_s} pedidos lidos/s )".format( **report ) )
+    print( "Pré-cálculo gravado em {} ( {:.1f} MB )".format( report["path"], report["bytes"] / 1024 ** 2 ) )
+
+    if args.check:
+        store = PrecomputedStore.open( report["path"] )
+        mismatches = check_parity( store, load_data( args.data, columns=PRECOMPUTE_COLUMNS + [ "ID", "Order_Week" ] ), args.check )
+        print( "{} estados comparados, {} diferenças".format( args.check, len( mismatches ) ) )
+        for state, name in mismatches[:10]:
+            print( "    {} {}".format( name, state ) )
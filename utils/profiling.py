@@ -0,0 +1,277 @@
+#Medição do tempo de cada passo de uma execução da página ( carga, limpeza, filtros, gráficos e desenho ).
+#
+#Fica desligada por padrão e é ligada com a variável de ambiente CURRY_PROFILE=1. Desligada, cada
+#passo medido custa só um if ( os decoradores chamam a função direto ).
+#
+#Ligada, cada passo guarda a duração, as linhas de entrada e saída e o tamanho do resultado. Os passos
+#aparecem no painel da barra lateral ( ver debug_panel ) e são gravados, uma linha JSON por passo,
+#no arquivo CURRY_PROFILE_LOG ( padrão profile.jsonl ) para análise posterior. Só os passos de uma
+#execução começada com start_run são guardados: chamadas fora dela ( ex: outras threads ) não são medidas.
+
+#Bibliotecas necessárias
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+#Variáveis de ambiente que ligam a medição e escolhem o arquivo de log
+PROFILE_ENV = "CURRY_PROFILE"
+PROFILE_LOG_ENV = "CURRY_PROFILE_LOG"
+PROFILE_LOG = "profile.jsonl"
+
+_enabled = os.environ.get( PROFILE_ENV, "0" ) == "1"
+
+#Cada sessão do Streamlit roda numa thread, então os passos de cada execução ficam por thread
+_local = threading.local()
+_log_lock = threading.Lock()
+
+#-------------------
+#Funções
+#-------------------
+def profiling_enabled():
+    """ Esta função tem a responsabilidade de dizer se a medição está ligada
+
+        Output: True se a variável de ambiente CURRY_PROFILE for 1 ( ou se foi ligada com set_profiling )
+    """
+    return _enabled
+
+
+def set_profiling( enabled ):
+    """ Liga ou desliga a medição para todo o processo ( ex: benchmarks ) """
+    global _enabled
+    _enabled = bool( enabled )
+
+
+def _rows( value ):
+    """ Quantidade de linhas de um resultado ( data frames, arrays, StreamingView ), ou None
+
+        Resultados em tupla ( ex: a página e o total do CourierStats.page ) contam o primeiro item.
+    """
+    if isinstance( value, tuple ) and value:
+        value = value[0]
+    if value is None or isinstance( value, ( str, bytes, dict ) ) or not hasattr( value, "__len__" ):
+        return None
+    return len( value )
+
+
+def _payload_bytes( value ):
+    """ Tamanho aproximado de um resultado em bytes ( gráficos contam o JSON enviado ao navegador ), ou None """
+    if isinstance( value, pd.DataFrame ):
+        return int( value.memory_usage( index=True ).sum() )
+    if isinstance( value, pd.Series ):
+        return int( value.memory_usage( index=True ) )
+    if isinstance( value, np.ndarray ):
+        return int( value.nbytes )
+    if isinstance( value, ( str, bytes ) ):
+        return len( value )
+    if hasattr( value, "to_plotly_json" ):
+        return len( value.to_json() )
+    return None
+
+
+class _NoStep:
+    """ Passo usado com a medição desligada: não mede nada e é falso num if """
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        return False
+
+    def __bool__( self ):
+        return False
+
+    def output( self, value ):
+        return value
+
+
+_NO_STEP = _NoStep()
+
+
+class _Step:
+    """ Esta classe tem a responsabilidade de medir um passo da execução
+
+        Usada com with: a duração vai do início ao fim do bloco. As linhas de saída e o tamanho
+        do resultado podem ser informados com output( resultado ) ou direto nos atributos.
+    """
+
+    def __init__( self, name, rows_in=None ):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.payload_bytes = None
+
+    def __enter__( self ):
+        #Fora de uma execução ( ver start_run ) não há onde guardar o passo
+        self.run = getattr( _local, "run", None )
+        if self.run is None:
+            return self
+
+        #O passo entra na lista ao começar, então os passos internos aparecem depois do passo que os chamou
+        self.record = { "step": self.name, "depth": self.run["depth"] }
+        self.run["records"].append( self.record )
+        self.run["depth"] += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__( self, exc_type, exc, tb ):
+        if self.run is None:
+            return False
+        duration = time.perf_counter() - self.start
+        self.run["depth"] -= 1
+        self.record.update( {
+            "duration_ms": round( duration * 1000, 3 ),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "payload_bytes": self.payload_bytes,
+            "error": None if exc_type is None else exc_type.__name__,
+        } )
+        return False
+
+    def __bool__( self ):
+        return True
+
+    def output( self, value ):
+        """ Guarda as linhas e o tamanho do resultado do passo e devolve o próprio resultado """
+        self.rows_out = _rows( value )
+        self.payload_bytes = _payload_bytes( value )
+        return value
+
+
+def profile_step( name, rows_in=None ):
+    """ Esta função tem a responsabilidade de medir um trecho de código
+
+        Ex:
+            with profile_step( "filter:City", len( df1 ) ) as step:
+                mask = ...
+                if step:
+                    step.rows_out = int( mask.sum() )
+
+        Input: Nome do passo e quantidade de linhas de entrada ( opcional )
+        Output: Passo a ser usado com with ( com a medição desligada, um passo que não faz nada )
+    """
+    if not _enabled:
+        return _NO_STEP
+    return _Step( name, rows_in )
+
+
+def profiled( name=None ):
+    """ Esta função tem a responsabilidade de medir cada chamada de uma função ( decorador )
+
+        As linhas de entrada vêm do primeiro argumento e as de saída do resultado ( ver _rows ).
+
+        Input: Nome do passo ( padrão: nome da função )
+        Output: Decorador
+    """
+    def decorator( fn ):
+        step_name = name or fn.__name__
+
+        @functools.wraps( fn )
+        def wrapper( *args, **kwargs ):
+            if not _enabled:
+                return fn( *args, **kwargs )
+            with _Step( step_name, _rows( args[0] ) if args else None ) as step:
+                return step.output( fn( *args, **kwargs ) )
+
+        return wrapper
+
+    return decorator
+
+
+def log_file():
+    """ Caminho do log ( variável de ambiente CURRY_PROFILE_LOG, padrão profile.jsonl ) """
+    return os.environ.get( PROFILE_LOG_ENV, PROFILE_LOG )
+
+
+def start_run( page=None ):
+    """ Esta função tem a responsabilidade de começar a medição de uma execução da página
+
+        Input: Nome da página
+        Output: Dicionário da execução ( page, run_id, started, depth e records )
+    """
+    _local.run = { "page": page, "run_id": uuid.uuid4().hex[:12], "started": time.time(),
+                   "depth": 0, "records": [] }
+    return _local.run
+
+
+def finish_run( log_path=None ):
+    """ Esta função tem a responsabilidade de encerrar a execução e gravar os passos no log
+
+        Input: Caminho do log ( padrão: CURRY_PROFILE_LOG ou profile.jsonl )
+        Output: Lista com os passos medidos, na ordem em que começaram
+    """
+    run = getattr( _local, "run", None )
+    _local.run = None
+    if run is None or not run["records"]:
+        return []
+
+    log_path = log_path or log_file()
+    lines = [ json.dumps( { "page": run["page"], "run_id": run["run_id"], "started": run["started"], **record } )
+              for record in run["records"] ]
+    try:
+        with _log_lock, open( log_path, "a", encoding="utf-8" ) as f:
+            f.write( "\n".join( lines ) + "\n" )
+    except OSError:
+        #Sem permissão de escrita o painel continua funcionando, só o log fica sem a execução
+        pass
+
+    return run["records"]
+
+
+def read_log( log_path=None ):
+    """ Esta função tem a responsabilidade de ler o log para análise
+
+        Input: Caminho do log ( padrão: CURRY_PROFILE_LOG ou profile.jsonl, o mesmo do finish_run )
+        Output: Dataframe com um passo por linha
+    """
+    return pd.read_json( log_path or log_file(), lines=True )
+
+
+def show_chart( fig, **kwargs ):
+    """ Desenha um gráfico plotly ( st.plotly_chart ), medindo o tempo e o tamanho do JSON enviado """
+    import streamlit as st
+
+    with profile_step( "st.plotly_chart" ) as step:
+        if step:
+            step.payload_bytes = _payload_bytes( fig )
+        return st.plotly_chart( fig, **kwargs )
+
+
+def show_table( data, **kwargs ):
+    """ Desenha uma tabela ( st.dataframe ), medindo o tempo, as linhas e o tamanho da tabela """
+    import streamlit as st
+
+    with profile_step( "st.dataframe", _rows( data ) ) as step:
+        if step:
+            step.output( data )
+        return st.dataframe( data, **kwargs )
+
+
+def debug_panel():
+    """ Esta função tem a responsabilidade de mostrar os passos da execução na barra lateral
+
+        Deve ser chamada no fim da página: encerra a execução ( ver finish_run ) e mostra os passos
+        medidos num painel recolhido. Com a medição desligada não mostra nada.
+    """
+    if not _enabled:
+        return
+
+    import streamlit as st
+
+    records = finish_run()
+    with st.sidebar.expander( "Tempos desta execução", expanded=False ):
+        if not records:
+            st.caption( "Nenhum passo medido." )
+            return
+
+        steps = pd.DataFrame( records )
+        steps["step"] = [ "  " * depth + step for step, depth in zip( steps["step"], steps["depth"] ) ]
+        total = steps.loc[steps["depth"] == 0, "duration_ms"].sum()
+        st.caption( "Total medido: {:.1f} ms ( log em {} )".format(
+            total, log_file() ) )
+        st.dataframe( steps.drop( columns=[ "depth" ] ), use_container_width=True )
@@ -0,0 +1,205 @@
+#Atualização dos dados em segundo plano.
+#
+#Ligada por padrão: uma thread confere o CSV a cada CURRY_REFRESH_S segundos ( padrão 5; conferir é só
+#um stat do arquivo ). Quando ele muda, a versão nova do dataset e das estruturas que as páginas já
+#usavam ( data frames, índices, cubo, agregados, sketches, banco SQL ) é construída na própria thread e só então
+#publicada, numa troca atômica ( ver utils.data.publish_version ). Cada execução da página fixa a versão
+#publicada no começo ( ver pin_data_version ): uma troca no meio da execução só vale para a próxima, e
+#nenhuma execução espera a limpeza do CSV.
+#
+#Enquanto a versão nova é construída, as duas versões ficam na memória. Com CURRY_REFRESH_S=0 a thread
+#não é criada e a versão nova é construída pela primeira execução que notar a mudança ( que espera a limpeza ).
+#
+#Os erros da construção em segundo plano vão para o log ( logger utils.refresh ) e para o version_info.
+
+#Bibliotecas necessárias
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from utils.data import (DATA_PATH, data_version, pin_version, pinned_version, publish_version,
+                        published_version, source_fingerprint, warm_version)
+from utils.precompute import load_precomputed, precomputed_enabled
+from utils.profiling import finish_run, profiling_enabled, start_run
+from utils.sketches import approx_enabled, load_sketches
+from utils.sql import load_sql, sql_enabled
+from utils.streaming import load_aggregates, streaming_enabled
+
+#Variável de ambiente com o intervalo entre as verificações, em segundos ( 0 desliga a atualização )
+REFRESH_ENV = "CURRY_REFRESH_S"
+REFRESH_DEFAULT_S = 5.0
+
+logger = logging.getLogger( __name__ )
+
+#Atualizador de cada arquivo, por caminho absoluto
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+#-------------------
+#Funções
+#-------------------
+def refresh_interval():
+    """ Esta função tem a responsabilidade de dizer de quanto em quanto tempo o CSV é conferido
+
+        Output: Intervalo em segundos ( variável de ambiente CURRY_REFRESH_S, padrão 5 ), 0 se desligado
+    """
+    return max( float( os.environ.get( REFRESH_ENV, REFRESH_DEFAULT_S ) ), 0.0 )
+
+
+def build_version( path, fingerprint ):
+    """ Esta função tem a responsabilidade de construir uma versão nova dos dados, sem publicá-la
+
+        Constrói os data frames e as estruturas derivadas que existem para a versão publicada
+        ( ver utils.data.warm_version ) e os caches do modo escolhido ( streaming, SQL, aproximado ou pré-cálculo ).
+
+        Input: Caminho do CSV e fingerprint da versão nova
+        Output: None
+    """
+    published = published_version( path )
+    warm_version( path, fingerprint, published[0] if published is not None else None )
+
+    with pinned_version( path, fingerprint ):
+        if streaming_enabled():
+            load_aggregates( path )
+        if sql_enabled():
+            load_sql( path )
+        if approx_enabled():
+            load_sketches( path )
+        if precomputed_enabled():
+            #O pré-cálculo não é refeito aqui ( python -m utils.precompute ): só é aberto se já for da versão nova
+            load_precomputed( path )
+
+
+class DataRefresher( threading.Thread ):
+    """ Esta classe tem a responsabilidade de manter os dados atualizados em segundo plano
+
+        A cada interval segundos confere o CSV ( ver check ). Um erro na construção ( ex: CSV sendo
+        gravado pela metade ) não derruba a thread: a versão publicada continua valendo e a
+        construção é tentada de novo na próxima verificação. O erro fica em last_error e vai para o
+        log ( só quando muda, para uma falha repetida não encher o log a cada verificação ).
+    """
+
+    def __init__( self, path=DATA_PATH, interval=REFRESH_DEFAULT_S ):
+        super().__init__( name="curry-refresh", daemon=True )
+        self.path = path
+        self.interval = interval
+        self.last_check = None
+        self.last_error = None
+        self._done = threading.Event()
+
+    def check( self ):
+        """ Esta função tem a responsabilidade de construir e publicar a versão nova, se o CSV mudou
+
+            Output: True se uma versão nova foi publicada
+        """
+        fingerprint = source_fingerprint( self.path )
+        self.last_check = time.time()
+        published = published_version( self.path )
+        if published is not None and published[0] == fingerprint:
+            return False
+
+        if profiling_enabled():
+            start_run( "refresh" )
+        try:
+            build_version( self.path, fingerprint )
+        finally:
+            if profiling_enabled():
+                finish_run()
+
+        #O CSV mudou de novo durante a construção: a próxima verificação constrói a versão mais nova
+        if source_fingerprint( self.path ) != fingerprint:
+            return False
+
+        publish_version( self.path, fingerprint )
+        return True
+
+    def run( self ):
+        while not self._done.wait( self.interval ):
+            try:
+                self.check()
+            except Exception as exc:
+                if self.last_error is None or repr( exc ) != repr( self.last_error ):
+                    logger.exception( "Falha ao atualizar os dados de %s ( a versão publicada continua valendo )", self.path )
+                self.last_error = exc
+                continue
+
+            if self.last_error is not None:
+                logger.info( "Atualização dos dados de %s voltou a funcionar", self.path )
+                self.last_error = None
+
+    def stop( self ):
+        """ Para a thread ( usada em testes e benchmarks ) """
+        self._done.set()
+        self.join()
+
+
+def start_refresher( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de iniciar o atualizador do arquivo uma única vez por processo
+
+        A versão atual do CSV é publicada na hora ( sem construir nada: a primeira execução carrega os
+        dados como antes ) e as próximas passam a ser construídas pela thread.
+
+        Input: Caminho do CSV
+        Output: DataRefresher, ou None se a atualização estiver desligada ( CURRY_REFRESH_S=0 )
+    """
+    interval = refresh_interval()
+    if not interval:
+        return None
+
+    key = os.path.abspath( path )
+    with _refreshers_lock:
+        refresher = _refreshers.get( key )
+        if refresher is None:
+            if published_version( path ) is None:
+                publish_version( path, source_fingerprint( path ) )
+            refresher = _refreshers[key] = DataRefresher( path, interval )
+            refresher.start()
+
+    return refresher
+
+
+def pin_data_version( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de fixar a versão dos dados da execução da página
+
+        Deve ser chamada no começo da página: todas as leituras desta execução ( load_data, load_cube,
+        load_sql, ... ) usam a versão publicada neste momento, mesmo que uma nova seja publicada no meio.
+        Na primeira chamada, inicia o atualizador em segundo plano ( ver start_refresher ).
+
+        Input: Caminho do CSV
+        Output: Fingerprint da versão fixada
+    """
+    start_refresher( path )
+
+    #Sem versão publicada ( atualização desligada ), cada leitura confere o arquivo, como antes
+    published = published_version( path )
+    pin_version( path, published[0] if published is not None else None )
+    return data_version( path )
+
+
+def version_label( fingerprint ):
+    """ Identificador curto de uma versão ( ex: 3f9a1c2e ), igual em todos os processos """
+    return hashlib.sha1( repr( tuple( fingerprint[1:] ) ).encode() ).hexdigest()[:8]
+
+
+def version_info( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de descrever a versão dos dados usada pela execução
+
+        Input: Caminho do CSV
+        Output: Dicionário com version ( ver version_label ), modified ( data de modificação do CSV ),
+                age_s ( idade dos dados, em segundos ), published_age_s ( há quanto tempo a versão foi
+                publicada, ou None sem o atualizador ) e refresh_error ( último erro do atualizador, ou None )
+    """
+    fingerprint = data_version( path )
+    published = published_version( path )
+    refresher = _refreshers.get( os.path.abspath( path ) )
+    now = time.time()
+    modified = fingerprint[2] / 1e9
+    return {
+        "version": version_label( fingerprint ),
+        "modified": modified,
+        "age_s": max( now - modified, 0.0 ),
+        "published_age_s": now - published[2] if published is not None and published[0] == fingerprint else None,
+        "refresh_error": None if refresher is None or refresher.last_error is None else repr( refresher.last_error ),
+    }
@@ -0,0 +1,535 @@
+#Modo aproximado opcional: entregadores únicos por semana e medianas do mapa a partir de sketches.
+#
+#Uso:
+#    CURRY_APPROX=1 streamlit run Home.py
+#    python -m utils.sketches --check 50 --partitions 4
+#
+#Os pedidos são agrupados uma única vez pelas dimensões dos filtros ( data, cidade, trânsito e clima ) e
+#cada célula guarda, em vez das linhas:
+#1. A quantidade de pedidos ( exata )
+#2. Um HyperLogLog dos entregadores ( 2^HLL_PRECISION registradores de 1 byte )
+#3. Um sketch KLL de cada coordenada de entrega ( no máximo ~3 * KLL_K valores com peso )
+#
+#Os três podem ser juntados entre células e entre partes do dataset ( ver SketchAggregates.merge ), então
+#a memória depende da quantidade de células e não da quantidade de pedidos. Os sketches são montados
+#lendo o snapshot em blocos ( ver stream_sketches ), sem carregar o data frame, e um lote adicionado
+#( ver utils/append.py ) só é juntado aos sketches em cache ( ver append_sketches ). O SketchView responde as
+#consultas do order_share_by_week e do country_maps a partir das células filtradas.
+#
+#Erros ( ver approx_note ):
+#- Entregadores únicos: erro relativo típico de 1,04 / sqrt( 2^HLL_PRECISION ) ( 2,3% com HLL_PRECISION=11 ).
+#  Abaixo de 2,5 * 2^HLL_PRECISION entregadores a contagem usa linear counting, bem mais precisa.
+#- Medianas: erro de posição ( rank ) de até ~1,65% com 99% de confiança para KLL_K=200, isto é, o
+#  valor devolvido está entre os quantis 48,35% e 51,65% das coordenadas. Células com até KLL_K valores
+#  guardam os valores exatos, então com poucos pedidos a mediana é exata.
+#O check_sketches mede os erros observados contra o cálculo exato.
+
+#Bibliotecas necessárias
+import argparse
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import snapshot
+from utils.cache import build_once
+from utils.data import ( DATA_PATH, appended_rows, data_version, load_data, plain_columns, refresh_snapshot, retire_versions,
+                         snapshot_parts )
+from utils.dates import week_of_year
+from utils.profiling import profiled
+from utils.streaming import CHUNK_SIZE, COORDINATES, FILTER_DIMENSIONS, StreamingView, _weighted_medians
+
+#Liga o modo aproximado nas páginas ( CURRY_APPROX=1 )
+APPROX_ENV = "CURRY_APPROX"
+
+#Registradores do HyperLogLog: 2^HLL_PRECISION por célula
+HLL_PRECISION = 11
+
+#Tamanho do KLL: o maior compactador guarda KLL_K valores, e cada nível abaixo 2/3 do nível de cima
+KLL_K = 200
+KLL_MIN_CAPACITY = 8
+
+#Semente da escolha de metades do KLL: o mesmo dataset gera sempre os mesmos sketches
+KLL_SEED = 0
+
+#Colunas que os sketches precisam ler do dataset
+SKETCH_COLUMNS = FILTER_DIMENSIONS + [ "Delivery_person_ID" ] + COORDINATES
+
+#-------------------
+#Funções
+#-------------------
+def approx_enabled():
+    """ Esta função tem a responsabilidade de dizer se as páginas devem usar o modo aproximado
+
+        Output: True se a variável de ambiente CURRY_APPROX for 1
+    """
+    return os.environ.get( APPROX_ENV, "0" ) == "1"
+
+
+def hll_error( precision=HLL_PRECISION ):
+    """ Erro relativo típico ( desvio padrão ) da contagem do HyperLogLog """
+    return 1.04 / np.sqrt( 2 ** precision )
+
+
+def kll_error( k=KLL_K ):
+    """ Erro de posição ( rank ) da mediana do KLL com 99% de confiança: ~1,65% com KLL_K=200, proporcional a 1 / k """
+    return 0.0165 * KLL_K / k
+
+
+def approx_note( mode="CURRY_APPROX=1", k=KLL_K ):
+    """ Texto mostrado nas páginas abaixo dos gráficos aproximados ( modo que os ligou e tamanho do KLL ) """
+    return ( "Valores aproximados ( {} ): entregadores únicos por HyperLogLog, erro típico de {:.1%}; "
+             "medianas por KLL, erro de posição de até {:.1%}.".format( mode, hll_error(), kll_error( k ) ) )
+
+
+def _bit_length( x ):
+    """ Quantidade de bits de cada valor de um array uint64 ( 0 para 0 ), sem passar por float """
+    x = x.copy()
+    n = np.zeros( len( x ), dtype=np.int64 )
+    for shift in ( 32, 16, 8, 4, 2, 1 ):
+        big = x >= ( np.uint64( 1 ) << np.uint64( shift ) )
+        n[big] += shift
+        x[big] >>= np.uint64( shift )
+    return n + ( x > 0 )
+
+
+def _group_reduce( ids, values, n_groups, reduce ):
+    """ Junta as linhas de values com o mesmo id ( np.maximum, np.add, ... ); grupos sem linhas ficam zerados """
+    out = np.zeros( ( n_groups, ) + values.shape[1:], dtype=values.dtype )
+    if len( ids ) == 0:
+        return out
+    order = np.argsort( ids, kind="stable" )
+    ids = ids[order]
+    starts = np.flatnonzero( np.r_[ True, ids[1:] != ids[:-1] ] )
+    out[ids[starts]] = reduce.reduceat( values[order], starts, axis=0 )
+    return out
+
+
+def hll_registers( ids, values, n_groups, precision=HLL_PRECISION ):
+    """ Esta função tem a responsabilidade de montar um HyperLogLog por grupo
+
+        O hash de cada valor ( pd.util.hash_pandas_object ) é o mesmo em todos os processos, então
+        registradores montados em partes diferentes podem ser juntados com o máximo.
+
+        Input: Grupo de cada linha ( 0 ... n_groups - 1 ), valores ( Series ), quantidade de grupos e precisão
+        Output: Array uint8 com uma linha de 2^precision registradores por grupo
+    """
+    hashes = pd.util.hash_pandas_object( values, index=False ).to_numpy()
+    m = 2 ** precision
+    bucket = ( hashes >> np.uint64( 64 - precision ) ).astype( np.int64 )
+
+    #Posição do primeiro bit 1 nos bits que sobram ( 1 = primeiro bit )
+    rest = hashes << np.uint64( precision )
+    rank = np.minimum( 64 - _bit_length( rest ) + 1, 64 - precision + 1 ).astype( np.uint8 )
+
+    #Maior posição por ( grupo, registrador )
+    flat = pd.Series( rank ).groupby( ids.astype( np.int64 ) * m + bucket ).max()
+    registers = np.zeros( n_groups * m, dtype=np.uint8 )
+    registers[flat.index.to_numpy()] = flat.to_numpy()
+    return registers.reshape( n_groups, m )
+
+
+def hll_estimate( registers ):
+    """ Esta função tem a responsabilidade de estimar a quantidade de valores distintos de cada HyperLogLog
+
+        Input: Array com uma linha de registradores por HyperLogLog
+        Output: Array com a estimativa de cada linha
+    """
+    m = registers.shape[1]
+    alpha = 0.7213 / ( 1 + 1.079 / m )
+    estimate = alpha * m * m / np.exp2( -registers.astype( np.float64 ) ).sum( axis=1 )
+
+    #Poucos valores: linear counting pelos registradores vazios
+    zeros = ( registers == 0 ).sum( axis=1 )
+    small = ( estimate <= 2.5 * m ) & ( zeros > 0 )
+    estimate[small] = m * np.log( m / zeros[small] )
+    return estimate
+
+
+def kll_compress( ids, weights, values, k=KLL_K, seed=KLL_SEED ):
+    """ Esta função tem a responsabilidade de compactar um sketch KLL por grupo
+
+        Cada valor tem um peso 2^nível. Enquanto um nível de um grupo passa da capacidade
+        ( k * (2/3)^( altura - 1 - nível ), no mínimo KLL_MIN_CAPACITY ), os valores dele são ordenados e
+        metade ( os de posição par ou ímpar, sorteado ) sobe para o nível de cima com o dobro do peso.
+        Todos os grupos são compactados juntos, nível a nível.
+
+        Input: Grupo de cada valor ( 0 ... n - 1 ), peso de cada valor ( 1 para valores novos ), valores,
+               tamanho do maior compactador e semente
+        Output: ( grupos, pesos, valores ) depois da compactação
+    """
+    ids = np.asarray( ids, dtype=np.int64 )
+    levels = _bit_length( np.asarray( weights, dtype=np.uint64 ) ) - 1
+    values = np.asarray( values, dtype=np.float64 )
+    if len( ids ) == 0:
+        return ids, np.asarray( weights, dtype=np.int64 ), values
+
+    rng = np.random.default_rng( seed )
+    n_groups = int( ids.max() ) + 1
+    level = 0
+    while level <= levels.max():
+        height = pd.Series( levels ).groupby( ids ).max().reindex( range( n_groups ), fill_value=0 ).to_numpy() + 1
+        capacity = np.maximum( KLL_MIN_CAPACITY, np.floor( k * ( 2 / 3 ) ** ( height - 1 - level ) ) )
+
+        at = np.flatnonzero( levels == level )
+        counts = np.bincount( ids[at], minlength=n_groups )
+        full = counts > capacity
+        if full.any():
+            idx = at[full[ids[at]]]
+            idx = idx[np.lexsort( ( values[idx], ids[idx] ) )]
+            group = ids[idx]
+            position = np.arange( len( idx ) ) - np.searchsorted( group, group, side="left" )
+
+            #Com uma quantidade ímpar, o maior valor fica no nível
+            n = counts[group]
+            paired = position < n - n % 2
+            promote = paired & ( position % 2 == rng.integers( 0, 2, size=n_groups )[group] )
+
+            levels[idx[promote]] = level + 1
+            keep = np.ones( len( ids ), dtype=bool )
+            keep[idx[paired & ~promote]] = False
+            ids, levels, values = ids[keep], levels[keep], values[keep]
+        level += 1
+
+    return ids, np.left_shift( 1, levels ).astype( np.int64 ), values
+
+
+def _cell_ids( frame ):
+    """ Número da célula ( combinação das dimensões dos filtros ) de cada linha e as células """
+    grouped = frame.groupby( FILTER_DIMENSIONS, sort=False, observed=True, dropna=False )
+    return grouped.ngroup().to_numpy(), grouped
+
+
+def _coordinate_sketch( ids, weights, values, k=KLL_K ):
+    """ Compacta os valores de uma coordenada por célula e devolve o data frame do sketch ( cell, value, count ) """
+    ids, weights, values = kll_compress( ids, weights, values, k=k )
+    return pd.DataFrame( { "cell": ids, "value": values, "count": weights } )
+
+
+class SketchAggregates:
+    """ Esta classe tem a responsabilidade de guardar os sketches do dataset por célula
+
+        Cada célula é uma combinação das dimensões dos filtros ( FILTER_DIMENSIONS ) e guarda a quantidade
+        de pedidos, o HyperLogLog dos entregadores ( linha de registers ) e, por coordenada, o sketch KLL
+        ( linhas de coordinates[col] com a célula, o valor e o peso de cada valor ). O tamanho do KLL ( k )
+        é o mesmo em todas as partes juntadas ( KLL_K no modo aproximado, ver também utils/streaming.py ).
+    """
+
+    def __init__( self, cells, registers, coordinates, k=KLL_K ):
+        self.cells = cells
+        self.registers = registers
+        self.coordinates = coordinates
+        self.k = k
+
+    @classmethod
+    def from_frame( cls, df1, k=KLL_K ):
+        """ Esta função tem a responsabilidade de montar os sketches de um data frame já limpo
+
+            Input: Dataframe limpo ( com as colunas SKETCH_COLUMNS ) e tamanho do KLL
+            Output: SketchAggregates
+        """
+        ids, grouped = _cell_ids( df1 )
+        cells = plain_columns( grouped.size().rename( "orders" ).reset_index() )
+        coordinates = {}
+        for col in COORDINATES:
+            values = df1[col].to_numpy( dtype=np.float64 )
+            present = ~np.isnan( values )
+            coordinates[col] = _coordinate_sketch( ids[present], np.ones( int( present.sum() ) ), values[present], k )
+
+        return cls( cells=cells,
+                    registers=hll_registers( ids, df1["Delivery_person_ID"], len( cells ) ),
+                    coordinates=coordinates,
+                    k=k )
+
+    @classmethod
+    def merge( cls, parts ):
+        """ Esta função tem a responsabilidade de juntar os sketches de partes diferentes do dataset
+
+            Células iguais viram uma só: as quantidades são somadas, os registradores do HyperLogLog
+            ficam com o maior valor e os valores do KLL são juntados e compactados de novo.
+
+            Input: Lista de SketchAggregates
+            Output: SketchAggregates
+        """
+        all_cells = pd.concat( [ part.cells for part in parts ], ignore_index=True )
+        ids, grouped = _cell_ids( all_cells )
+        cells = plain_columns( grouped["orders"].sum().reset_index() )
+        registers = _group_reduce( ids, np.concatenate( [ part.registers for part in parts ] ), len( cells ), np.maximum )
+
+        #Cada valor de um sketch vai para a célula nova da célula de origem
+        offsets = np.cumsum( [ 0 ] + [ len( part.cells ) for part in parts ] )
+        coordinates = {}
+        for col in COORDINATES:
+            frame = pd.concat( [ part.coordinates[col].assign( cell=part.coordinates[col]["cell"] + offset )
+                                 for part, offset in zip( parts, offsets ) ], ignore_index=True )
+            coordinates[col] = _coordinate_sketch( ids[frame["cell"].to_numpy()],
+                                                   frame["count"].to_numpy(), frame["value"].to_numpy(), parts[0].k )
+
+        return cls( cells=cells, registers=registers, coordinates=coordinates, k=parts[0].k )
+
+    @property
+    def nbytes( self ):
+        """ Memória dos sketches, em bytes """
+        return int( self.registers.nbytes + self.cells.memory_usage( index=True ).sum()
+                    + sum( frame.memory_usage( index=True ).sum() for frame in self.coordinates.values() ) )
+
+    def slice( self, date_max=None, **selections ):
+        """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral
+
+            Input: Mesmos parâmetros do OrderCube.slice
+            Output: SketchView com as células filtradas
+        """
+        def mask( frame ):
+            keep = np.ones( len( frame ), dtype=bool )
+            if date_max is not None:
+                keep &= ( frame["Order_Date"] < date_max ).to_numpy()
+            for dim, values in selections.items():
+                keep &= frame[dim].isin( list( values ) ).to_numpy()
+            return keep
+
+        selected = mask( self.cells )
+        coordinates = {}
+        for col, frame in self.coordinates.items():
+            #Mesmo formato das contagens do StreamingView: cidade, trânsito, valor e peso
+            frame = frame.loc[selected[frame["cell"].to_numpy()], :]
+            coordinates[col] = pd.DataFrame( {
+                "City": self.cells["City"].to_numpy()[frame["cell"].to_numpy()],
+                "Road_traffic_density": self.cells["Road_traffic_density"].to_numpy()[frame["cell"].to_numpy()],
+                col: frame["value"].to_numpy(),
+                "count": frame["count"].to_numpy(),
+            } )
+
+        return SketchView( cells=self.cells.loc[selected, :], registers=self.registers[selected], coordinates=coordinates )
+
+
+class SketchView( StreamingView ):
+    """ Esta classe tem a responsabilidade de responder as consultas das páginas a partir dos sketches
+
+        Responde as consultas do order_share_by_week e do country_maps: pedidos por semana ( exato ),
+        entregadores únicos por semana ( HyperLogLog ) e medianas do mapa ( mediana ponderada dos valores
+        do KLL ). No modo aproximado as demais consultas continuam vindo dos pedidos; no modo streaming
+        ( ver utils/streaming.py ) o StreamingView usa este para as três consultas.
+    """
+
+    def __init__( self, cells, registers, coordinates ):
+        self.cells = cells
+        self.registers = registers
+        self.coordinates = coordinates
+
+    def __len__( self ):
+        return int( self.cells["orders"].sum() )
+
+    def _week_ids( self ):
+        weeks = week_of_year( self.cells["Order_Date"] )
+        present = weeks >= 0
+        uniques, ids = np.unique( weeks[present], return_inverse=True )
+        return uniques, ids, present
+
+    def orders_by_week( self ):
+        """ Pedidos por semana ( colunas week_of_year e ID ) """
+        uniques, ids, present = self._week_ids()
+        orders = np.bincount( ids, weights=self.cells["orders"].to_numpy()[present], minlength=len( uniques ) )
+        return pd.DataFrame( { "week_of_year": uniques.astype( np.int64 ), "ID": orders.astype( np.int64 ) } )
+
+    def couriers_by_week( self ):
+        """ Entregadores únicos por semana, estimados ( colunas week_of_year e Delivery_person_ID ) """
+        uniques, ids, present = self._week_ids()
+        registers = _group_reduce( ids, self.registers[present], len( uniques ), np.maximum )
+        return pd.DataFrame( { "week_of_year": uniques.astype( np.int64 ),
+                               "Delivery_person_ID": np.rint( hll_estimate( registers ) ).astype( np.int64 ) } )
+
+    def map_medians( self ):
+        """ Mediana das coordenadas de entrega por cidade e tipo de tráfego, estimada """
+        keys = [ "City", "Road_traffic_density" ]
+        medians = [ _weighted_medians( frame, keys, col ) for col, frame in self.coordinates.items() ]
+        return pd.concat( medians, axis=1 ).sort_index().reset_index()
+
+
+def stream_sketches( path=DATA_PATH, chunk_size=CHUNK_SIZE ):
+    """ Esta função tem a responsabilidade de montar os sketches lendo o snapshot em blocos
+
+        Cada bloco ( só as colunas SKETCH_COLUMNS ) vira sketches, que são juntados aos dos blocos anteriores,
+        e é descartado. O data frame inteiro nunca fica na memória, e os sketches parciais são no máximo dois
+        ( os registradores do HyperLogLog de cada célula ocupam 2^HLL_PRECISION bytes por parte ).
+
+        Input: Caminho do CSV ( o snapshot é refeito antes, se o CSV mudou ) e linhas por bloco
+        Output: ( SketchAggregates, fingerprint do CSV de que o snapshot veio )
+    """
+    sketches = None
+    for chunk, source in snapshot.iter_snapshot( refresh_snapshot( path ), SKETCH_COLUMNS, chunk_size ):
+        part = SketchAggregates.from_frame( chunk )
+        sketches = part if sketches is None else SketchAggregates.merge( [ sketches, part ] )
+
+    return sketches, source
+
+
+#Sketches por versão do arquivo, igual ao cache do load_aggregates ( com as partes do snapshot de cada versão )
+_cache = {}
+_cache_lock = threading.Lock()
+_parts = {}
+
+
+def _store( fingerprint, sketches, parts ):
+    """ Guarda os sketches de uma versão e descarta as antigas ( deve ser chamada com o lock do cache ) """
+    _cache[tuple( fingerprint )] = sketches
+    _parts[tuple( fingerprint )] = parts
+    retire_versions( _cache, fingerprint )
+    retire_versions( _parts, fingerprint )
+
+
+@profiled()
+def load_sketches( path=DATA_PATH, chunk_size=CHUNK_SIZE ):
+    """ Esta função tem a responsabilidade de devolver os sketches do dataset
+
+        Quando a versão nova só adicionou partes ao snapshot ( ver utils.data.appended_rows ), só as partes
+        novas viram sketches, juntados aos da versão anterior.
+
+        Input: Caminho do arquivo e linhas por bloco ( ver stream_sketches )
+        Output: SketchAggregates ( construídos uma única vez por versão do dataset )
+    """
+    fingerprint = data_version( path )
+    source = {}
+
+    def build():
+        with _cache_lock:
+            versions = { fp: _parts.get( fp ) for fp in _cache }
+        change = appended_rows( path, versions, fingerprint, SKETCH_COLUMNS ) if any( versions.values() ) else None
+        with _cache_lock:
+            sketches = _cache.get( change[0] ) if change is not None else None
+
+        if sketches is None:
+            sketches, source["fingerprint"] = stream_sketches( path, chunk_size )
+            source["parts"] = snapshot_parts( path, fingerprint )
+            return sketches
+
+        source["fingerprint"], source["parts"] = fingerprint, change[2]
+        return SketchAggregates.merge( [ sketches, SketchAggregates.from_frame( change[1] ) ] )
+
+    def store( key, sketches ):
+        #Sketches de um CSV mais novo que a versão fixada pela execução não ficam em cache ( igual ao load_data )
+        if tuple( source["fingerprint"] ) != tuple( fingerprint ):
+            return
+        _store( key, sketches, source["parts"] )
+
+    return build_once( _cache, _cache_lock, fingerprint, build, store=store )
+
+
+def append_sketches( batch, old_fingerprint, new_fingerprint ):
+    """ Esta função tem a responsabilidade de adicionar um lote já limpo aos sketches em cache
+
+        Só o lote vira sketches, que são juntados aos da versão antiga ( ver SketchAggregates.merge ).
+        A versão antiga continua no cache para as execuções que ainda a usam ( ver retire_versions ).
+
+        Input: Dataframe do lote ( já limpo ), fingerprint do CSV antes e depois do lote
+        Output: None
+    """
+    parts = snapshot_parts( new_fingerprint[0], new_fingerprint )
+    with _cache_lock:
+        sketches = _cache.get( tuple( old_fingerprint ) )
+        if sketches is not None:
+            _store( new_fingerprint, SketchAggregates.merge(
+                [ sketches, SketchAggregates.from_frame( batch.loc[:, SKETCH_COLUMNS] ) ] ), parts )
+
+
+@profiled()
+def slice_sketches( sketches, date_max, traffic_options, weather_conditions, cities ):
+    """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral nos sketches
+
+        Input:
+            - sketches: SketchAggregates
+            - date_max: Data limite ( exclusiva )
+            - traffic_options, weather_conditions, cities: Listas selecionadas nos multiselects
+        Output: SketchView
+    """
+    return sketches.slice( date_max,
+                           Road_traffic_density=traffic_options,
+                           Weatherconditions=weather_conditions,
+                           City=cities )
+
+
+def _rank_error( values, estimate, q=0.5 ):
+    """ Distância entre q e a posição ( fração dos valores ) do valor estimado """
+    values = np.sort( values )
+    below = np.searchsorted( values, estimate, side="left" ) / len( values )
+    upto = np.searchsorted( values, estimate, side="right" ) / len( values )
+    return 0.0 if below <= q <= upto else min( abs( below - q ), abs( upto - q ) )
+
+
+def check_sketches( sketches, path=DATA_PATH, n_states=50, seed=0 ):
+    """ Esta função tem a responsabilidade de medir os erros do modo aproximado
+
+        Sorteia estados da barra lateral e compara, em cada um, os entregadores únicos por semana
+        ( erro relativo ) e as medianas do mapa ( erro de posição ) com o cálculo exato a partir dos
+        pedidos filtrados. O primeiro estado não tem pedidos ( data limite na primeira data ), para
+        conferir que os sketches devolvem tabelas vazias como os pedidos.
+
+        Input: SketchAggregates, caminho do CSV, quantidade de estados e semente
+        Output: Dicionário com o erro relativo dos entregadores ( quadrático médio e maior ), o maior erro
+                de posição das medianas e empty_ok ( True se o estado vazio devolveu tabelas vazias )
+    """
+    from utils.filters import SIDEBAR_OPTIONS, filter_frame
+    from utils.visao_empresa import _weekly
+
+    df = load_data( path, columns=SKETCH_COLUMNS + [ "Order_Week" ] )
+    rng = np.random.default_rng( seed )
+    dates = np.sort( df["Order_Date"].dropna().unique() )
+    relative_errors, rank_error, empty_ok = [], 0.0, True
+    for i in range( n_states ):
+        selections = [ [ option for option in options if rng.random() < 0.6 ] or [ rng.choice( options ) ]
+                       for options in SIDEBAR_OPTIONS.values() ]
+        if i == 0:
+            date_max = pd.Timestamp( dates[0] ).to_pydatetime()
+        else:
+            date_max = None if rng.random() < 0.2 else pd.Timestamp( rng.choice( dates ) ).to_pydatetime()
+        state = ( date_max, *selections )
+
+        orders = filter_frame( df, *state )
+        view = slice_sketches( sketches, *state )
+        if len( orders ) == 0:
+            empty_ok &= ( len( view ) == 0 and view.couriers_by_week().empty and view.map_medians().empty )
+            continue
+
+        exact = _weekly( orders, "Delivery_person_ID", "nunique" ).set_index( "week_of_year" )["Delivery_person_ID"]
+        found = view.couriers_by_week().set_index( "week_of_year" )["Delivery_person_ID"].reindex( exact.index )
+        relative_errors.extend( ( ( found - exact ) / exact ).to_numpy() )
+
+        medians = view.map_medians().set_index( [ "City", "Road_traffic_density" ] )
+        for ( city, traffic ), group in orders.groupby( [ "City", "Road_traffic_density" ], observed=True ):
+            for col in COORDINATES:
+                values = group[col].dropna().to_numpy()
+                if len( values ):
+                    rank_error = max( rank_error, _rank_error( values, medians.loc[( city, traffic ), col] ) )
+
+    relative_errors = np.asarray( relative_errors, dtype=np.float64 )
+    return { "couriers_rms_error": float( np.sqrt( np.mean( relative_errors ** 2 ) ) ) if len( relative_errors ) else 0.0,
+             "couriers_max_error": float( np.abs( relative_errors ).max() ) if len( relative_errors ) else 0.0,
+             "median_rank_error": rank_error,
+             "empty_ok": bool( empty_ok ) }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description="Mede os erros do modo aproximado" )
+    parser.add_argument( "--data", default=DATA_PATH, help="CSV do dataset" )
+    parser.add_argument( "--check", type=int, default=50, help="estados sorteados da barra lateral" )
+    parser.add_argument( "--partitions", type=int, default=1,
+                         help="monta os sketches em partes e junta ( ver SketchAggregates.merge )" )
+    parser.add_argument( "--seed", type=int, default=0, help="semente do sorteio" )
+    args = parser.parse_args()
+
+    if args.partitions > 1:
+        df = load_data( args.data, columns=SKETCH_COLUMNS )
+        bounds = np.linspace( 0, len( df ), args.partitions + 1 ).astype( int )
+        sketches = SketchAggregates.merge( [ SketchAggregates.from_frame( df.iloc[start:end] )
+                                             for start, end in zip( bounds[:-1], bounds[1:] ) ] )
+    else:
+        sketches = load_sketches( args.data )
+
+    errors = check_sketches( sketches, args.data, args.check, args.seed )
+    print( "{} células, {:.1f} MB de sketches".format( len( sketches.cells ), sketches.nbytes / 2**20 ) )
+    print( "{} estados comparados".format( args.check ) )
+    print( "    entregadores por semana: erro relativo quadrático médio {:.2%} ( típico {:.2%} ), maior {:.2%}".format(
+        errors["couriers_rms_error"], hll_error(), errors["couriers_max_error"] ) )
+    print( "    medianas do mapa: maior erro de posição {:.2%} ( limite ~{:.2%} )".format(
+        errors["median_rank_error"], kll_error( sketches.k ) ) )
+    print( "    estado sem pedidos: {}".format( "tabelas vazias" if errors["empty_ok"] else "ERRO, tabelas não vazias" ) )
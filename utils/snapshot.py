@@ -0,0 +1,254 @@
+#Bibliotecas necessárias
+import json
+import os
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+#Versão do formato do snapshot. Deve ser incrementada sempre que o clean_code mudar
+#o conteúdo ou os tipos das colunas, assim os snapshots antigos são refeitos.
+SCHEMA_VERSION = 5
+
+#Pasta onde os snapshots ficam guardados
+SNAPSHOT_DIR = ".snapshot"
+
+#Arquivo que lista as partes do snapshot, a versão do schema e o CSV de origem
+MANIFEST = "manifest.json"
+
+#Com mais partes do que isso, o snapshot é regravado numa parte só ( sem limpar o CSV de novo )
+MAX_PARTS = 32
+
+#Partes que saem do manifest só são apagadas depois desse tempo ( segundos ), para um leitor que leu o
+#manifest anterior ainda conseguir abrir as partes dele
+PART_GRACE_S = 60.0
+
+#-------------------
+#Funções
+#-------------------
+def snapshot_path( source_path, snapshot_dir=SNAPSHOT_DIR ):
+    """ Esta função tem a responsabilidade de definir onde fica o snapshot de um CSV
+
+        O snapshot é uma pasta com uma ou mais partes em Arrow IPC ( a primeira com o CSV inteiro
+        e as demais com os lotes adicionados depois, ver append_snapshot ) e um manifest.json.
+
+        Input: Caminho do CSV
+        Output: Caminho da pasta do snapshot
+    """
+    name = os.path.splitext( os.path.basename( source_path ) )[0]
+    return os.path.join( os.path.dirname( os.path.abspath( source_path ) ), snapshot_dir, name )
+
+
+def read_metadata( path ):
+    """ Esta função tem a responsabilidade de ler o manifest do snapshot sem ler os dados
+
+        Input: Caminho da pasta do snapshot
+        Output: Dicionário com schema_version, source, parts e clean_report,
+                ou None se o snapshot não existir ou estiver corrompido
+    """
+    try:
+        with open( os.path.join( path, MANIFEST ) ) as f:
+            metadata = json.load( f )
+    except ( OSError, ValueError ):
+        return None
+
+    if not { "schema_version", "source", "parts" } <= set( metadata ):
+        return None
+
+    metadata["source"] = tuple( metadata["source"] )
+    return metadata
+
+
+def is_fresh( path, fingerprint ):
+    """ Esta função tem a responsabilidade de dizer se o snapshot ainda vale para o CSV atual
+
+        Input: Caminho do snapshot e fingerprint do CSV ( ver utils.data.source_fingerprint )
+        Output: True se o snapshot existe, tem a versão de schema atual e veio do mesmo CSV
+    """
+    metadata = read_metadata( path )
+    return ( metadata is not None
+             and metadata["schema_version"] == SCHEMA_VERSION
+             and metadata["source"] == tuple( fingerprint ) )
+
+
+def _write_part( df1, path ):
+    """ Grava um data frame numa parte nova ( sem compressão, para poder ser lida com memory map ) """
+    name = "part-{}.arrow".format( uuid.uuid4().hex )
+    table = pa.Table.from_pandas( df1, preserve_index=True )
+
+    #Colunas categóricas com o mesmo tipo de código em todas as partes, para poderem ser juntadas na leitura
+    table = table.cast( pa.schema( [
+        field.with_type( pa.dictionary( pa.int32(), field.type.value_type ) )
+        if pa.types.is_dictionary( field.type ) else field
+        for field in table.schema ], metadata=table.schema.metadata ) )
+
+    tmp_path = os.path.join( path, name + ".tmp" )
+    with pa.OSFile( tmp_path, "wb" ) as sink:
+        with pa.ipc.new_file( sink, table.schema ) as writer:
+            writer.write_table( table )
+    os.replace( tmp_path, os.path.join( path, name ) )
+
+    return name
+
+
+def _write_manifest( path, metadata ):
+    """ Troca o manifest de forma atômica e apaga as partes que saíram dele há mais de PART_GRACE_S
+
+        As partes fora do manifest ficam listadas em retired, com a hora em que saíram, e são apagadas
+        numa das próximas trocas ( append ou compactação ). Assim um leitor entre a leitura do manifest e a
+        abertura das partes ( ver read_table ) não encontra uma parte apagada. Leitores que já abriram uma
+        parte apagada continuam lendo normalmente ( memory map ).
+    """
+    now = time.time()
+    previous = read_metadata( path ) or {}
+    retired = { name: previous.get( "retired", {} ).get( name, now ) for name in os.listdir( path )
+                if name.startswith( "part-" ) and name.endswith( ".arrow" ) and name not in metadata["parts"] }
+    expired = [ name for name, since in retired.items() if now - since >= PART_GRACE_S ]
+
+    metadata = dict( metadata, retired={ name: since for name, since in retired.items() if name not in expired } )
+    tmp_path = os.path.join( path, "{}.{}.tmp".format( MANIFEST, os.getpid() ) )
+    with open( tmp_path, "w" ) as f:
+        json.dump( metadata, f )
+    os.replace( tmp_path, os.path.join( path, MANIFEST ) )
+
+    for name in expired:
+        try:
+            os.remove( os.path.join( path, name ) )
+        except OSError:
+            pass
+
+
+def write_snapshot( df1, path, fingerprint ):
+    """ Esta função tem a responsabilidade de gravar o data frame limpo em formato colunar ( Arrow IPC )
+
+        As partes antigas são substituídas de forma atômica, então um leitor nunca vê um snapshot pela metade
+        ( elas só são apagadas depois de PART_GRACE_S, ver _write_manifest ).
+
+        Input: Dataframe limpo, caminho do snapshot e fingerprint do CSV de origem
+        Output: None
+    """
+    os.makedirs( path, exist_ok=True )
+    part = _write_part( df1, path )
+
+    _write_manifest( path, {
+        "schema_version": SCHEMA_VERSION,
+        "source": list( fingerprint ),
+        "parts": [ part ],
+        "clean_report": df1.attrs.get( "clean_report", {} ),
+    } )
+
+
+def merge_reports( old, new ):
+    """ Esta função tem a responsabilidade de somar os relatórios do clean_code de dois lotes
+
+        Input: Relatório antigo e relatório do lote ( ver utils.data.clean_report )
+        Output: Relatório somado
+    """
+    merged = dict( old )
+    for key in ( "rows_in", "rows_dropped", "rows_out", "invalid_coordinates" ):
+        merged[key] = old.get( key, 0 ) + new.get( key, 0 )
+    merged["missing_by_column"] = dict( old.get( "missing_by_column", {} ) )
+    for col, n in new.get( "missing_by_column", {} ).items():
+        merged["missing_by_column"][col] = merged["missing_by_column"].get( col, 0 ) + n
+    return merged
+
+
+def append_snapshot( batch, path, old_fingerprint, new_fingerprint ):
+    """ Esta função tem a responsabilidade de adicionar um lote já limpo ao snapshot
+
+        Só o lote é gravado ( numa parte nova ); as partes existentes não são reescritas, a não ser
+        quando passam de MAX_PARTS e são juntadas numa só.
+
+        Input:
+            - batch: Dataframe do lote, já limpo
+            - path: Caminho do snapshot
+            - old_fingerprint: Fingerprint do CSV antes do lote ( o snapshot precisa estar atualizado com ele )
+            - new_fingerprint: Fingerprint do CSV com o lote
+        Output: True se o lote foi adicionado, False se o snapshot não estava atualizado
+                ( nesse caso ele será refeito na próxima leitura )
+    """
+    if not is_fresh( path, old_fingerprint ):
+        return False
+
+    metadata = read_metadata( path )
+    part = _write_part( batch, path )
+
+    metadata["source"] = list( new_fingerprint )
+    metadata["parts"] = metadata["parts"] + [ part ]
+    metadata["clean_report"] = merge_reports( metadata.get( "clean_report", {} ), batch.attrs.get( "clean_report", {} ) )
+    _write_manifest( path, metadata )
+
+    if len( metadata["parts"] ) > MAX_PARTS:
+        write_snapshot( read_snapshot( path ), path, new_fingerprint )
+
+    return True
+
+
+def read_table( path, metadata=None ):
+    """ Esta função tem a responsabilidade de abrir o snapshot como uma tabela Arrow, via memory map
+
+        Nenhuma coluna é copiada para a memória: os dados são lidos do disco quando usados
+        ( ex: pelo backend SQL, ver utils/sql.py ).
+
+        Input: Caminho do snapshot e manifest já lido ( None = lê o manifest atual )
+        Output: pyarrow.Table com todas as partes
+    """
+    metadata = metadata or read_metadata( path )
+
+    tables = []
+    for part in metadata["parts"]:
+        with pa.memory_map( os.path.join( path, part ), "r" ) as source:
+            tables.append( pa.ipc.open_file( source ).read_all() )
+    return pa.concat_tables( tables, promote=True ) if len( tables ) > 1 else tables[0]
+
+
+def _select( table, columns ):
+    """ Seleciona as colunas pedidas mais as do índice ( None = todas ) """
+    if columns is None:
+        return table
+    index_columns = [ col for col in table.schema.pandas_metadata["index_columns"] if isinstance( col, str ) ]
+    return table.select( [ col for col in columns if col not in index_columns ] + index_columns )
+
+
+def iter_snapshot( path, columns=None, chunk_size=200_000 ):
+    """ Esta função tem a responsabilidade de ler o snapshot em blocos, via memory map
+
+        Cada bloco é convertido para pandas só quando pedido, então a memória depende do tamanho
+        do bloco e não do dataset ( ex: para montar agregados, ver utils/sketches.py ).
+
+        Input: Caminho do snapshot, lista de colunas ( None = todas ) e linhas por bloco
+        Output: Gerador de ( dataframe do bloco, fingerprint do CSV de origem ); sempre gera ao menos um
+                bloco ( vazio se o snapshot não tem linhas )
+    """
+    metadata = read_metadata( path )
+    table = _select( read_table( path, metadata ), columns )
+    for start in range( 0, max( table.num_rows, 1 ), chunk_size ):
+        yield table.slice( start, chunk_size ).to_pandas( split_blocks=True ), metadata["source"]
+
+
+def read_snapshot( path, columns=None, parts=None ):
+    """ Esta função tem a responsabilidade de ler o snapshot via memory map
+
+        Só as colunas pedidas são convertidas para pandas; as demais nem chegam a ser lidas do disco.
+
+        Input: Caminho do snapshot, lista de colunas ( None = todas ) e partes a ler ( None = as do manifest;
+               ex: só as partes adicionadas depois de uma versão já em memória, ver utils.data.appended_rows )
+        Output: Dataframe limpo ( com as partes lidas em attrs["snapshot_parts"] )
+    """
+    metadata = read_metadata( path )
+    if parts is not None:
+        metadata = dict( metadata, parts=list( parts ) )
+    table = read_table( path, metadata )
+
+    df1 = _select( table, columns ).to_pandas( split_blocks=True )
+
+    #Partes com categorias diferentes são juntadas na ordem em que aparecem; as categorias voltam para a ordem alfabética
+    for col in df1.columns:
+        if isinstance( df1[col].dtype, pd.CategoricalDtype ) and not df1[col].cat.categories.is_monotonic_increasing:
+            df1[col] = df1[col].cat.reorder_categories( df1[col].cat.categories.sort_values() )
+
+    df1.attrs["clean_report"] = metadata.get( "clean_report", {} )
+    df1.attrs["snapshot_parts"] = tuple( metadata["parts"] )
+
+    return df1
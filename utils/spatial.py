@@ -0,0 +1,268 @@
+#Bibliotecas necessárias
+import copy
+
+import numpy as np
+import pandas as pd
+
+from utils.data import derived, register_updater
+from utils.geo import EARTH_RADIUS_KM, HEATMAP_CELL_DEG, cell_centers, grid_cells, haversine_np
+
+#Tamanho da menor célula da grade, em graus ( a mesma do mapa de calor, ~1 km )
+BASE_CELL_DEG = HEATMAP_CELL_DEG
+
+#Quantidade de resoluções: no nível L a célula tem BASE_CELL_DEG * 2**L graus ( de ~1 km até ~128 km )
+LEVELS = 8
+
+#Colunas usadas pelo índice espacial
+RESTAURANT = [ "Restaurant_latitude", "Restaurant_longitude" ]
+DELIVERY = [ "Delivery_location_latitude", "Delivery_location_longitude" ]
+SPATIAL_COLUMNS = RESTAURANT + DELIVERY
+
+#Km por grau de latitude ( e de longitude, no equador )
+KM_PER_DEG = np.radians( 1.0 ) * EARTH_RADIUS_KM
+
+#-------------------
+#Funções
+#-------------------
+class GridIndex:
+    """ Esta classe tem a responsabilidade de encontrar pontos pela posição sem olhar todos eles
+
+        Os pontos são agrupados numa grade regular de latitude e longitude ( ver utils/geo.py ) e
+        ordenados pela célula. Cada célula vira um intervalo contínuo dessa ordem, então:
+        1. Contar pontos por célula, em qualquer resolução, é somar intervalos
+        2. Uma consulta por retângulo só olha as células que encostam no retângulo
+        3. O ponto mais próximo é procurado em quadrados cada vez maiores ao redor da consulta
+
+        Pontos com coordenadas inválidas ficam fora do índice.
+    """
+
+    def __init__( self, lat, lon, cell_deg=BASE_CELL_DEG ):
+        self.cell_deg = cell_deg
+        self.lat = np.asarray( lat, dtype=float )
+        self.lon = np.asarray( lon, dtype=float )
+
+        rows, cols, valid = grid_cells( self.lat, self.lon, cell_deg )
+        self.rows = rows
+        self.cols = cols
+        self.valid = valid
+
+        #Chave única por célula, crescente na ordem ( linha, coluna )
+        self._span = 2 * int( np.ceil( 180 / cell_deg ) ) + 2
+        positions = np.flatnonzero( valid )
+        keys = self._key( rows[positions], cols[positions] )
+        order = np.argsort( keys, kind="stable" )
+        self.order = positions[order]
+        self.sorted_keys = keys[order]
+
+        #Memória das contagens de todo o índice, por nível
+        self._counts = {}
+
+    def __len__( self ):
+        return len( self.order )
+
+    def append( self, lat, lon ):
+        """ Esta função tem a responsabilidade de montar o índice com pontos novos no fim
+
+            Só os pontos novos são colocados na grade e ordenados; eles são intercalados na ordem atual
+            ( depois dos pontos da mesma célula, como na ordenação estável ). O índice atual não é alterado.
+
+            Input: Latitudes e longitudes dos pontos novos ( posições continuam as atuais )
+            Output: Novo GridIndex, igual ao construído com todos os pontos
+        """
+        new = copy.copy( self )
+        lat = np.asarray( lat, dtype=float )
+        lon = np.asarray( lon, dtype=float )
+        rows, cols, valid = grid_cells( lat, lon, self.cell_deg )
+
+        positions = np.flatnonzero( valid )
+        keys = self._key( rows[positions], cols[positions] )
+        order = np.argsort( keys, kind="stable" )
+        at = np.searchsorted( self.sorted_keys, keys[order], side="right" )
+        new.order = np.insert( self.order, at, len( self.lat ) + positions[order] )
+        new.sorted_keys = np.insert( self.sorted_keys, at, keys[order] )
+
+        new.lat = np.concatenate( [ self.lat, lat ] )
+        new.lon = np.concatenate( [ self.lon, lon ] )
+        new.rows = np.concatenate( [ self.rows, rows ] )
+        new.cols = np.concatenate( [ self.cols, cols ] )
+        new.valid = np.concatenate( [ self.valid, valid ] )
+        new._counts = {}
+        return new
+
+    def _key( self, rows, cols ):
+        return np.asarray( rows, dtype=np.int64 ) * self._span + ( np.asarray( cols, dtype=np.int64 ) + self._span // 2 )
+
+    def counts( self, level=0, positions=None ):
+        """ Esta função tem a responsabilidade de contar os pontos por célula numa resolução
+
+            Input:
+                - level: Nível da grade ( a célula tem cell_deg * 2**level graus )
+                - positions: Posições dos pontos considerados ( ex: linhas filtradas ), ou None para todos
+            Output: Dataframe com lat_cell, lon_cell, as coordenadas do centro da célula e count
+        """
+        if positions is None and level in self._counts:
+            return self._counts[level].copy()
+
+        if positions is None:
+            positions = self.order
+        else:
+            positions = np.asarray( positions )
+            positions = positions[self.valid[positions]]
+
+        factor = 2 ** level
+        rows = np.floor_divide( self.rows[positions], factor )
+        cols = np.floor_divide( self.cols[positions], factor )
+        keys, counts = np.unique( self._key( rows, cols ), return_counts=True )
+
+        rows = np.floor_divide( keys, self._span )
+        cols = keys - rows * self._span - self._span // 2
+        lat, lon = cell_centers( rows, cols, self.cell_deg * factor )
+        result = pd.DataFrame( { "lat_cell": rows, "lon_cell": cols,
+                                 "latitude": lat, "longitude": lon, "count": counts } )
+
+        if positions is self.order:
+            self._counts[level] = result
+            return result.copy()
+
+        return result
+
+    def query_bbox( self, lat_min, lon_min, lat_max, lon_max ):
+        """ Esta função tem a responsabilidade de achar os pontos dentro de um retângulo
+
+            Input: Limites do retângulo em graus ( inclusivos )
+            Output: Array com as posições dos pontos, em ordem crescente
+        """
+        if len( self.order ) == 0 or lat_min > lat_max or lon_min > lon_max:
+            return np.empty( 0, dtype=np.int64 )
+
+        row_min, col_min = ( int( np.floor( v / self.cell_deg ) ) for v in ( lat_min, lon_min ) )
+        row_max, col_max = ( int( np.floor( v / self.cell_deg ) ) for v in ( lat_max, lon_max ) )
+
+        #Só as linhas da grade que têm pontos ( evita percorrer linhas vazias em retângulos grandes )
+        first_row = int( np.floor_divide( self.sorted_keys[0], self._span ) )
+        last_row = int( np.floor_divide( self.sorted_keys[-1], self._span ) )
+        rows = np.arange( max( row_min, first_row ), min( row_max, last_row ) + 1 )
+
+        starts = np.searchsorted( self.sorted_keys, self._key( rows, col_min ), side="left" )
+        ends = np.searchsorted( self.sorted_keys, self._key( rows, col_max ), side="right" )
+        if len( starts ) == 0 or not ( ends > starts ).any():
+            return np.empty( 0, dtype=np.int64 )
+
+        candidates = np.concatenate( [ self.order[s:e] for s, e in zip( starts, ends ) if e > s ] )
+        lat = self.lat[candidates]
+        lon = self.lon[candidates]
+        inside = ( lat >= lat_min ) & ( lat <= lat_max ) & ( lon >= lon_min ) & ( lon <= lon_max )
+
+        return np.sort( candidates[inside] )
+
+    def nearest( self, lat, lon ):
+        """ Esta função tem a responsabilidade de achar o ponto mais próximo de uma coordenada
+
+            O quadrado de busca dobra de tamanho até que nenhum ponto fora dele possa estar mais
+            perto do que o melhor ponto encontrado.
+
+            Input: Latitude e longitude da consulta, em graus
+            Output: ( posição do ponto, distância em km ), ou ( -1, NaN ) se o índice está vazio
+        """
+        if len( self.order ) == 0:
+            return -1, np.nan
+
+        lat_extent = np.nanmax( np.abs( self.lat[self.order] - lat ) )
+        lon_extent = np.nanmax( np.abs( self.lon[self.order] - lon ) )
+        radius = self.cell_deg
+        while True:
+            found = self.query_bbox( lat - radius, lon - radius, lat + radius, lon + radius )
+            covers_all = radius >= lat_extent and radius >= lon_extent
+
+            if len( found ):
+                distances = haversine_np( lat, lon, self.lat[found], self.lon[found] )
+                best = int( np.argmin( distances ) )
+
+                #Qualquer ponto fora do quadrado está a pelo menos radius graus de latitude ou de longitude
+                max_lat = min( abs( lat ) + radius, 89.0 )
+                outside_km = radius * KM_PER_DEG * np.cos( np.radians( max_lat ) )
+                if distances[best] <= outside_km or covers_all:
+                    return int( found[best] ), float( distances[best] )
+
+            elif covers_all:
+                return -1, np.nan
+
+            radius *= 2
+
+
+class SpatialIndex:
+    """ Esta classe tem a responsabilidade de guardar os índices espaciais do dataset
+
+        É construída uma única vez por dataset ( ver spatial_index ) e guarda:
+        1. Um GridIndex com os restaurantes ( cada coordenada de restaurante aparece uma vez )
+        2. Um GridIndex com os locais de entrega ( um ponto por pedido, na ordem das linhas )
+    """
+
+    def __init__( self, df1 ):
+        restaurants = df1.loc[:, RESTAURANT].drop_duplicates().reset_index( drop=True )
+        self.restaurants = restaurants
+        self.restaurant_grid = GridIndex( restaurants[RESTAURANT[0]], restaurants[RESTAURANT[1]] )
+        self.delivery_grid = GridIndex( df1[DELIVERY[0]], df1[DELIVERY[1]] )
+
+    def append( self, batch ):
+        """ Esta função tem a responsabilidade de montar o índice do data frame com um lote novo no fim
+
+            Os locais de entrega do lote são adicionados à grade ( ver GridIndex.append ). Os restaurantes
+            novos entram no fim da lista e a grade deles, pequena, é refeita.
+
+            Input: Dataframe do lote ( já limpo, com as colunas SPATIAL_COLUMNS )
+            Output: Novo SpatialIndex, igual ao construído com o data frame inteiro
+        """
+        new = copy.copy( self )
+        restaurants = ( pd.concat( [ self.restaurants, batch.loc[:, RESTAURANT] ], ignore_index=True )
+                          .drop_duplicates()
+                          .reset_index( drop=True ) )
+        if len( restaurants ) > len( self.restaurants ):
+            new.restaurants = restaurants
+            new.restaurant_grid = GridIndex( restaurants[RESTAURANT[0]], restaurants[RESTAURANT[1]] )
+        new.delivery_grid = self.delivery_grid.append( batch[DELIVERY[0]], batch[DELIVERY[1]] )
+        return new
+
+    def delivery_counts( self, level=0, rows=None ):
+        """ Entregas por célula da grade ( rows = posições das linhas selecionadas, ver filter_rows ) """
+        return self.delivery_grid.counts( level, rows )
+
+    def restaurant_counts( self, level=0 ):
+        """ Restaurantes por célula da grade """
+        return self.restaurant_grid.counts( level )
+
+    def deliveries_in_bbox( self, lat_min, lon_min, lat_max, lon_max ):
+        """ Posições das linhas com local de entrega dentro do retângulo """
+        return self.delivery_grid.query_bbox( lat_min, lon_min, lat_max, lon_max )
+
+    def restaurants_in_bbox( self, lat_min, lon_min, lat_max, lon_max ):
+        """ Coordenadas dos restaurantes dentro do retângulo """
+        found = self.restaurant_grid.query_bbox( lat_min, lon_min, lat_max, lon_max )
+        return self.restaurants.iloc[found].reset_index( drop=True )
+
+    def nearest_restaurant( self, lat, lon ):
+        """ Esta função tem a responsabilidade de achar o restaurante mais próximo de uma coordenada
+
+            Input: Latitude e longitude, em graus
+            Output: ( latitude do restaurante, longitude do restaurante, distância em km ),
+                    ou ( NaN, NaN, NaN ) se não há restaurantes válidos
+        """
+        position, distance = self.restaurant_grid.nearest( lat, lon )
+        if position < 0:
+            return np.nan, np.nan, np.nan
+
+        row = self.restaurants.iloc[position]
+        return row[RESTAURANT[0]], row[RESTAURANT[1]], distance
+
+
+def spatial_index( df1 ):
+    """ Esta função tem a responsabilidade de devolver o índice espacial do dataset
+
+        Input: Dataframe do load_data ( com as colunas SPATIAL_COLUMNS )
+        Output: SpatialIndex ( construído uma única vez por dataset )
+    """
+    return derived( df1, "spatial_index", SpatialIndex )
+
+
+#Com um lote novo ( ver utils.data.append_cached ), o índice é estendido só com o lote
+register_updater( "spatial_index", lambda index, batch, df1: index.append( batch ) )
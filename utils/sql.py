@@ -0,0 +1,486 @@
+#Backend SQL opcional: as consultas das páginas rodam num banco colunar embutido ( DuckDB ) sobre o snapshot.
+#
+#Uso:
+#    CURRY_BACKEND=sql streamlit run Home.py
+#    python -m utils.sql --check 50
+#
+#O snapshot ( Arrow IPC, ver utils/snapshot.py ) é aberto via memory map e consultado direto pelo DuckDB,
+#sem virar um data frame do pandas: os filtros da barra lateral vão para o WHERE de cada consulta e só
+#as colunas usadas são lidas. O DuckDB usa todos os núcleos em cada consulta e processa por partes o
+#que não cabe na memória.
+#
+#O SqlView responde as mesmas consultas do StreamingView ( ver utils/streaming.py ) e o cubo dele
+#( SqlCube ) as mesmas do OrderCube ( ver utils/cube.py ), então as funções das páginas não mudam.
+#O check_parity compara os dois backends.
+#
+#O DuckDB não está no requirements.txt: só é necessário com o backend SQL ( pip install duckdb ).
+
+#Bibliotecas necessárias
+import argparse
+import itertools
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import snapshot
+from utils.cache import LRUCache, build_once
+from utils.couriers import COURIER_COLUMNS, CourierStats, _bits, _group
+from utils.cube import load_cube, moments, slice_cube
+from utils.data import DATA_PATH, data_version, load_data, refresh_snapshot, retire_versions
+from utils.filters import SIDEBAR_OPTIONS, filter_frame, filter_rows, filter_state_key, option_order
+from utils.geo import HEATMAP_CELL_DEG
+from utils.profiling import profiled
+from utils.streaming import StreamingView
+
+#Escolhe o backend das consultas: "pandas" ( padrão ) ou "sql"
+BACKEND_ENV = "CURRY_BACKEND"
+
+#Resultados já consultados, por ( versão do banco, estado dos filtros, consulta )
+QUERY_CACHE_SIZE = 512
+_results = LRUCache( maxsize=QUERY_CACHE_SIZE )
+
+#Cada banco aberto recebe uma versão única no processo
+_versions = itertools.count()
+
+#Tolerâncias da comparação entre os backends: as somas de ponto flutuante são feitas em outra ordem.
+#A absoluta cobre os valores perto de zero ( ex: desvio padrão de valores iguais ), onde a relativa não vale nada
+PARITY_RTOL = 1e-9
+PARITY_ATOL = 1e-6
+
+#-------------------
+#Funções
+#-------------------
+def _col( name ):
+    """ Nome de coluna entre aspas ( algumas têm parênteses, ex: Time_taken(min) ) """
+    return '"{}"'.format( name )
+
+
+def _where( date_max, selections ):
+    """ Esta função tem a responsabilidade de transformar os filtros da barra lateral num WHERE
+
+        Input: Data limite ( exclusiva, None = sem corte ) e categorias selecionadas por coluna
+        Output: ( condição SQL, parâmetros ) - os valores vão como parâmetros, nunca no texto da consulta
+    """
+    clauses, params = [ "TRUE" ], []
+    if date_max is not None:
+        clauses.append( '"Order_Date" < ?' )
+        params.append( pd.Timestamp( date_max ).to_pydatetime() )
+    for col, values in selections.items():
+        values = list( values )
+        if not values:
+            clauses.append( "FALSE" )
+            continue
+        clauses.append( "{} IN ( {} )".format( _col( col ), ", ".join( [ "?" ] * len( values ) ) ) )
+        params.extend( values )
+    return " AND ".join( clauses ), params
+
+
+def _not_null( cols ):
+    """ Condição que descarta as linhas sem valor nas colunas de agrupamento ( igual ao groupby do pandas ) """
+    return "".join( " AND {} IS NOT NULL".format( _col( col ) ) for col in cols )
+
+
+class SqlEngine:
+    """ Esta classe tem a responsabilidade de consultar o snapshot com o DuckDB
+
+        A tabela Arrow do snapshot é registrada no banco sem cópia. As colunas categóricas
+        ( dicionários do Arrow ) são lidas como texto, para ordenar e comparar igual ao pandas.
+    """
+
+    def __init__( self, table ):
+        try:
+            import duckdb
+        except ImportError as error:
+            raise ImportError( "O backend SQL precisa do DuckDB: pip install duckdb" ) from error
+
+        self.connection = duckdb.connect()
+        self.connection.register( "orders_arrow", table )
+        casts = [ "CAST( {0} AS VARCHAR ) AS {0}".format( _col( field.name ) )
+                  for field in table.schema if str( field.type ).startswith( "dictionary" ) ]
+        self.connection.execute( "CREATE TEMP VIEW orders AS SELECT * {} FROM orders_arrow".format(
+            "REPLACE ( {} )".format( ", ".join( casts ) ) if casts else "" ) )
+
+        self.version = next( _versions )
+        self._courier_stats = None
+
+        #Uma conexão do DuckDB não pode ser usada por duas threads ao mesmo tempo
+        #( cada consulta já usa todos os núcleos )
+        self._lock = threading.Lock()
+
+    def query( self, sql, params=() ):
+        """ Esta função tem a responsabilidade de rodar uma consulta
+
+            Input: Consulta SQL ( a tabela se chama orders ) e parâmetros
+            Output: Dataframe com o resultado
+        """
+        with self._lock:
+            return self.connection.execute( sql, list( params ) ).df()
+
+    def slice( self, date_max=None, **selections ):
+        """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral
+
+            Nada é consultado aqui: os filtros vão para o WHERE de cada consulta do SqlView.
+
+            Input: Mesmos parâmetros do OrderCube.slice
+            Output: SqlView
+        """
+        where, params = _where( date_max, selections )
+        key = ( "sql", self.version ) + filter_state_key( date_max, *( selections.get( col, () ) for col in SIDEBAR_OPTIONS ) )
+        return SqlView( SqlCube( self, where, params, key ) )
+
+    def unique_couriers( self ):
+        """ Quantidade de entregadores únicos em todo o dataset """
+        return int( self.query( 'SELECT COUNT( DISTINCT "Delivery_person_ID" ) AS n FROM orders' )["n"].iloc[0] )
+
+    def courier_stats( self, where=None, params=() ):
+        """ Esta função tem a responsabilidade de calcular as estatísticas por entregador
+
+            As somas por entregador, tipo de veículo e cidade saem de uma consulta; as máscaras de bits
+            e a junção por entregador são as mesmas do CourierStats.from_frame ( ver utils/couriers.py ).
+
+            Input: Filtros da barra lateral ( WHERE e parâmetros, ver _where ), None = todo o dataset
+            Output: CourierStats ( o de todo o dataset é calculado uma única vez por banco )
+        """
+        if where is None and self._courier_stats is not None:
+            return self._courier_stats
+
+        time, rating, age = ( _col( col ) for col in [ "Time_taken(min)", "Delivery_person_Ratings", "Delivery_person_Age" ] )
+        values = self.query( """
+            SELECT "Delivery_person_ID", "Type_of_vehicle", "City",
+                   COUNT( * ) AS orders,
+                   COUNT( {time} ) AS time_count,
+                   COALESCE( SUM( {time} ), 0 ) AS time_sum,
+                   MIN( {time} ) AS time_min,
+                   MAX( {time} ) AS time_max,
+                   COUNT( {rating} ) AS rating_count,
+                   COALESCE( SUM( {rating} ), 0 ) AS rating_sum,
+                   COALESCE( SUM( {rating} * {rating} ), 0 ) AS rating_sumsq,
+                   MIN( {age} ) AS age_min,
+                   MAX( {age} ) AS age_max
+            FROM orders
+            WHERE "Delivery_person_ID" IS NOT NULL AND {where}
+            GROUP BY "Delivery_person_ID", "Type_of_vehicle", "City"
+        """.format( time=time, rating=rating, age=age, where=where or "TRUE" ), params )
+
+        labels = self.query( 'SELECT DISTINCT "Type_of_vehicle" AS v FROM orders WHERE "Type_of_vehicle" IS NOT NULL' )
+        vehicle_labels = sorted( labels["v"] )
+        labels = self.query( 'SELECT DISTINCT "City" AS v FROM orders WHERE "City" IS NOT NULL' )
+        city_labels = sorted( labels["v"] )
+
+        for col in [ "time_sum", "time_min", "time_max", "rating_sum", "rating_sumsq", "age_min", "age_max" ]:
+            values[col] = values[col].astype( float )
+        values["vehicles"] = _bits( values.pop( "Type_of_vehicle" ), vehicle_labels )
+        values["cities"] = _bits( values.pop( "City" ), city_labels )
+
+        sums, vehicles, cities = _group( values )
+        stats = CourierStats( sums, vehicles, vehicle_labels, cities, city_labels )
+        if where is None:
+            self._courier_stats = stats
+        return stats
+
+
+class SqlCube:
+    """ Esta classe tem a responsabilidade de responder as consultas do OrderCube com SQL
+
+        Mesmas funções e mesmo formato de resultado do OrderCube ( count e mean_std ), com os filtros
+        da barra lateral no WHERE. Os resultados são memorizados por estado de filtro ( ver key ).
+    """
+
+    def __init__( self, engine, where, params, key ):
+        self.engine = engine
+        self.where = where
+        self.params = params
+
+        #Identifica o banco e o estado dos filtros ( mesmo papel do OrderCube.key )
+        self.key = key
+
+    def _cached( self, name, build ):
+        return _results.get_or_compute( self.key + name, build ).copy()
+
+    def count( self, by ):
+        """ Quantidade de pedidos por grupo ( dimensões e coluna orders ) """
+        cols = ", ".join( _col( col ) for col in by )
+        sql = "SELECT {cols}, COUNT( * ) AS orders FROM orders WHERE {where}{not_null} GROUP BY {cols} ORDER BY {cols}".format(
+            cols=cols, where=self.where, not_null=_not_null( by ) )
+        return self._cached( ( "count", tuple( by ) ), lambda: self.engine.query( sql, self.params ) )
+
+    def mean_std( self, by, measure ):
+        """ Média e desvio padrão amostral de uma medida por grupo ( lista vazia = total ) """
+        return self._cached( ( "mean_std", tuple( by ), measure ), lambda: self._mean_std( by, measure ) )
+
+    def _mean_std( self, by, measure ):
+        m = _col( measure )
+        cols = ", ".join( _col( col ) for col in by )
+        sql = "SELECT {select}COUNT( {m} ) AS n, SUM( {m} ) AS total, SUM( {m} * {m} ) AS total_sq FROM orders WHERE {where}{not_null}".format(
+            select=cols + ", " if by else "", m=m, where=self.where, not_null=_not_null( by ) )
+        if by:
+            sql += " GROUP BY {cols} ORDER BY {cols}".format( cols=cols )
+
+        sums = self.engine.query( sql, self.params )
+        mean, std = moments( sums["n"], sums["total"], sums["total_sq"] )
+        result = sums.loc[:, list( by )].assign( mean=mean, std=std )
+        return result.reset_index( drop=True )
+
+
+class SqlView( StreamingView ):
+    """ Esta classe tem a responsabilidade de responder as consultas das páginas com SQL
+
+        Mesmas funções do StreamingView, cada uma uma consulta com os filtros no WHERE
+        ( ver SqlCube ). Os entregadores mais rápidos e mais lentos também saem direto
+        de uma consulta ( ver top_couriers ).
+    """
+
+    def __init__( self, cube ):
+        self.cube = cube
+        self.engine = cube.engine
+
+    def _query( self, name, sql, params=() ):
+        return self.cube._cached( name, lambda: self.engine.query( sql.format( where=self.cube.where ),
+                                                                   self.cube.params + list( params ) ) )
+
+    def __len__( self ):
+        return int( self._query( ( "len", ), "SELECT COUNT( * ) AS n FROM orders WHERE {where}" )["n"].iloc[0] )
+
+    def orders_by_week( self ):
+        """ Pedidos por semana ( colunas week_of_year e ID ) """
+        return self._query( ( "orders_by_week", ), """
+            SELECT CAST( "Order_Week" AS BIGINT ) AS week_of_year, COUNT( "ID" ) AS "ID"
+            FROM orders WHERE {where} AND "Order_Week" >= 0
+            GROUP BY week_of_year ORDER BY week_of_year""" )
+
+    def couriers_by_week( self ):
+        """ Entregadores únicos por semana ( colunas week_of_year e Delivery_person_ID ) """
+        return self._query( ( "couriers_by_week", ), """
+            SELECT CAST( "Order_Week" AS BIGINT ) AS week_of_year, COUNT( DISTINCT "Delivery_person_ID" ) AS "Delivery_person_ID"
+            FROM orders WHERE {where} AND "Order_Week" >= 0
+            GROUP BY week_of_year ORDER BY week_of_year""" )
+
+    def map_medians( self ):
+        """ Mediana das coordenadas de entrega por cidade e tipo de tráfego """
+        return self._query( ( "map_medians", ), """
+            SELECT "City", "Road_traffic_density",
+                   MEDIAN( "Delivery_location_latitude" ) AS "Delivery_location_latitude",
+                   MEDIAN( "Delivery_location_longitude" ) AS "Delivery_location_longitude"
+            FROM orders WHERE {where} AND "City" IS NOT NULL AND "Road_traffic_density" IS NOT NULL
+            GROUP BY "City", "Road_traffic_density" ORDER BY "City", "Road_traffic_density" """ )
+
+    def location_counts( self ):
+        """ Entregas por célula da grade do mapa de calor ( colunas lat_cell, lon_cell e count ) """
+        #Mesmas células e mesma regra de coordenada válida do grid_cells ( ver utils/geo.py )
+        return self._query( ( "location_counts", ), """
+            WITH points AS (
+                SELECT "Delivery_location_latitude" AS lat, "Delivery_location_longitude" AS lon
+                FROM orders WHERE {where}
+            )
+            SELECT CAST( FLOOR( lat / ? ) AS BIGINT ) AS lat_cell, CAST( FLOOR( lon / ? ) AS BIGINT ) AS lon_cell,
+                   COUNT( * ) AS count
+            FROM points WHERE ABS( lat ) <= 90 AND ABS( lon ) <= 180 AND lat <> 0 AND lon <> 0
+            GROUP BY lat_cell, lon_cell ORDER BY lat_cell, lon_cell""", [ HEATMAP_CELL_DEG, HEATMAP_CELL_DEG ] )
+
+    def min_time_by_courier( self ):
+        """ Menor tempo de entrega por entregador e cidade ( colunas Delivery_person_ID, City, Time_taken(min) ) """
+        return self._query( ( "min_time_by_courier", ), """
+            SELECT "Delivery_person_ID", "City", MIN( "Time_taken(min)" ) AS "Time_taken(min)"
+            FROM orders WHERE {where} AND "Delivery_person_ID" IS NOT NULL AND "City" IS NOT NULL
+            GROUP BY "Delivery_person_ID", "City" ORDER BY "Delivery_person_ID", "City" """
+        ).set_index( [ "Delivery_person_ID", "City" ] )["Time_taken(min)"]
+
+    def ratings_by_courier( self ):
+        """ Avaliação média por entregador ( colunas Delivery_person_ID e Delivery_person_Ratings ) """
+        return self._query( ( "ratings_by_courier", ), """
+            SELECT "Delivery_person_ID", AVG( "Delivery_person_Ratings" ) AS "Delivery_person_Ratings"
+            FROM orders WHERE {where} AND "Delivery_person_ID" IS NOT NULL
+            GROUP BY "Delivery_person_ID" ORDER BY "Delivery_person_ID" """ )
+
+    def courier_stats( self ):
+        """ Estatísticas por entregador dos pedidos filtrados ( CourierStats, ver SqlEngine.courier_stats ) """
+        return self.engine.courier_stats( self.cube.where, self.cube.params )
+
+    def overall_metrics( self ):
+        """ Maior e menor idade e melhor e pior condição de veículo """
+        row = self._query( ( "overall_metrics", ), """
+            SELECT MAX( "Delivery_person_Age" ) AS maior_idade, MIN( "Delivery_person_Age" ) AS menor_idade,
+                   MAX( "Vehicle_condition" ) AS melhor_condicao, MIN( "Vehicle_condition" ) AS pior_condicao
+            FROM orders WHERE {where}""" ).iloc[0]
+        return { name: np.nan if pd.isna( value ) else value for name, value in row.items() }
+
+    def top_couriers( self, k ):
+        """ Esta função tem a responsabilidade de achar os k mais rápidos e os k mais lentos de cada cidade
+
+            Uma única consulta: menor tempo por entregador e cidade e a posição de cada um nas duas
+            ordenações da cidade ( empates desempatados pelo Delivery_person_ID, igual ao rank_city ).
+
+            Input: Quantidade de entregadores por cidade
+            Output: ( mais rápidos, mais lentos ) - mesmo formato do top_couriers ( ver utils/visao_entregadores.py )
+        """
+        ranked = self._query( ( "top_couriers", k ), """
+            WITH best AS (
+                SELECT "Delivery_person_ID", "City", MIN( "Time_taken(min)" ) AS "Time_taken(min)"
+                FROM orders WHERE {where} AND "Delivery_person_ID" IS NOT NULL AND "City" IS NOT NULL
+                GROUP BY "Delivery_person_ID", "City"
+            ), ranked AS (
+                SELECT *,
+                       ROW_NUMBER() OVER ( PARTITION BY "City" ORDER BY "Time_taken(min)", "Delivery_person_ID" ) AS fast,
+                       ROW_NUMBER() OVER ( PARTITION BY "City" ORDER BY "Time_taken(min)" DESC, "Delivery_person_ID" ) AS slow
+                FROM best WHERE "Time_taken(min)" IS NOT NULL
+            )
+            SELECT * FROM ranked WHERE fast <= ? OR slow <= ?""", [ k, k ] )
+
+        #Cidades na ordem da barra lateral ( ver utils.filters.option_order ), igual ao rank_city
+        city = pd.Categorical( ranked["City"], categories=option_order( "City", ranked["City"].unique() ) )
+        ranked = ranked.assign( city_order=city.codes )
+
+        def frame( position ):
+            return ( ranked.loc[ranked[position] <= k, :]
+                           .sort_values( [ "city_order", position ] )
+                           .loc[:, [ "Delivery_person_ID", "City", "Time_taken(min)" ]]
+                           .reset_index( drop=True ) )
+
+        return frame( "fast" ), frame( "slow" )
+
+
+def sql_enabled():
+    """ Esta função tem a responsabilidade de dizer se as páginas devem usar o backend SQL
+
+        Output: True se a variável de ambiente CURRY_BACKEND for sql
+    """
+    return os.environ.get( BACKEND_ENV, "pandas" ) == "sql"
+
+
+#Banco aberto por arquivo, igual ao cache do load_data
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+@profiled()
+def load_sql( path=DATA_PATH ):
+    """ Esta função tem a responsabilidade de abrir o banco uma única vez por processo
+
+        Input: Caminho do CSV ( o snapshot é refeito antes, se o CSV mudou )
+        Output: SqlEngine
+    """
+    fingerprint = data_version( path )
+
+    def store( key, engine ):
+        retire_versions( _cache, fingerprint )
+        _cache[key] = engine
+
+    return build_once( _cache, _cache_lock, fingerprint,
+                       lambda: SqlEngine( snapshot.read_table( refresh_snapshot( path ) ) ), store=store )
+
+
+@profiled()
+def slice_sql( engine, date_max, traffic_options, weather_conditions, cities ):
+    """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral no banco
+
+        Input:
+            - engine: SqlEngine
+            - date_max: Data limite ( exclusiva )
+            - traffic_options, weather_conditions, cities: Listas selecionadas nos multiselects
+        Output: SqlView ( o cubo filtrado fica em view.cube )
+    """
+    return engine.slice( date_max,
+                         Road_traffic_density=traffic_options,
+                         Weatherconditions=weather_conditions,
+                         City=cities )
+
+
+def _same( expected, found ):
+    """ Compara dois resultados: textos, datas e inteiros iguais; números com PARITY_RTOL e PARITY_ATOL """
+    if isinstance( expected, dict ):
+        expected, found = pd.DataFrame( [ expected ] ), pd.DataFrame( [ found ] )
+    expected = expected.reset_index( drop=True )
+    found = found.reset_index( drop=True )
+    if list( expected.columns ) != list( found.columns ) or len( expected ) != len( found ):
+        return False
+
+    for col in expected.columns:
+        a, b = expected[col], found[col]
+        if pd.api.types.is_float_dtype( a ) or pd.api.types.is_float_dtype( b ):
+            if not np.allclose( a.to_numpy( dtype=float ), b.to_numpy( dtype=float ), rtol=PARITY_RTOL, atol=PARITY_ATOL,
+                                equal_nan=True ):
+                return False
+        elif not ( a.astype( object ).to_numpy() == b.astype( object ).to_numpy() ).all():
+            return False
+    return True
+
+
+def check_parity( engine, path=DATA_PATH, n_states=50, seed=0 ):
+    """ Esta função tem a responsabilidade de comparar o backend SQL com o pandas
+
+        Sorteia estados da barra lateral e compara, em cada um, as agregações do cubo usadas pelas páginas
+        e as funções das páginas ( mesmas funções, com o SqlView e com os pedidos filtrados ).
+        As estatísticas por entregador ( todo o dataset ) são comparadas uma vez.
+
+        Input: SqlEngine, caminho do CSV, quantidade de estados e semente
+        Output: Lista de ( estado, consulta ) que não bateram ( vazia se tudo bateu )
+    """
+    from utils.couriers import courier_stats
+    from utils.visao_empresa import _weekly, country_maps_data, delivery_heatmap_data
+    from utils.visao_entregadores import TOP_K, _top_couriers, overall_metrics, ratings_by_courier
+
+    df = load_data( path )
+    cube = load_cube( path )
+
+    mismatches = []
+    expected = courier_stats( load_data( path, columns=COURIER_COLUMNS ) ).table()
+    if not _same( expected, engine.courier_stats().table() ):
+        mismatches.append( ( None, "courier_stats" ) )
+
+    counts = [ [ "Order_Date" ], [ "Road_traffic_density" ], [ "City", "Road_traffic_density" ] ]
+    measures = [ ( [], "distance" ), ( [ "Festival" ], "Time_taken(min)" ), ( [ "City" ], "Time_taken(min)" ),
+                 ( [ "City", "Road_traffic_density" ], "Time_taken(min)" ), ( [ "City", "Type_of_order" ], "Time_taken(min)" ),
+                 ( [ "City" ], "distance" ), ( [ "Road_traffic_density" ], "Delivery_person_Ratings" ),
+                 ( [ "Weatherconditions" ], "Delivery_person_Ratings" ) ]
+
+    rng = np.random.default_rng( seed )
+    dates = np.sort( df["Order_Date"].dropna().unique() )
+    for _ in range( n_states ):
+        selections = [ [ option for option in options if rng.random() < 0.6 ] or [ rng.choice( options ) ]
+                       for options in SIDEBAR_OPTIONS.values() ]
+        date_max = None if rng.random() < 0.2 else pd.Timestamp( rng.choice( dates ) ).to_pydatetime()
+        state = ( date_max, *selections )
+
+        orders = filter_frame( df, *state )
+        view = slice_sql( engine, *state )
+        sliced = slice_cube( cube, *state )
+
+        checks = {
+            "orders_by_week": ( _weekly( orders, "ID", "count" ), view.orders_by_week() ),
+            "couriers_by_week": ( _weekly( orders, "Delivery_person_ID", "nunique" ), view.couriers_by_week() ),
+            "map_medians": ( country_maps_data( orders ), country_maps_data( view ) ),
+            "heatmap": ( delivery_heatmap_data( df, filter_rows( df, *state ) )
+                             .sort_values( [ "Delivery_location_latitude", "Delivery_location_longitude" ] ),
+                         delivery_heatmap_data( view ) ),
+            "ratings_by_courier": ( ratings_by_courier( orders ), ratings_by_courier( view ) ),
+            "overall_metrics": ( overall_metrics( orders ), overall_metrics( view ) ),
+        }
+        for k in [ TOP_K, 3 ]:
+            checks["top_couriers_{}".format( k )] = ( pd.concat( _top_couriers( orders, k ) ),
+                                                       pd.concat( _top_couriers( view, k ) ) )
+        for by in counts:
+            checks["count{}".format( by )] = ( sliced.count( by ), view.cube.count( by ) )
+        for by, measure in measures:
+            checks["mean_std{}{}".format( by, measure )] = ( sliced.mean_std( by, measure ),
+                                                             view.cube.mean_std( by, measure ) )
+
+        for name, ( expected, found ) in checks.items():
+            if not _same( expected, found ):
+                mismatches.append( ( state, name ) )
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description="Compara o backend SQL com o pandas" )
+    parser.add_argument( "--data", default=DATA_PATH, help="CSV do dataset" )
+    parser.add_argument( "--check", type=int, default=50, help="estados sorteados da barra lateral" )
+    parser.add_argument( "--seed", type=int, default=0, help="semente do sorteio" )
+    args = parser.parse_args()
+
+    mismatches = check_parity( load_sql( args.data ), args.data, args.check, args.seed )
+    print( "{} estados comparados, {} diferenças".format( args.check, len( mismatches ) ) )
+    for state, name in mismatches[:10]:
+        print( "    {} {}".format( name, state ) )
@@ -0,0 +1,375 @@
+#Bibliotecas necessárias
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import build_once
+from utils.cube import OrderCube, merge_cells
+from utils.data import ( DATA_PATH, appended_rows, clean_code, data_version, plain_columns, read_raw_csv, retire_versions,
+                         snapshot_parts )
+from utils.geo import HEATMAP_CELL_DEG, grid_cells
+from utils.profiling import profiled
+from utils.snapshot import merge_reports
+
+#Liga o modo streaming nas páginas ( CURRY_STREAMING=1 ): o dataset não fica em memória,
+#só os agregados ( ver StreamingAggregates )
+STREAMING_ENV = "CURRY_STREAMING"
+
+#Quantidade de linhas lidas do CSV por vez
+CHUNK_SIZE = 200_000
+
+#A cada quantos blocos os agregados parciais são juntados ( limita a memória usada )
+COMPACT_EVERY = 8
+
+#Dimensões dos filtros da barra lateral
+FILTER_DIMENSIONS = [ "Order_Date", "City", "Road_traffic_density", "Weatherconditions" ]
+
+#Tamanho do KLL das coordenadas ( ver utils/sketches.py ): menor que o do modo aproximado, para os
+#sketches de cada célula ficarem em no máximo ~3 * STREAMING_KLL_K valores
+STREAMING_KLL_K = 64
+
+#Idade e condição do veículo mínimas e máximas por célula das dimensões dos filtros ( métricas gerais )
+EXTREMES = {
+    "age_min": ( "Delivery_person_Age", "min" ),
+    "age_max": ( "Delivery_person_Age", "max" ),
+    "vehicle_min": ( "Vehicle_condition", "min" ),
+    "vehicle_max": ( "Vehicle_condition", "max" ),
+}
+
+#Coordenadas de entrega, para as medianas do mapa
+COORDINATES = [ "Delivery_location_latitude", "Delivery_location_longitude" ]
+
+#Contagem de entregas por célula da grade do mapa de calor ( ver utils/geo.py )
+LOCATION_KEYS = FILTER_DIMENSIONS + [ "lat_cell", "lon_cell" ]
+
+#-------------------
+#Funções
+#-------------------
+class StreamingUnsupported( NotImplementedError ):
+    """ Consulta que precisa dos pedidos ( ou de uma linha por entregador ) e não existe no modo streaming """
+
+    def __init__( self, query ):
+        super().__init__( "{} não está disponível no modo streaming ( CURRY_STREAMING=1 ): só os agregados "
+                          "ficam em memória. Use o modo normal, o pré-cálculo ou o backend SQL.".format( query ) )
+
+
+def _extremes( df1 ):
+    """ Idade e condição do veículo mínimas e máximas de um bloco limpo, por dimensões dos filtros """
+    return plain_columns( df1.groupby( FILTER_DIMENSIONS, sort=False, observed=True, dropna=False )
+                             .agg( **EXTREMES )
+                             .reset_index() )
+
+
+def _location_counts( df1 ):
+    """ Conta as entregas por célula da grade do mapa de calor, por dimensões dos filtros """
+    rows, cols, valid = grid_cells( df1[COORDINATES[0]], df1[COORDINATES[1]], HEATMAP_CELL_DEG )
+    values = df1.loc[valid, FILTER_DIMENSIONS].assign( lat_cell=rows[valid], lon_cell=cols[valid] )
+    return plain_columns( values.groupby( LOCATION_KEYS, sort=False, observed=True ).size().rename( "count" ).reset_index() )
+
+
+def _merge( frames, keys, measures ):
+    """ Junta agregados parciais com as mesmas chaves """
+    return ( pd.concat( frames, ignore_index=True )
+               .groupby( keys, sort=False, dropna=False )
+               .agg( measures )
+               .reset_index() )
+
+
+def _weighted_medians( frame, keys, col ):
+    """ Esta função tem a responsabilidade de calcular a mediana de valores repetidos, por grupo
+
+        Cada linha de frame é um valor ( coluna col ) repetido count vezes. Os valores são ordenados
+        uma única vez por grupo e valor, e a mediana de cada grupo sai da soma acumulada das contagens
+        ( mesmo resultado do median() do pandas ).
+
+        Input: Dataframe com as colunas keys, col e count, lista das colunas dos grupos e nome da coluna
+        Output: Series com a mediana de cada grupo ( vazia se não houver valores )
+    """
+    frame = frame.loc[frame[col].notna() & ( frame["count"] > 0 ), keys + [ col, "count" ]]
+    frame = frame.sort_values( keys + [ col ], kind="stable" )
+    if frame.empty:
+        return pd.Series( [], index=pd.MultiIndex.from_frame( frame[keys] ), name=col, dtype=np.float64 )
+
+    values = frame[col].to_numpy( dtype=np.float64 )
+    counts = frame["count"].to_numpy( dtype=np.int64 )
+    group = frame.groupby( keys, sort=False ).ngroup().to_numpy()
+    starts = np.flatnonzero( np.r_[ True, group[1:] != group[:-1] ] )
+    cumulative = np.cumsum( counts )
+    before = np.r_[ 0, cumulative[starts[1:] - 1] ]
+    n = np.add.reduceat( counts, starts )
+
+    #Posições ( 1 = menor valor do grupo ) dos dois valores do meio; iguais quando n é ímpar
+    lower = values[np.searchsorted( cumulative, before + ( n + 1 ) // 2 )]
+    upper = values[np.searchsorted( cumulative, before + n // 2 + 1 )]
+
+    index = pd.MultiIndex.from_frame( frame[keys].iloc[starts] )
+    return pd.Series( ( lower + upper ) / 2, index=index, name=col )
+
+
+class StreamingAggregates:
+    """ Esta classe tem a responsabilidade de guardar os agregados do dataset sem os pedidos
+
+        Guarda apenas agregados que podem ser juntados entre blocos, todos por célula das dimensões
+        ( nenhum cresce com a quantidade de pedidos ):
+        1. As células do cubo de pedidos ( quantidade, soma e soma dos quadrados, ver utils/cube.py )
+        2. Os sketches de cada combinação das dimensões dos filtros ( ver utils/sketches.py ): a quantidade
+           de pedidos, um HyperLogLog dos entregadores e um KLL de cada coordenada de entrega
+           ( STREAMING_KLL_K )
+        3. A idade e a condição do veículo mínimas e máximas de cada combinação ( EXTREMES )
+
+        Medido com pedidos sintéticos: 20,5 MB de agregados com 1 milhão de pedidos ( 904 mil depois da
+        limpeza ) e 22,2 MB com 1,5 milhão, com pico de ~500 MB no processo ( a limpeza de cada bloco ).
+        Os sketches de cada combinação param de crescer em ~3 * STREAMING_KLL_K valores por coordenada.
+        Antes eram ~185 MB com 1 milhão de pedidos, com uma linha por pedido nas coordenadas, e pico de 710 MB.
+
+        Por isso as consultas do StreamingView são:
+        - exatas: pedidos ( cubo e por semana ) e métricas gerais
+        - aproximadas: entregadores únicos ( HyperLogLog ) e medianas do mapa ( KLL ), ver approx_note
+        - indisponíveis ( StreamingUnsupported ): as que precisam de uma linha por pedido ou por
+          entregador ( mapa de calor, tabela por entregador e rankings de velocidade )
+    """
+
+    @classmethod
+    def from_frame( cls, df1 ):
+        """ Esta função tem a responsabilidade de agregar um data frame já limpo ( um bloco ou um lote )
+
+            Input: Dataframe limpo
+            Output: StreamingAggregates
+        """
+        #Importado aqui porque utils/sketches.py usa este módulo
+        from utils.sketches import SKETCH_COLUMNS, SketchAggregates
+
+        return cls(
+            cube=OrderCube( df1 ),
+            sketches=SketchAggregates.from_frame( df1.loc[:, SKETCH_COLUMNS], k=STREAMING_KLL_K ),
+            extremes=_extremes( df1 ),
+            report=df1.attrs.get( "clean_report", {} ),
+        )
+
+    @classmethod
+    def merge( cls, parts ):
+        """ Esta função tem a responsabilidade de juntar agregados de partes diferentes do dataset
+
+            Input: Lista de StreamingAggregates
+            Output: StreamingAggregates
+        """
+        from utils.sketches import SketchAggregates
+
+        report = {}
+        for part in parts:
+            report = merge_reports( report, part.report )
+
+        return cls(
+            cube=OrderCube( cells=merge_cells( [ part.cube.cells for part in parts ] ) ),
+            sketches=SketchAggregates.merge( [ part.sketches for part in parts ] ),
+            extremes=_merge( [ part.extremes for part in parts ], FILTER_DIMENSIONS,
+                             { name: how for name, ( col, how ) in EXTREMES.items() } ),
+            report=report,
+        )
+
+    def __init__( self, cube, sketches, extremes, report ):
+        self.cube = cube
+        self.sketches = sketches
+        self.extremes = extremes
+        self.report = report
+
+    @property
+    def nbytes( self ):
+        """ Memória dos agregados, em bytes """
+        return int( self.cube.cells.memory_usage( index=True ).sum() + self.sketches.nbytes
+                    + self.extremes.memory_usage( index=True ).sum() )
+
+    def unique_couriers( self ):
+        """ Quantidade de entregadores únicos em todo o dataset ( estimada pelo HyperLogLog ) """
+        from utils.sketches import hll_estimate
+
+        registers = self.sketches.registers.max( axis=0, initial=0 )[np.newaxis, :]
+        return int( np.rint( hll_estimate( registers ) )[0] )
+
+    def slice( self, date_max=None, **selections ):
+        """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral
+
+            Input: Mesmos parâmetros do OrderCube.slice
+            Output: StreamingView com os agregados filtrados
+        """
+        keep = np.ones( len( self.extremes ), dtype=bool )
+        if date_max is not None:
+            keep &= ( self.extremes["Order_Date"] < date_max ).to_numpy()
+        for dim, values in selections.items():
+            keep &= self.extremes[dim].isin( list( values ) ).to_numpy()
+
+        return StreamingView(
+            cube=self.cube.slice( date_max, **selections ),
+            sketches=self.sketches.slice( date_max, **selections ),
+            extremes=self.extremes.loc[keep, :],
+        )
+
+
+class StreamingView:
+    """ Esta classe tem a responsabilidade de responder as consultas das páginas a partir dos agregados
+
+        É também a interface dos outros modos sem os pedidos ( SqlView, PrecomputedView e SketchView ):
+        as funções das páginas recebem um deles no lugar do data frame filtrado e chamam estas consultas.
+
+        No modo streaming os pedidos e as métricas gerais são exatos, os entregadores únicos e as medianas
+        são aproximados e as consultas por pedido ou por entregador levantam StreamingUnsupported
+        ( ver StreamingAggregates ).
+    """
+
+    def __init__( self, cube, sketches, extremes ):
+        self.cube = cube
+        self.sketches = sketches
+        self.extremes = extremes
+
+    def __len__( self ):
+        return len( self.sketches )
+
+    def orders_by_week( self ):
+        """ Pedidos por semana ( colunas week_of_year e ID ) """
+        return self.sketches.orders_by_week()
+
+    def couriers_by_week( self ):
+        """ Entregadores únicos por semana, estimados ( colunas week_of_year e Delivery_person_ID ) """
+        return self.sketches.couriers_by_week()
+
+    def map_medians( self ):
+        """ Mediana das coordenadas de entrega por cidade e tipo de tráfego, estimada """
+        return self.sketches.map_medians()
+
+    def location_counts( self ):
+        """ Entregas por célula da grade do mapa de calor ( colunas lat_cell, lon_cell e count ) """
+        raise StreamingUnsupported( "O mapa de calor" )
+
+    def min_time_by_courier( self ):
+        """ Menor tempo de entrega por entregador e cidade ( colunas Delivery_person_ID, City, Time_taken(min) ) """
+        raise StreamingUnsupported( "O ranking de velocidade dos entregadores" )
+
+    def ratings_by_courier( self ):
+        """ Avaliação média por entregador ( colunas Delivery_person_ID e Delivery_person_Ratings ) """
+        raise StreamingUnsupported( "A avaliação média por entregador" )
+
+    def courier_stats( self ):
+        """ Estatísticas por entregador dos pedidos filtrados ( CourierStats, ver utils/couriers.py ) """
+        raise StreamingUnsupported( "A tabela por entregador" )
+
+    def overall_metrics( self ):
+        """ Maior e menor idade e melhor e pior condição de veículo """
+        return {
+            "maior_idade": self.extremes["age_max"].max(),
+            "menor_idade": self.extremes["age_min"].min(),
+            "melhor_condicao": self.extremes["vehicle_max"].max(),
+            "pior_condicao": self.extremes["vehicle_min"].min(),
+        }
+
+
+def stream_aggregates( path=DATA_PATH, chunk_size=CHUNK_SIZE ):
+    """ Esta função tem a responsabilidade de ler o CSV em blocos e guardar só os agregados
+
+        Cada bloco passa pelo clean_code, vira agregados e é descartado. A cada COMPACT_EVERY blocos
+        os agregados parciais são juntados, então a memória depende do tamanho do bloco e da
+        quantidade de combinações das dimensões, não da quantidade de pedidos ( ver StreamingAggregates ).
+
+        Input: Caminho do CSV e quantidade de linhas por bloco
+        Output: StreamingAggregates
+    """
+    parts = []
+    for chunk in read_raw_csv( path, chunksize=chunk_size ):
+        parts.append( StreamingAggregates.from_frame( clean_code( chunk ) ) )
+
+        if len( parts ) == COMPACT_EVERY:
+            parts = [ StreamingAggregates.merge( parts ) ]
+
+    return StreamingAggregates.merge( parts )
+
+
+#Cache dos agregados por arquivo, igual ao cache do load_data
+_cache = {}
+_cache_lock = threading.Lock()
+
+#Partes do snapshot de cada versão em cache ( None = desconhecidas ), para montar a versão seguinte só com
+#as partes novas ( ver utils.data.appended_rows )
+_parts = {}
+
+
+def streaming_enabled():
+    """ Esta função tem a responsabilidade de dizer se as páginas devem usar o modo streaming
+
+        Output: True se a variável de ambiente CURRY_STREAMING for 1
+    """
+    return os.environ.get( STREAMING_ENV, "0" ) == "1"
+
+
+def _store( fingerprint, aggregates, parts ):
+    """ Guarda os agregados de uma versão e descarta as antigas ( deve ser chamada com o lock do cache ) """
+    _cache[tuple( fingerprint )] = aggregates
+    _parts[tuple( fingerprint )] = parts
+    retire_versions( _cache, fingerprint )
+    retire_versions( _parts, fingerprint )
+
+
+@profiled()
+def load_aggregates( path=DATA_PATH, chunk_size=CHUNK_SIZE ):
+    """ Esta função tem a responsabilidade de carregar os agregados uma única vez por processo
+
+        Os agregados ficam em cache enquanto o arquivo não mudar ( ver utils.data.data_version ). Quando a
+        versão nova só adicionou partes ao snapshot ( ex: python -m utils.append rodado por outro processo ),
+        só as partes novas são agregadas e juntadas aos agregados da versão anterior.
+
+        Input: Caminho do CSV e quantidade de linhas por bloco
+        Output: StreamingAggregates
+    """
+    fingerprint = data_version( path )
+    parts = {}
+
+    def build():
+        with _cache_lock:
+            versions = { fp: _parts.get( fp ) for fp in _cache }
+        change = appended_rows( path, versions, fingerprint ) if any( versions.values() ) else None
+        with _cache_lock:
+            aggregates = _cache.get( change[0] ) if change is not None else None
+
+        if aggregates is None:
+            aggregates = stream_aggregates( path, chunk_size )
+            parts["parts"] = snapshot_parts( path, fingerprint )
+            return aggregates
+
+        parts["parts"] = change[2]
+        return StreamingAggregates.merge( [ aggregates, StreamingAggregates.from_frame( change[1] ) ] )
+
+    return build_once( _cache, _cache_lock, fingerprint, build,
+                       store=lambda key, aggregates: _store( key, aggregates, parts["parts"] ) )
+
+
+def append_aggregates( batch, old_fingerprint, new_fingerprint ):
+    """ Esta função tem a responsabilidade de adicionar um lote já limpo aos agregados em cache
+
+        Só o lote é agregado; os agregados antigos são juntados com os dele. A versão antiga continua
+        no cache para as execuções que ainda a usam ( ver retire_versions ).
+
+        Input: Dataframe do lote ( já limpo ), fingerprint do CSV antes e depois do lote
+        Output: None
+    """
+    parts = snapshot_parts( new_fingerprint[0], new_fingerprint )
+    with _cache_lock:
+        aggregates = _cache.get( tuple( old_fingerprint ) )
+        if aggregates is not None:
+            _store( new_fingerprint, StreamingAggregates.merge(
+                [ aggregates, StreamingAggregates.from_frame( batch ) ] ), parts )
+
+
+@profiled()
+def slice_aggregates( aggregates, date_max, traffic_options, weather_conditions, cities ):
+    """ Esta função tem a responsabilidade de aplicar os filtros da barra lateral nos agregados
+
+        Input:
+            - aggregates: StreamingAggregates
+            - date_max: Data limite ( exclusiva )
+            - traffic_options, weather_conditions, cities: Listas selecionadas nos multiselects
+        Output: StreamingView
+    """
+    return aggregates.slice( date_max,
+                             Road_traffic_density=traffic_options,
+                             Weatherconditions=weather_conditions,
+                             City=cities )
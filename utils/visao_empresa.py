@@ -0,0 +1,247 @@
+#Funções de agregação e gráficos da página Visão Empresa.
+#Ficam fora da página para poderem ser usadas sem o Streamlit ( ex: benchmarks ).
+
+#Bibliotecas necessárias
+#plotly e folium demoram para importar, então são importados dentro das funções que desenham
+#( só na primeira vez que um gráfico ou mapa é montado, e não a cada abertura da página )
+import numpy as np
+import pandas as pd
+
+from utils.geo import HEATMAP_CELL_DEG, cell_centers
+from utils.profiling import profiled
+from utils.spatial import spatial_index
+from utils.streaming import StreamingView
+
+#-------------------
+#Funções
+#-------------------
+@profiled()
+def order_metric( cube ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: De barras
+        Informação do gráfico: Número de pedidos por dia.
+        
+        Input: Cubo de pedidos ( ver utils/cube.py )
+        Output: Gráfico
+    """    
+    #Quantidade de pedidos por dia, somando as células do cubo
+    df_aux = cube.count(["Order_Date"]).rename(columns={"orders": "ID"})
+
+    #Desenhar gráficos linhas
+    import plotly.express as px
+    fig = px.bar(df_aux, x="Order_Date", y="ID")
+            
+    return fig
+
+
+@profiled()
+def traffic_order_share( cube ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: De barras
+        Informação do gráfico: Distribuição de pedidos por tipo de tráfego.
+        
+        Input: Cubo de pedidos ( ver utils/cube.py )
+        Output: Gráfico
+    """
+    
+    df_aux = cube.count(["Road_traffic_density"]).rename(columns={"orders": "ID"})
+
+    #vou transformar a coluna ID em porcentagem criando uma nova coluna
+    df_aux["entregas_perc"] = df_aux["ID"] / df_aux["ID"].sum()
+
+    import plotly.express as px
+    fig = px.pie(df_aux, values="entregas_perc", names="Road_traffic_density")
+                
+    return fig
+
+
+@profiled()
+def traffic_order_city( cube ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: De barras
+        Informação do gráfico: Comparação do volume de pedidos por cidade e tipo de tráfego.
+        
+        Input: Cubo de pedidos ( ver utils/cube.py )
+        Output: Gráfico
+    """
+    
+    df_aux = cube.count(["City", "Road_traffic_density"]).rename(columns={"orders": "ID"})
+
+    import plotly.express as px
+    fig = px.scatter (df_aux, x="City", y="Road_traffic_density", size="ID", color="City")
+                
+    return fig
+
+
+def _weekly( df1, col, how ):
+    """ Agrega uma coluna por semana do ano ( coluna Order_Week, calculada na limpeza, ver utils/dates.py )
+
+        Pedidos sem data ( semana -1 ) ficam de fora. O data frame não é alterado, então os gráficos
+        por semana não dependem da ordem em que são chamados.
+    """
+    grouped = df1.groupby( df1["Order_Week"].rename( "week_of_year" ) )[col]
+    return getattr( grouped, how )().drop( index=-1, errors="ignore" ).reset_index()
+
+
+@profiled()
+def order_by_week( df1 ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: De barras
+        Informação do gráfico: Quantidade de pedidos por semana.
+        
+        Input: Dataframe ( ou StreamingView, ver utils/streaming.py )
+        Output: Gráfico
+    """
+    
+    if isinstance( df1, StreamingView ):
+        df_aux = df1.orders_by_week()
+    else:
+        df_aux = _weekly( df1, "ID", "count" )
+    import plotly.express as px
+    fig = px.line(df_aux, x="week_of_year", y="ID")
+    
+    return fig
+
+
+@profiled()
+def order_share_by_week( df1 ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: De barras
+        Informação do gráfico: Quantidade de pedidos por entregador e por semana.
+        
+        Input: Dataframe ( ou StreamingView, ver utils/streaming.py )
+        Output: Gráfico
+    """
+    
+    # Quantidade de pedidos por semana / Quantidade de entregadores unicos por semana
+    if isinstance( df1, StreamingView ):
+        df_aux1 = df1.orders_by_week()
+        df_aux2 = df1.couriers_by_week()
+    else:
+        df_aux1 = _weekly( df1, "ID", "count" )
+        df_aux2 = _weekly( df1, "Delivery_person_ID", "nunique" )
+
+    #aqui vamos juntar os dois date frames
+    df_aux = pd.merge(df_aux1, df_aux2, how="inner")
+            
+    #agora vamos criar uma nova coluna, e essa coluna será usada pra fazer o gráfico
+    df_aux["order_by_deliver"] = df_aux["ID"] / df_aux["Delivery_person_ID"]
+
+    import plotly.express as px
+    fig = px.line(df_aux, x="week_of_year", y="order_by_deliver")
+            
+    return fig
+
+
+@profiled()
+def country_maps_data( df1 ):
+    """ Esta função tem a responsabilidade de calcular os pontos do mapa
+
+        Informação: A localização central ( mediana ) de cada cidade por tipo de tráfego.
+
+        Input: Dataframe ( ou StreamingView, ver utils/streaming.py )
+        Output: Dataframe com City, Road_traffic_density e as coordenadas medianas
+    """
+    if isinstance( df1, StreamingView ):
+        return df1.map_medians()
+
+    df_aux = (df1.loc[:, ["City", "Road_traffic_density", "Delivery_location_latitude", "Delivery_location_longitude"]]
+                 .groupby(["City", "Road_traffic_density"], observed=True)
+                 .median()
+                 .sort_index()
+                 .reset_index())
+    #Se você observar o código, eu utilizei a MEDIANA e não a MÉDIA, porque? A média altera o valor, por exemplo, se tivermos 2 + 3 = 5, a média disso é 2,5
+    #ou seja, ele alterou para um número que não existia, a Mediana não altera o valor, ela seleciona o número que esta literalmente no meio.
+    #ex: uma lista com [1,2,3,4,5], a mediana irá selecionar o 3, pois é o numero do "meio", caso fosse a média, ela iria somar tudo e dividir por 5.
+
+    return df_aux
+
+
+@profiled()
+def country_maps ( df1 ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: Mapa
+        Informação do gráfico: A localização central de cada cidade por tipo de tráfego.
+        
+        Input: Dataframe ( ou StreamingView, ver utils/streaming.py )
+        Output: Mapa ( folium.Map ), que a página desenha a partir do cache ( ver utils/maps.py )
+    """
+    
+    #A biblioteca folium irá me ajudar a fazer um mapa com pinos, por isso importei ela.
+    import folium
+
+    df_aux = country_maps_data( df1 )
+            
+    map = folium.Map()
+    #Agora vamos "desenhar" o mapa
+    #Os pinos saem direto das colunas ( arrays ), sem criar uma Series por linha como o .iterrows
+    for lat, lon, city, traffic in zip( df_aux["Delivery_location_latitude"].to_numpy(),
+                                        df_aux["Delivery_location_longitude"].to_numpy(),
+                                        df_aux["City"].to_numpy(),
+                                        df_aux["Road_traffic_density"].to_numpy() ):
+        folium.Marker( [ lat, lon ], popup=f"{city} - {traffic}" ).add_to( map )
+        
+    return map
+
+
+@profiled()
+def delivery_heatmap_data( df1, rows=None ):
+    """ Esta função tem a responsabilidade de calcular os pontos do mapa de calor
+
+        Informação: A quantidade de entregas em cada célula da grade ( HEATMAP_CELL_DEG, ver utils/geo.py ).
+        Todas as entregas entram, não só a mediana de cada cidade.
+
+        Input:
+            - df1: Dataframe do load_data ( ou StreamingView, ver utils/streaming.py )
+            - rows: Posições das linhas selecionadas ( ver utils/filters.filter_rows ), ou None para todas.
+                    As células vêm do índice espacial do dataset ( ver utils/spatial.py ), construído uma única vez.
+        Output: Dataframe com as coordenadas do centro de cada célula e a coluna count
+    """
+    if isinstance( df1, StreamingView ):
+        cells = df1.location_counts()
+        lat, lon = cell_centers( cells["lat_cell"].to_numpy(), cells["lon_cell"].to_numpy(), HEATMAP_CELL_DEG )
+        counts = cells["count"].to_numpy()
+    else:
+        cells = spatial_index( df1 ).delivery_counts( rows=rows )
+        lat, lon, counts = cells["latitude"].to_numpy(), cells["longitude"].to_numpy(), cells["count"].to_numpy()
+
+    return pd.DataFrame( { "Delivery_location_latitude": lat,
+                           "Delivery_location_longitude": lon,
+                           "count": counts } )
+
+
+@profiled()
+def delivery_heatmap( df1, rows=None ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+
+        Tipo de gráfico: Mapa de calor
+        Informação do gráfico: Onde as entregas acontecem, agrupadas numa grade no servidor.
+
+        Input: Mesmos parâmetros do delivery_heatmap_data
+        Output: Mapa ( folium.Map ), que a página desenha a partir do cache ( ver utils/maps.py )
+    """
+    import folium
+    from folium.plugins import HeatMap
+
+    df_aux = delivery_heatmap_data( df1, rows )
+
+    map = folium.Map()
+    if len( df_aux ) == 0:
+        return map
+
+    #Cada célula vira um único ponto, com peso proporcional à quantidade de entregas
+    weights = df_aux["count"].to_numpy() / df_aux["count"].max()
+    points = np.column_stack( [ df_aux["Delivery_location_latitude"].to_numpy(),
+                                df_aux["Delivery_location_longitude"].to_numpy(),
+                                weights ] )
+    HeatMap( points.tolist(), radius=12 ).add_to( map )
+    map.fit_bounds( [ [ points[:, 0].min(), points[:, 1].min() ],
+                      [ points[:, 0].max(), points[:, 1].max() ] ] )
+
+    return map
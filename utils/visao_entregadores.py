@@ -0,0 +1,219 @@
+#Funções de agregação da página Visão Entregadores.
+#Ficam fora da página para poderem ser usadas sem o Streamlit ( ex: benchmarks ).
+
+#Bibliotecas necessárias
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, resolve
+from utils.couriers import CourierStats
+from utils.filters import option_order
+from utils.precompute import PrecomputedView
+from utils.profiling import profiled
+from utils.sql import SqlView
+from utils.streaming import StreamingView
+
+#Quantidade padrão de entregadores mostrados por cidade
+TOP_K = 10
+
+#Rankings já calculados, por ( versão do dataset, estado dos filtros, k )
+TOP_CACHE_SIZE = 128
+_rankings = LRUCache( maxsize=TOP_CACHE_SIZE )
+
+#Métricas gerais já calculadas, por ( versão do dataset, estado dos filtros )
+METRICS_CACHE_SIZE = 512
+_metrics = LRUCache( maxsize=METRICS_CACHE_SIZE )
+
+#Estatísticas por entregador já calculadas, por ( versão do dataset, estado dos filtros ). Cada uma guarda
+#também as ordenações da tabela ( ver CourierStats.page )
+STATS_CACHE_SIZE = 64
+_stats = LRUCache( maxsize=STATS_CACHE_SIZE )
+
+#-------------------
+#Funções
+#-------------------
+@profiled()
+def overall_metrics( df1, key=None ):
+    """ Esta função tem a responsabilidade de calcular as métricas gerais dos entregadores
+
+        Informação: Maior e menor idade dos entregadores e melhor e pior condição de veículos.
+
+        Input: Dataframe ( ou StreamingView, ver utils/streaming.py, ou um Lazy, ver utils/cache.py ) e
+               key ( ver top_couriers; com key, o resultado é compartilhado entre as sessões )
+        Output: Dicionário com maior_idade, menor_idade, melhor_condicao e pior_condicao
+    """
+    if key is not None:
+        return dict( _metrics.get_or_compute( tuple( key ) + ( "overall_metrics", ), lambda: overall_metrics( df1 ) ) )
+
+    df1 = resolve( df1 )
+    if isinstance( df1, StreamingView ):
+        return df1.overall_metrics()
+
+    return {
+        "maior_idade": df1.loc[:, "Delivery_person_Age"].max(),
+        "menor_idade": df1.loc[:, "Delivery_person_Age"].min(),
+        "melhor_condicao": df1.loc[:, "Vehicle_condition"].max(),
+        "pior_condicao": df1.loc[:, "Vehicle_condition"].min(),
+    }
+
+
+@profiled()
+def ratings_by_courier( df1 ):
+    """ Esta função tem a responsabilidade de calcular a avaliação média por entregador
+
+        Input: Dataframe ( ou StreamingView, ver utils/streaming.py )
+        Output: Dataframe com Delivery_person_ID e Delivery_person_Ratings
+    """
+    if isinstance( df1, StreamingView ):
+        return df1.ratings_by_courier()
+
+    return (df1[["Delivery_person_ID", "Delivery_person_Ratings"]]
+               .groupby("Delivery_person_ID", observed=True)
+               .mean()
+               .sort_index()
+               .reset_index())
+
+
+@profiled()
+def courier_stats_table( df1, key=None ):
+    """ Esta função tem a responsabilidade de calcular as estatísticas por entregador dos pedidos filtrados
+
+        Informação: A tabela de avaliações por entregador ( ver utils/couriers.py ), que segue os filtros
+        da barra lateral.
+
+        Input: Dataframe ( ou StreamingView, SqlView, ou um Lazy, ver utils/cache.py ) e key
+               ( ver top_couriers; com key, a tabela e as ordenações são compartilhadas entre as sessões )
+        Output: CourierStats
+    """
+    if key is not None:
+        return _stats.get_or_compute( tuple( key ) + ( "courier_stats", ), lambda: courier_stats_table( df1 ) )
+
+    df1 = resolve( df1 )
+    if isinstance( df1, StreamingView ):
+        return df1.courier_stats()
+
+    return CourierStats.from_frame( df1 )
+
+
+@profiled()
+def top_delivers ( df1, top_asc, k=TOP_K, key=None ):
+    """ Esta função tem a responsabilidade de plotar um data frame
+        
+        Data frame contém: Informações sobre os entregadores mais rápidos e lentos por cidade
+        
+        Input: Dataframe ( ou StreamingView, ver utils/streaming.py ), top_asc ( True = mais rápidos ),
+               k e key ( ver top_couriers; com key, as duas listas saem de um único cálculo )
+        Output: Dataframe filtrado
+    """    
+    #Na coluna Time_taken(min), temos um problema, pois a informação está ''suja'' com a informação (min)
+    #Aqui, vamos usar o .apply, é um comando que permite que a gente aplique outro comando linha a linha, ou seja:
+    #então quando eu uso o df1["Time_taken(min)"].apply, eu to dizendo assim: eu quero aplicar um comando em todas as linhas dessa coluna.
+    #mas qual a função? a função lambda ela é como uma função matemática:
+    #x=10
+    #f(x) = 1*10 + 2*10 + 2*10 = 50
+    #f(x=10) = 50
+    #Então nesse caso meu lambda é o meu f(x)
+    #Quando eu uso o lambda x: x.split eu tenho acesso ao x e quando eu uso .apply, meu x do x.split é exatamente meu valor de linha.
+    #e a cada linha eu estou dando um split("(min)")[1]).
+    #df1["Time_taken(min)"] = df1["Time_taken(min)"].apply( lambda x: x.split("(min)")[1])
+    #df1["Time_taken(min)"] = df1["Time_taken(min)"].astype(int)
+    #fiz a limpeza la em cima na área de limpeza, então o código acima está la naquela área.
+
+    fastest, slowest = top_couriers( df1, k, key )
+
+    return ( fastest if top_asc else slowest ).copy()
+
+
+def _min_time_by_courier( df1 ):
+    """ Menor tempo de entrega por entregador e cidade ( colunas Delivery_person_ID, City, Time_taken(min) ) """
+    if isinstance( df1, StreamingView ):
+        return df1.min_time_by_courier().reset_index()
+
+    return ( df1.loc[:, ["Delivery_person_ID", "Time_taken(min)", "City"]]
+                .groupby(["Delivery_person_ID", "City"], observed=True)
+                .min()
+                .sort_index()
+                .reset_index() )
+
+
+def rank_city( times, ids, k ):
+    """ Esta função tem a responsabilidade de achar os k menores e os k maiores tempos de uma cidade
+
+        Seleção parcial: só os k menores e os k maiores são separados, e só eles são ordenados
+        ( empates são desempatados pelo id ). Também usada pelo pré-cálculo ( ver utils/precompute.py ).
+
+        Input: Tempos e ids dos entregadores da cidade ( mesma ordem, ordenados pelo id ) e k
+        Output: ( posições dos mais rápidos, posições dos mais lentos ), já na ordem de exibição
+    """
+    n = min( k, len( times ) )
+    if n == len( times ):
+        low = high = np.arange( n )
+    else:
+        #A seleção parcial acha o k-ésimo tempo; todos os empatados com ele entram, para o desempate pelo id
+        low = np.flatnonzero( times <= times[np.argpartition( times, n - 1 )[n - 1]] )
+        high = np.flatnonzero( times >= times[np.argpartition( times, len( times ) - n )[len( times ) - n]] )
+    low = low[np.lexsort( ( ids[low], times[low] ) )][:n]
+    high = high[np.lexsort( ( ids[high], -times[high] ) )][:n]
+    return low, high
+
+
+def _top_couriers( df1, k ):
+    #O pré-cálculo já guarda o resultado para o k padrão ( ver utils/precompute.py )
+    if isinstance( df1, PrecomputedView ) and k == df1.top_k:
+        return df1.top_couriers()
+
+    #No backend SQL o ranking inteiro é uma consulta ( ver utils/sql.py )
+    if isinstance( df1, SqlView ):
+        return df1.top_couriers( k )
+
+    df2 = _min_time_by_courier( df1 )
+    df2 = df2.loc[df2["Time_taken(min)"].notna(), :]
+
+    #Agrupa as linhas por cidade ( ordenação estável de códigos inteiros, na ordem das opções da barra lateral )
+    #e acha onde cada cidade começa
+    cities = option_order( "City", df2["City"].dropna().unique() )
+    codes = pd.Categorical( df2["City"], categories=cities ).codes
+    order = np.argsort( codes, kind="stable" )
+    bounds = np.concatenate( [ [ 0 ], np.cumsum( np.bincount( codes[codes >= 0], minlength=len( cities ) ) ) ] )
+    offset = int( ( codes < 0 ).sum() )
+
+    times = df2["Time_taken(min)"].to_numpy( dtype=float )[order]
+    ids = df2["Delivery_person_ID"].to_numpy()[order]
+
+    fastest, slowest = [], []
+    for start, end in zip( bounds[:-1] + offset, bounds[1:] + offset ):
+        if end == start:
+            continue
+        low, high = rank_city( times[start:end], ids[start:end], k )
+        fastest.append( start + low )
+        slowest.append( start + high )
+
+    def frame( parts ):
+        rows = order[np.concatenate( parts )] if parts else np.empty( 0, dtype=np.int64 )
+        return df2.iloc[rows].reset_index( drop=True )
+
+    return frame( fastest ), frame( slowest )
+
+
+@profiled()
+def top_couriers( df1, k=TOP_K, key=None ):
+    """ Esta função tem a responsabilidade de achar os entregadores mais rápidos e mais lentos de cada cidade
+
+        Informação: Para cada entregador e cidade vale o menor tempo de entrega. Em uma única passada
+        agrupada, cada cidade presente nos dados ( na ordem da barra lateral: Metropolitian, Urban, Semi-Urban,
+        e cidades novas depois, em ordem alfabética ) recebe os k menores e os k maiores
+        tempos, com seleção parcial em vez de ordenar todos os entregadores. Empates são
+        desempatados pelo Delivery_person_ID.
+
+        Input:
+            - df1: Dataframe ( ou StreamingView, ver utils/streaming.py, PrecomputedView, SqlView ou um Lazy,
+                   calculado só se o resultado não estiver guardado )
+            - k: Quantidade de entregadores por cidade
+            - key: Identifica a versão do dataset e o estado dos filtros ( ex: cube.key do cubo filtrado ),
+                   para guardar o resultado; None calcula sem guardar
+        Output: ( mais rápidos, mais lentos ) - Dataframes com Delivery_person_ID, City e Time_taken(min)
+    """
+    if key is None:
+        return _top_couriers( resolve( df1 ), k )
+
+    return _rankings.get_or_compute( tuple( key ) + ( "top_couriers", k ), lambda: _top_couriers( resolve( df1 ), k ) )
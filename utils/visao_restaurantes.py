@@ -0,0 +1,106 @@
+#Funções de agregação e gráficos da página Visão Restaurantes.
+#Ficam fora da página para poderem ser usadas sem o Streamlit ( ex: benchmarks ).
+
+#Bibliotecas necessárias
+#plotly demora para importar, então é importado dentro das funções que desenham os gráficos
+import numpy as np
+
+from utils.profiling import profiled
+
+#-------------------
+#Funções
+#-------------------
+@profiled()
+def distance( cube ):
+    """ Esta função tem a responsabilidade de mostrar uma informação.
+        
+        Tipo de informação: Distância média das entregas.
+        
+        Input: Cubo de pedidos ( ver utils/cube.py )
+        Output: Número mostrando a distância média das entregas.
+    """
+    #A coluna distance já vem calculada do clean_code ( ver utils/geo.py ), para todos os pedidos.
+    #Pedidos com coordenadas inválidas ficam com NaN e não entram na média.
+    avg_distance = round( cube.mean_std([], "distance")["mean"].iloc[0], 2 )
+    
+    return avg_distance
+
+@profiled()
+def avg_std_time_delivery( cube, festival, op ):
+    """ Esta função calcula o tempo médio e o desvio padrão do tempo de entrega com e sem festival
+        Paramêtros:
+            Input: 
+                - cube: Cubo de pedidos ( ver utils/cube.py ) já filtrado.
+                - op: Tipo de operação que precisa ser calculado;
+                      "avg_time": Calcula o tempo médio;
+                      "std_time": Calcula o desvio padrão do tempo.
+                - festival:
+                      "Yes": Calcula a operação com o festival;
+                      "No": Calcula a operação sem o festival.
+                      
+            Output: 
+                - df: Dataframe com 2 colunas e 1 linha.
+    """
+    df_aux = cube.mean_std(["Festival"], "Time_taken(min)")
+    df_aux.columns=["Festival", "avg_time", "std_time"]
+
+    df_aux = round( df_aux.loc[df_aux["Festival"] == festival, op ], 2 )
+    
+    return df_aux
+
+@profiled()
+def avg_std_time_graph( cube ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: De barras
+        Informação do gráfico: Tempo médio de entregas por cidade, com desvio padrão.
+        
+        Input: Cubo de pedidos ( ver utils/cube.py )
+        Output: Gráfico
+    """    
+    df_aux = cube.mean_std(["City"], "Time_taken(min)")
+    df_aux.columns=["City", "avg_time", "std_time"]
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    fig.add_trace( go.Bar( name="Control", x=df_aux["City"], y=df_aux["avg_time"], error_y=dict(type="data",                                             array=df_aux["std_time"]) ) ) 
+    fig.update_layout(barmode="group")
+    
+    return fig
+
+
+@profiled()
+def avg_std_city_traffic( cube ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: De sunburst.
+        Informação do gráfico: Tempo médio e desvio padrão por cidade e tipo de trafego.
+        
+        Input: Cubo de pedidos ( ver utils/cube.py )
+        Output: Gráfico
+    """    
+    df_aux = cube.mean_std(["City", "Road_traffic_density"], "Time_taken(min)")
+    df_aux.columns=["City", "Road_traffic_density", "avg_time", "std_time"]
+    import plotly.express as px
+    fig = px.sunburst(df_aux, path=["City", "Road_traffic_density"], values="avg_time",
+                      color="std_time", color_continuous_scale="RdBu",
+                      color_continuous_midpoint=np.average(df_aux["std_time"] ) )
+    
+    return fig
+
+
+@profiled()
+def avg_restaurant_city( cube ):
+    """ Esta função tem a responsabilidade de plotar um gráfico
+        
+        Tipo de gráfico: De pizza.
+        Informação do gráfico: A distância média dos resturantes e locais de entrega.
+        
+        Input: Cubo de pedidos ( ver utils/cube.py )
+        Output: Gráfico
+    """    
+    avg_distance = cube.mean_std([ "City" ], "distance").drop(columns="std")
+    avg_distance.columns = [ "City", "distance" ]
+    import plotly.graph_objects as go
+    fig = go.Figure( data=[ go.Pie( labels=avg_distance["City"], values=avg_distance["distance"], pull=[0, 0.1, 0])])
+    
+    return fig